@@ -0,0 +1,50 @@
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, List
+
+from tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundStage:
+    """Runs a pipeline's side work on one worker thread while simc runs.
+
+    Talent hashing and per-scenario post-processing only have to be done
+    before the pipeline's final steps, so they are submitted here and the
+    main thread moves straight on to the next simc run. Jobs run one at a
+    time in submission order: post-processing submitted after the hashing
+    finds every hash already cached, and scenarios are post-processed in
+    the order they were simulated. wait() blocks until everything submitted
+    has finished and re-raises the first failure.
+    """
+
+    def __init__(self, name: str = "background"):
+        self.name = name
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+        self.pending: List[Future] = []
+
+    def submit(self, label: str, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        def run():
+            with tracer.span(label, self.name):
+                return fn(*args, **kwargs)
+
+        future = self.executor.submit(run)
+        self.pending.append(future)
+        return future
+
+    def wait(self) -> List[Any]:
+        pending, self.pending = self.pending, []
+        if any(not future.done() for future in pending):
+            logger.info("Waiting for background post-processing to finish...")
+        with tracer.span(f"wait_for_{self.name}", "scheduling"):
+            return [future.result() for future in pending]
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,121 @@
+import itertools
+import threading
+import time
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TenantUsage:
+    thread_seconds: float = 0.0
+    wait_seconds: float = 0.0
+    runs: int = 0
+
+
+class FairShareScheduler:
+    """One pool of simc threads shared by the pipelines of a batch.
+
+    Every pipeline (tenant) asks for threads before it builds a simc input.
+    A request is capped at the fair share, the pool divided by the tenants
+    still in the batch, so a tenant that finishes early hands its cores to
+    the others on their next run. Waiting requests are granted least-loaded
+    tenant first and in arrival order within a tenant, which keeps one
+    tenant's many supplemental jobs from starving another's main runs.
+    """
+
+    def __init__(self, total_threads: int):
+        self.total_threads = max(1, total_threads)
+        self.available = self.total_threads
+        self.condition = threading.Condition()
+        self.tenants: Dict[str, int] = {}  # threads in use per tenant
+        self.usage: Dict[str, TenantUsage] = {}
+        self.waiting: List[Tuple[str, int]] = []
+        self.tickets = itertools.count()
+        self.last_change = time.monotonic()
+
+    def join(self, tenant: str):
+        with self.condition:
+            self.tenants.setdefault(tenant, 0)
+            self.usage.setdefault(tenant, TenantUsage())
+
+    def leave(self, tenant: str):
+        with self.condition:
+            self._account()
+            self.tenants.pop(tenant, None)
+            self.condition.notify_all()
+
+    def share(self) -> int:
+        return max(1, self.total_threads // max(1, len(self.tenants)))
+
+    def _account(self):
+        now = time.monotonic()
+        for tenant, threads in self.tenants.items():
+            self.usage[tenant].thread_seconds += threads * (now - self.last_change)
+        self.last_change = now
+
+    def _next(self) -> Tuple[str, int]:
+        return min(self.waiting, key=lambda entry: (self.tenants.get(entry[0], 0), entry[1]))
+
+    def acquire(self, tenant: str, threads: int) -> int:
+        """Block until threads (capped at the fair share) are free; returns the grant."""
+        with self.condition:
+            want = max(1, min(threads, self.share()))
+            entry = (tenant, next(self.tickets))
+            self.waiting.append(entry)
+            started = time.monotonic()
+            self.condition.wait_for(lambda: self._next() == entry and self.available >= want)
+            self.waiting.remove(entry)
+            self._account()
+            self.available -= want
+            self.tenants[tenant] = self.tenants.get(tenant, 0) + want
+            usage = self.usage.setdefault(tenant, TenantUsage())
+            usage.wait_seconds += time.monotonic() - started
+            usage.runs += 1
+            # The next waiter may fit into what is left
+            self.condition.notify_all()
+        return want
+
+    def release(self, tenant: str, threads: int):
+        with self.condition:
+            self._account()
+            self.available += threads
+            if tenant in self.tenants:
+                self.tenants[tenant] -= threads
+            self.condition.notify_all()
+
+    def budget(self, tenant: str) -> "TenantBudget":
+        self.join(tenant)
+        return TenantBudget(self, tenant)
+
+    def print_usage(self):
+        print("\nBatch Core Usage:")
+        print("=================")
+        for tenant, usage in self.usage.items():
+            print(
+                f"  {tenant}: {usage.runs} simc run(s), {usage.thread_seconds:,.0f} thread-seconds, "
+                f"waited {usage.wait_seconds:,.1f}s for cores"
+            )
+
+
+class TenantBudget:
+    """A tenant's view of the scheduler with the acquire/release interface of CoreBudget."""
+
+    def __init__(self, scheduler: FairShareScheduler, tenant: str):
+        self.scheduler = scheduler
+        self.tenant = tenant
+
+    @property
+    def total_threads(self) -> int:
+        return self.scheduler.share()
+
+    def acquire(self, threads: int) -> int:
+        return self.scheduler.acquire(self.tenant, threads)
+
+    def release(self, threads: int):
+        self.scheduler.release(self.tenant, threads)
+
+    def close(self):
+        self.scheduler.leave(self.tenant)
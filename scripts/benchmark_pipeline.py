@@ -0,0 +1,264 @@
+"""End-to-end pipeline benchmark against fake_simc.py.
+
+Builds a throwaway project tree, drives generate_sims.main, refactor.main and
+compare_reports.main in-process, and reports wall time per pipeline and per
+orchestration stage (parsing, hashing, input assembly, progress parsing,
+JSON patching and report building).
+"""
+import argparse
+import glob
+import importlib
+import json
+import os
+import re
+import shutil
+import stat
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from functools import wraps
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(SCRIPT_DIR)
+
+ROOT_FILES = ["template.html", "styles.css", "script.js", "talent_dictionary.json"]
+
+# (module, owner, attribute, stage name); owner None means a module-level function
+TIMED_STAGES = [
+    ("generate_sims", None, "parse_profiles_simc", "parse_profiles_simc"),
+    ("generate_sims", "TalentHashManager", "get_hashes_batch", "get_hashes_batch"),
+    ("generate_sims", None, "run_preflight_checks", "preflight"),
+    ("generate_sims", "SimulationRunner", "create_simc_file", "create_simc_file"),
+    ("generate_sims", "SimulationRunner", "run_simc", "simc"),
+    ("generate_sims", "SimulationRunner", "update_json_with_hashes", "update_json_with_hashes"),
+    ("generate_sims", "ProgressTracker", "update", "progress_parsing"),
+    ("generate_sims", None, "run_supplemental_profilesets", "supplemental"),
+    ("generate_sims", None, "run_combine_script", "combine"),
+    ("refactor", None, "parse_profiles_simc", "parse_profiles_simc"),
+    ("refactor", "TalentManager", "get_hashes_batch", "get_hashes_batch"),
+    ("refactor", "SimCContentGenerator", "generate_content", "create_simc_file"),
+    ("refactor", "Simulation", "_run_simc_process", "simc"),
+    ("refactor", "Simulation", "create_dataset", "parse_results"),
+    ("refactor", "ProgressTracker", "update", "progress_parsing"),
+    ("refactor", "APLCombiner", "combine_apl", "combine"),
+    ("compare_reports", None, "load_json_file", "load_json"),
+    ("compare_reports", None, "process_data", "process_data"),
+    ("compare_reports", None, "process_additional_data", "process_additional_data"),
+    ("compare_reports", None, "generate_html", "generate_html"),
+]
+
+
+class StageTimer:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pipeline = None
+        self.totals = defaultdict(float)
+        self.calls = defaultdict(int)
+
+    def wrap(self, owner, attribute, stage):
+        original = getattr(owner, attribute)
+
+        @wraps(original)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self.add(stage, time.perf_counter() - start)
+
+        setattr(owner, attribute, timed)
+
+    def add(self, stage, seconds):
+        with self.lock:
+            key = (self.pipeline, stage)
+            self.totals[key] += seconds
+            self.calls[key] += 1
+
+    def results(self):
+        return [
+            {"pipeline": pipeline, "stage": stage, "calls": self.calls[(pipeline, stage)], "seconds": seconds}
+            for (pipeline, stage), seconds in self.totals.items()
+        ]
+
+
+def scale_templates(source, destination, hero_count, class_count, spec_count):
+    with open(source, "r") as f:
+        content = f.read()
+    sections = re.split(r"#\s*(Hero tree variants|Class tree variants|Spec tree variants)", content)
+    limits = [hero_count, class_count, spec_count]
+    lines = []
+    for i, limit in enumerate(limits):
+        lines.append(f"# {sections[i * 2 + 1]}")
+        definitions = re.findall(r'^\$\([\w_]+\)="[^"]+"$', sections[i * 2 + 2], re.MULTILINE)
+        lines.extend(definitions[:limit])
+        lines.append("")
+    with open(destination, "w") as f:
+        f.write("\n".join(lines))
+
+
+def create_sandbox(sandbox, spec_name, hero_count, class_count, spec_count, iterations, trace=False):
+    spec_folder = spec_name.lower()
+    shutil.copytree(SCRIPT_DIR, os.path.join(sandbox, "scripts"), ignore=shutil.ignore_patterns("__pycache__", "*.pkl", "*.lock", "runtime_history.json"))
+    shutil.copytree(os.path.join(ROOT_DIR, spec_folder), os.path.join(sandbox, spec_folder))
+    os.makedirs(os.path.join(sandbox, "data"))
+    for path in [os.path.join(ROOT_DIR, "data", "talents_cache.json")] + glob.glob(os.path.join(ROOT_DIR, "data", "filtered_*.json")):
+        shutil.copy2(path, os.path.join(sandbox, "data"))
+    os.makedirs(os.path.join(sandbox, "reports_havoc"))
+    shutil.copy2(os.path.join(ROOT_DIR, "reports_havoc", "sim_output.json"), os.path.join(sandbox, "reports_havoc"))
+    for name in ROOT_FILES:
+        shutil.copy2(os.path.join(ROOT_DIR, name), sandbox)
+
+    scale_templates(
+        os.path.join(ROOT_DIR, spec_folder, "profile_templates.simc"),
+        os.path.join(sandbox, spec_folder, "profile_templates.simc"),
+        hero_count, class_count, spec_count,
+    )
+
+    simc_dir = os.path.join(sandbox, "simc")
+    os.makedirs(simc_dir)
+    simc_path = os.path.join(simc_dir, "simc")
+    with open(simc_path, "w") as f:
+        f.write(f'#!/bin/sh\nexec "{sys.executable}" "{os.path.join(sandbox, "scripts", "fake_simc.py")}" "$@"\n')
+    os.chmod(simc_path, os.stat(simc_path).st_mode | stat.S_IEXEC)
+
+    config_path = os.path.join(sandbox, "config_bench.ini")
+    with open(config_path, "w") as f:
+        f.write(f"""[General]
+spec_name = {spec_name}
+simc = {simc_path}
+apl_folder = {spec_folder}
+report_folder = reports_bench
+timestamp = false
+html_output = false
+json_output = true
+clear_cache = false
+incremental = false
+debug = false
+trace = {str(bool(trace)).lower()}
+
+[Simulations]
+multi_sim = 1,300 5,120 dungeonslice
+targettime = 1,300 5,120 dungeonslice
+iterations = {iterations}
+target_error = 0.5
+talents = bench
+
+[TalentFilters]
+hero_talents = all
+hero_talents_exclude =
+class_talents = all
+class_talents_exclude =
+spec_talents = all
+spec_talents_exclude =
+
+[PostProcessing]
+supplemental_profilesets = true
+supplemental_talents = bench
+generate_combined_apl = true
+generate_website = false
+""")
+    return config_path, simc_dir
+
+
+def load_pipeline_modules(sandbox, simc_dir):
+    sys.path.insert(0, os.path.join(sandbox, "scripts"))
+    modules = {name: importlib.import_module(name) for name in ["talenthasher", "generate_sims", "refactor", "compare_reports"]}
+    # talenthasher resolves simc relative to the working directory
+    modules["talenthasher"].SIMC_PATH = simc_dir + os.sep
+    # Items are not re-fetched during a benchmark; the sandbox has the filtered data
+    modules["generate_sims"].fetch_and_filter = lambda: None
+    modules["generate_sims"].run_create_profiles = lambda config_path, **kwargs: None
+    return modules
+
+
+def run_benchmark(args):
+    sandbox = tempfile.mkdtemp(prefix="simtoolkit_bench_")
+    os.environ["FAKE_SIMC_PROFILESET_MS"] = str(args.profileset_ms)
+    os.environ["FAKE_SIMC_BASELINE_MS"] = str(args.baseline_ms)
+    try:
+        config_path, simc_dir = create_sandbox(sandbox, args.spec, args.hero, args.classes, args.spec_templates, args.iterations, args.trace)
+        modules = load_pipeline_modules(sandbox, simc_dir)
+
+        timer = StageTimer()
+        for module_name, owner_name, attribute, stage in TIMED_STAGES:
+            module = modules[module_name]
+            timer.wrap(getattr(module, owner_name) if owner_name else module, attribute, stage)
+
+        pipelines = [
+            ("generate_sims", lambda: modules["generate_sims"].main(config_path)),
+            ("refactor", lambda: modules["refactor"].main(config_path)),
+            ("compare_reports", lambda: modules["compare_reports"].main([config_path])),
+        ]
+        totals = []
+        for repeat in range(1, args.repeat + 1):
+            for name, pipeline in pipelines:
+                timer.pipeline = name
+                start = time.perf_counter()
+                pipeline()
+                totals.append({"pipeline": name, "repeat": repeat, "seconds": time.perf_counter() - start})
+
+        report = {
+            "parameters": vars(args),
+            "profilesets": args.hero * args.classes * args.spec_templates,
+            "pipelines": totals,
+            "stages": timer.results(),
+            "outputs": {
+                os.path.relpath(path, sandbox): os.path.getsize(path)
+                for path in glob.glob(os.path.join(sandbox, "reports_bench", "*.json"))
+                if not os.path.basename(path).startswith("trace_")
+            },
+        }
+        if args.trace:
+            os.makedirs(args.trace, exist_ok=True)
+            for path in glob.glob(os.path.join(sandbox, "reports_bench", "trace_*.json")):
+                shutil.copy2(path, args.trace)
+        return report
+    finally:
+        if args.keep:
+            print(f"Sandbox kept at {sandbox}")
+        else:
+            shutil.rmtree(sandbox, ignore_errors=True)
+
+
+def print_report(report):
+    print("\nPipeline Benchmark:")
+    print("===================")
+    print(f"  Profilesets per scenario: {report['profilesets']}")
+    for entry in report["pipelines"]:
+        print(f"  {entry['pipeline']} (run {entry['repeat']}): {entry['seconds']:.3f}s")
+
+    print("\nStage Timings (inclusive, summed over threads):")
+    for entry in sorted(report["stages"], key=lambda e: (e["pipeline"], -e["seconds"])):
+        print(f"  {entry['pipeline']:<16} {entry['stage']:<26} {entry['calls']:>8} calls {entry['seconds']:>10.3f}s")
+
+    print("\nOutput Sizes:")
+    for path, size in sorted(report["outputs"].items()):
+        print(f"  {path}: {size / 1024:.1f} KB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the sim pipeline against a fake simc binary")
+    parser.add_argument("--spec", default="Havoc", choices=["Havoc", "Vengeance"], help="Specialization whose APL folder is used")
+    parser.add_argument("--hero", type=int, default=3, help="Number of hero tree templates")
+    parser.add_argument("--classes", type=int, default=3, help="Number of class tree templates")
+    parser.add_argument("--spec-templates", type=int, default=20, help="Number of spec tree templates")
+    parser.add_argument("--iterations", type=int, default=1000, help="Iterations written to the config")
+    parser.add_argument("--profileset-ms", type=float, default=0, help="Simulated thread-milliseconds per profileset")
+    parser.add_argument("--baseline-ms", type=float, default=0, help="Simulated milliseconds for each baseline")
+    parser.add_argument("--repeat", type=int, default=1, help="Run each pipeline this many times (later runs are warm; stages are never skipped as up to date)")
+    parser.add_argument("--output", help="Write the benchmark report as JSON to this path")
+    parser.add_argument("--trace", help="Enable span tracing and copy the Chrome trace files to this directory")
+    parser.add_argument("--keep", action="store_true", help="Keep the sandbox directory")
+    args = parser.parse_args()
+
+    report = run_benchmark(args)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+"""Shared cache of talent hashes and profileset results.
+
+Several machines simming the same builds can point at one cache server and
+skip the talent hashing and the simc work another machine has already done.
+The protocol is JSON over HTTP:
+
+    GET  /health                              -> {"status": "ok", "hashes": n, "results": n}
+    POST /<namespace>/lookup  {"keys": [...]}  -> {"values": {key: value, ...}}
+    POST /<namespace>         {"values": {...}} -> {"stored": n}
+
+where namespace is "hashes" or "results". Keys are opaque strings (profileset
+results are keyed by a digest of everything that decides them) and values any
+JSON. Entries are never overwritten: equal keys stand for equal content, so
+the first value published is kept. With a token the server expects an
+"Authorization: Bearer <token>" header on every request.
+
+Run a server with:
+
+    python cache_server.py --host 0.0.0.0 --port 8765 --db sim_cache.sqlite
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import logging
+import urllib.error
+import urllib.request
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+NAMESPACES = ("hashes", "results")
+DEFAULT_PORT = 8765
+DEFAULT_TIMEOUT = 10.0
+MAX_BODY_BYTES = 64 << 20
+CHUNK_SIZE = 1000  # keys per request, so one request stays well under MAX_BODY_BYTES
+
+
+def content_key(*parts: Any) -> str:
+    """Digest of JSON-serialisable parts, used to address cached content."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+@lru_cache(maxsize=None)
+def _file_digest(path: str, size: int, mtime_ns: int) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_digest(path: str) -> Optional[str]:
+    """sha256 of a file, read again only when its size or modification time change."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return _file_digest(os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+
+class CacheStore:
+    """The entries of every namespace in one sqlite database (":memory:" by default)."""
+
+    def __init__(self, path: str = ":memory:"):
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.db:
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS entries (namespace TEXT, key TEXT, value TEXT, PRIMARY KEY (namespace, key))"
+            )
+
+    def lookup(self, namespace: str, keys: Iterable[str]) -> Dict[str, Any]:
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        with self.lock:
+            # Stay below sqlite's limit on query parameters
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = self.db.execute(
+                    f"SELECT key, value FROM entries WHERE namespace = ? AND key IN ({','.join('?' * len(chunk))})",
+                    [namespace, *chunk]
+                )
+                found.update((key, json.loads(value)) for key, value in rows)
+        return found
+
+    def publish(self, namespace: str, values: Dict[str, Any]) -> int:
+        with self.lock, self.db:
+            before = self.db.total_changes
+            self.db.executemany(
+                "INSERT OR IGNORE INTO entries (namespace, key, value) VALUES (?, ?, ?)",
+                [(namespace, key, json.dumps(value)) for key, value in values.items()]
+            )
+            return self.db.total_changes - before
+
+    def counts(self) -> Dict[str, int]:
+        with self.lock:
+            rows = dict(self.db.execute("SELECT namespace, COUNT(*) FROM entries GROUP BY namespace"))
+        return {namespace: rows.get(namespace, 0) for namespace in NAMESPACES}
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+def make_handler(store: CacheStore, token: Optional[str] = None):
+    class CacheHandler(BaseHTTPRequestHandler):
+        def send_json(self, status: int, body: Dict[str, Any]):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def authorized(self) -> bool:
+            if token and self.headers.get("Authorization") != f"Bearer {token}":
+                self.send_json(401, {"error": "unauthorized"})
+                return False
+            return True
+
+        def do_GET(self):
+            if not self.authorized():
+                return
+            if self.path.split("?")[0] != "/health":
+                self.send_json(404, {"error": "not found"})
+                return
+            self.send_json(200, {"status": "ok", **store.counts()})
+
+        def do_POST(self):
+            if not self.authorized():
+                return
+            parts = self.path.split("?")[0].strip("/").split("/")
+            if parts[0] not in NAMESPACES or parts[1:] not in ([], ["lookup"]):
+                self.send_json(404, {"error": "not found"})
+                return
+            length = int(self.headers.get("Content-Length") or 0)
+            if length > MAX_BODY_BYTES:
+                self.send_json(413, {"error": "request too large"})
+                return
+            try:
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if parts[1:]:
+                    keys = body["keys"]
+                    if not isinstance(keys, list):
+                        raise TypeError("keys must be a list")
+                    self.send_json(200, {"values": store.lookup(parts[0], map(str, keys))})
+                else:
+                    values = body["values"]
+                    if not isinstance(values, dict):
+                        raise TypeError("values must be an object")
+                    self.send_json(200, {"stored": store.publish(parts[0], values)})
+            except (ValueError, KeyError, TypeError) as e:
+                self.send_json(400, {"error": f"bad request: {e}"})
+
+        def log_message(self, format, *args):
+            logger.debug(f"{self.address_string()} {format % args}")
+
+    return CacheHandler
+
+
+class CacheServer:
+    """The HTTP front of a CacheStore, served from a background thread."""
+
+    def __init__(self, store: CacheStore, host: str = "127.0.0.1", port: int = DEFAULT_PORT, token: Optional[str] = None):
+        self.store = store
+        self.server = ThreadingHTTPServer((host, port), make_handler(store, token))
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "CacheServer":
+        self.thread = threading.Thread(target=self.server.serve_forever, name="cache-http", daemon=True)
+        self.thread.start()
+        return self
+
+    def shutdown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class LocalCache:
+    """In-process stand-in for a cache server, with the client's interface.
+
+    Useful for tests and for a single machine that wants the result cache
+    without running a server; a path keeps the entries between runs.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self.store = CacheStore(path)
+
+    def lookup(self, namespace: str, keys: List[str]) -> Dict[str, Any]:
+        return self.store.lookup(namespace, keys)
+
+    def publish(self, namespace: str, values: Dict[str, Any]) -> int:
+        return self.store.publish(namespace, values) if values else 0
+
+    def __repr__(self) -> str:
+        return "local cache"
+
+
+class CacheClient:
+    """Bulk lookups and publishes against a cache server.
+
+    The cache only ever saves work, so every failure is logged and treated as
+    a miss. After the first failure the client stops contacting the server
+    for the rest of the run instead of waiting on each request's timeout.
+    """
+
+    def __init__(self, url: str, token: Optional[str] = None, timeout: float = DEFAULT_TIMEOUT):
+        self.url = url.rstrip("/")
+        self.token = token
+        self.timeout = timeout
+        self.available = True
+
+    def request(self, path: str, body: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        if not self.available:
+            return None
+        headers = {"Content-Type": "application/json"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        try:
+            with urllib.request.urlopen(urllib.request.Request(self.url + path, data=data, headers=headers), timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            logger.warning(f"Cache server {self.url} unavailable ({e}); continuing without it.")
+            self.available = False
+            return None
+
+    def lookup(self, namespace: str, keys: List[str]) -> Dict[str, Any]:
+        found = {}
+        for start in range(0, len(keys), CHUNK_SIZE):
+            response = self.request(f"/{namespace}/lookup", {"keys": keys[start:start + CHUNK_SIZE]})
+            if response is None:
+                break
+            found.update(response.get("values", {}))
+        return found
+
+    def publish(self, namespace: str, values: Dict[str, Any]) -> int:
+        items = list(values.items())
+        stored = 0
+        for start in range(0, len(items), CHUNK_SIZE):
+            response = self.request(f"/{namespace}", {"values": dict(items[start:start + CHUNK_SIZE])})
+            if response is None:
+                break
+            stored += response.get("stored", 0)
+        return stored
+
+    def health(self) -> Optional[Dict[str, Any]]:
+        return self.request("/health")
+
+    def __repr__(self) -> str:
+        return self.url
+
+
+class SharedCache:
+    """The cache the pipeline consults, or nothing when none is configured."""
+
+    def __init__(self):
+        self.backend = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    def configure(self, location: Optional[str], token: Optional[str] = None):
+        location = (location or "").strip()
+        if not location:
+            self.backend = None
+        elif location == "local" or location.startswith("local:"):
+            self.backend = LocalCache(location[len("local:"):] or ":memory:")
+        else:
+            self.backend = CacheClient(location, token)
+        if self.backend is not None:
+            logger.info(f"Shared cache: looking up talent hashes and profileset results in {self.backend!r}.")
+
+    def lookup(self, namespace: str, keys: List[str]) -> Dict[str, Any]:
+        if self.backend is None or not keys:
+            return {}
+        return self.backend.lookup(namespace, list(keys))
+
+    def publish(self, namespace: str, values: Dict[str, Any]) -> int:
+        if self.backend is None or not values:
+            return 0
+        return self.backend.publish(namespace, values)
+
+
+shared_cache = SharedCache()
+
+
+def configure_shared_cache(location: Optional[str], token: Optional[str] = None):
+    shared_cache.configure(location, token)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Serve a shared cache of talent hashes and profileset results")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (0.0.0.0 for the LAN)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to listen on")
+    parser.add_argument("--db", default="sim_cache.sqlite", help="sqlite file holding the entries")
+    parser.add_argument("--token", help="Require this bearer token from clients")
+    args = parser.parse_args(argv)
+
+    server = CacheServer(CacheStore(args.db), args.host, args.port, args.token)
+    logger.info(f"Serving the shared cache from {args.db} on {server.url}")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server.server_close()
+        server.store.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    main()
@@ -0,0 +1,162 @@
+import json
+import math
+import os
+import statistics
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEED = 1
+Z_95 = 1.96
+# Two-sided 95% Student t quantiles by degrees of freedom, for small replicate counts
+T_95 = {1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306, 9: 2.262, 10: 2.228}
+
+
+@dataclass(frozen=True)
+class CrnSettings:
+    """Common random numbers: every simc run of a scenario uses the same pinned
+    seed with deterministic=1, so the baseline and each profileset see the same
+    random stream and their difference cancels most of the simulation noise.
+
+    With replicates > 1 the scenario is run once per seed (seed, seed+1, ...)
+    and the per-replicate deltas give a paired standard error for each
+    profileset."""
+
+    enabled: bool = False
+    seed: int = DEFAULT_SEED
+    replicates: int = 1
+
+    def seeds(self) -> List[int]:
+        return [self.seed + replicate for replicate in range(self.replicates if self.enabled else 1)]
+
+
+def replicate_path(output_path: str, replicate: int) -> str:
+    stem, extension = os.path.splitext(output_path)
+    return f"{stem}_crn{replicate}{extension}"
+
+
+def baseline_stats(report: Dict[str, Any]) -> tuple:
+    dps = report["sim"]["players"][0].get("collected_data", {}).get("dps", {})
+    return dps.get("mean", 0.0), dps.get("mean_std_dev", 0.0)
+
+
+def t_quantile(degrees_of_freedom: int) -> float:
+    return T_95.get(degrees_of_freedom, Z_95)
+
+
+def paired_deltas(reports: List[Dict[str, Any]]) -> Dict[str, Dict[str, Optional[float]]]:
+    """Delta to the baseline for every profileset, from one report per seed.
+
+    delta_error is the 95% half-width of the paired estimate (the spread of
+    the per-seed deltas), or None with a single replicate. independent_error
+    is what the same delta would carry if baseline and profileset were
+    simulated with unrelated random streams.
+    """
+    replicates = len(reports)
+    baselines = [baseline_stats(report) for report in reports]
+    per_profileset: Dict[str, List[tuple]] = {}
+    for report, (baseline_mean, baseline_error) in zip(reports, baselines):
+        for result in report["sim"]["profilesets"]["results"]:
+            per_profileset.setdefault(result["name"], []).append(
+                (result["mean"] - baseline_mean, result.get("mean_stddev", 0.0), baseline_error)
+            )
+
+    deltas = {}
+    for name, samples in per_profileset.items():
+        if len(samples) != replicates:
+            logger.warning(f"Profileset {name} is missing from some CRN replicates; skipping its paired delta.")
+            continue
+        differences = [difference for difference, _, _ in samples]
+        independent_variance = sum(error**2 + base_error**2 for _, error, base_error in samples) / replicates**2
+        paired_error = None
+        if replicates > 1:
+            paired_error = t_quantile(replicates - 1) * statistics.stdev(differences) / math.sqrt(replicates)
+        deltas[name] = {
+            "delta": statistics.fmean(differences),
+            "delta_error": paired_error,
+            "independent_error": Z_95 * math.sqrt(independent_variance),
+        }
+    return deltas
+
+
+def merge_replicates(reports: List[Dict[str, Any]], settings: CrnSettings) -> Dict[str, Any]:
+    """Fold the per-seed reports into one in the usual simc json2 layout.
+
+    Means are averaged over replicates and iterations summed; each profileset
+    result gains delta, delta_error and delta_error_independent fields. With a
+    single replicate delta_error falls back to the independent bound.
+    """
+    merged = reports[0]
+    replicates = len(reports)
+    deltas = paired_deltas(reports)
+
+    baseline_means = [baseline_stats(report)[0] for report in reports]
+    merged_dps = merged["sim"]["players"][0].setdefault("collected_data", {}).setdefault("dps", {})
+    merged_dps["mean"] = statistics.fmean(baseline_means)
+
+    results_by_name = {}
+    for report in reports:
+        for result in report["sim"]["profilesets"]["results"]:
+            results_by_name.setdefault(result["name"], []).append(result)
+
+    merged_results = []
+    for name, results in results_by_name.items():
+        result = dict(results[0])
+        result["mean"] = statistics.fmean(r["mean"] for r in results)
+        result["mean_stddev"] = math.sqrt(sum(r.get("mean_stddev", 0.0) ** 2 for r in results)) / len(results)
+        result["mean_error"] = Z_95 * result["mean_stddev"]
+        result["iterations"] = sum(r.get("iterations", 0) for r in results)
+        if name in deltas:
+            result["delta"] = deltas[name]["delta"]
+            result["delta_error"] = (
+                deltas[name]["delta_error"] if deltas[name]["delta_error"] is not None else deltas[name]["independent_error"]
+            )
+            result["delta_error_independent"] = deltas[name]["independent_error"]
+        merged_results.append(result)
+    merged_results.sort(key=lambda result: result["mean"], reverse=True)
+    merged["sim"]["profilesets"]["results"] = merged_results
+
+    merged["sim"]["common_random_numbers"] = {
+        "seed": settings.seed,
+        "replicates": replicates,
+        "variance_reduction": variance_reduction(deltas, replicates),
+    }
+    return merged
+
+
+def variance_reduction(deltas: Dict[str, Dict[str, Optional[float]]], replicates: int) -> Optional[float]:
+    """Median ratio of independent to paired delta variance across profilesets."""
+    ratios = [
+        ((entry["independent_error"] / Z_95) / (entry["delta_error"] / t_quantile(replicates - 1))) ** 2
+        for entry in deltas.values()
+        if entry["delta_error"]
+    ]
+    return statistics.median(ratios) if ratios else None
+
+
+def merge_replicate_files(replicate_files: List[str], output_file: str, settings: CrnSettings) -> bool:
+    reports = []
+    for replicate_file in replicate_files:
+        try:
+            with open(replicate_file, "r") as f:
+                reports.append(json.load(f))
+        except (IOError, json.JSONDecodeError) as e:
+            logger.error(f"Error reading CRN replicate {replicate_file}: {e}")
+            return False
+
+    merged = merge_replicates(reports, settings)
+    with open(output_file, "w") as f:
+        json.dump(merged, f, indent=2)
+
+    reduction = merged["sim"]["common_random_numbers"]["variance_reduction"]
+    if reduction:
+        logger.info(
+            f"CRN: merged {len(reports)} replicates into {os.path.basename(output_file)}, "
+            f"median delta variance reduction {reduction:.1f}x"
+        )
+    for replicate_file in replicate_files:
+        if os.path.abspath(replicate_file) != os.path.abspath(output_file):
+            os.remove(replicate_file)
+    return True
@@ -2,7 +2,10 @@ import os
 import json
 import sys
 import configparser
-from typing import Dict, List, Union, Any
+from functools import lru_cache
+from typing import Dict, List, Optional, Union, Any
+
+from stage_profiler import profiler
 
 
 def read_config(config_path: str) -> Dict[str, str]:
@@ -30,6 +33,12 @@ def load_json_file(file_path: str) -> List[Dict]:
         return json.load(file)
 
 
+@lru_cache(maxsize=None)
+def load_talent_dictionary(file_path: str) -> Dict:
+    # Read once per process; callers only look names up in it
+    return load_json_file(file_path)
+
+
 def get_talent_info(talent_dict: Dict, talent_type: str, talent: str) -> str:
     talent_info = talent_dict.get(talent_type, {}).get(talent, talent)
     if isinstance(talent_info, list):
@@ -253,55 +262,74 @@ def process_additional_data(additional_data: Dict[str, Any]) -> Dict[str, Any]:
     return processed_data
 
 
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: python compare_reports.py <config_file>")
-        sys.exit(1)
-
-    try:
-        config = read_config(sys.argv[1])
-        spec_name = config["spec_name"]
-        report_folder = config["report_folder"]
-
-        print(f"Generating report for {spec_name} spec")
+def generate_report(config_path: str, raw_data: Optional[Dict] = None) -> str:
+    """Write the website for a config and return its path.
 
-        root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        simulation_file = os.path.join(
-            root_dir, report_folder, "simulation_results.json"
-        )
-        talent_dict_file = os.path.join(root_dir, "talent_dictionary.json")
+    raw_data is the merged simulation results; when omitted they are read
+    from simulation_results.json in the report folder.
+    """
+    config = read_config(config_path)
+    spec_name = config["spec_name"]
+    report_folder = config["report_folder"]
 
-        for file_path in [simulation_file, talent_dict_file]:
-            if not os.path.exists(file_path):
-                raise FileNotFoundError(f"Required file not found: {file_path}")
+    print(f"Generating report for {spec_name} spec")
 
-        raw_data = load_json_file(simulation_file)
-        talent_dict = load_json_file(talent_dict_file)
+    root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    simulation_file = os.path.join(root_dir, report_folder, "simulation_results.json")
+    talent_dict_file = os.path.join(root_dir, "talent_dictionary.json")
+
+    required_files = [talent_dict_file] if raw_data is not None else [simulation_file, talent_dict_file]
+    for file_path in required_files:
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"Required file not found: {file_path}")
+
+    with profiler.stage("load_json"):
+        if raw_data is None:
+            raw_data = load_json_file(simulation_file)
+        talent_dict = load_talent_dictionary(talent_dict_file)
+    with profiler.stage("process_data"):
         processed_data = process_data(raw_data, talent_dict, spec_name)
 
-        print("\nProcessed simulation types:")
-        print(", ".join(processed_data.keys()))
+    print("\nProcessed simulation types:")
+    print(", ".join(processed_data.keys()))
 
-        print("\nAdditional data sections:")
-        additional_sections = set(raw_data.keys()) - set(processed_data.keys())
-        print(", ".join(additional_sections))
+    print("\nAdditional data sections:")
+    additional_sections = set(raw_data.keys()) - set(processed_data.keys())
+    print(", ".join(additional_sections))
 
-        # Process additional data
-        additional_data = {key: raw_data[key] for key in additional_sections}
+    # Process additional data
+    additional_data = {key: raw_data[key] for key in additional_sections}
+    with profiler.stage("process_additional_data"):
         processed_additional_data = process_additional_data(additional_data)
 
+    with profiler.stage("generate_html"):
         html = generate_html(
             processed_data, processed_additional_data, spec_name, talent_dict
         )
 
-        output_folder = os.path.join(root_dir, f"website_{spec_name.lower()}")
-        os.makedirs(output_folder, exist_ok=True)
-        output_path = os.path.join(output_folder, f"{spec_name.lower()}.html")
+    output_folder = os.path.join(root_dir, f"website_{spec_name.lower()}")
+    os.makedirs(output_folder, exist_ok=True)
+    output_path = os.path.join(output_folder, f"{spec_name.lower()}.html")
+
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write(html)
+
+    print(f"\nReport generated for {spec_name} spec at {output_path}")
+    return output_path
 
-        with open(output_path, "w", encoding="utf-8") as f:
-            f.write(html)
 
-        print(f"\nReport generated for {spec_name} spec at {output_path}")
+def main(argv: Optional[List[str]] = None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        print("Usage: python compare_reports.py <config_file> [--profile]")
+        sys.exit(1)
+
+    try:
+        if "--profile" in argv[1:]:
+            config = read_config(argv[0])
+            root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            profiler.start(os.path.join(root_dir, config["report_folder"]), "compare_reports")
+        generate_report(argv[0])
 
     except (FileNotFoundError, ValueError, KeyError, json.JSONDecodeError) as e:
         print(f"Error: {e}")
@@ -312,6 +340,9 @@ def main():
 
         traceback.print_exc()
         sys.exit(1)
+    finally:
+        # Write the stats gathered so far, also when the report failed
+        profiler.stop()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,134 @@
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from factorial_design import Cell, build_name
+
+logger = logging.getLogger(__name__)
+
+# Sweep order within a round; index into a (hero, class, spec) cell
+DIMENSIONS = [("spec", 2), ("class", 1), ("hero", 0)]
+
+
+@dataclass(frozen=True)
+class CoordinateSettings:
+    """Sweep one template dimension at a time through the current leader."""
+
+    enabled: bool = False
+    max_rounds: int = 5
+
+
+@dataclass
+class CoordinateResult:
+    best: Cell
+    best_mean: float
+    rounds: int = 0
+    converged: bool = False
+    sweeps: List[dict] = field(default_factory=list)
+    means: Dict[Cell, float] = field(default_factory=dict)
+
+
+# evaluate(cells, stage) -> mean DPS per simulated cell; an empty dict means the sweep failed
+SweepEvaluator = Callable[[List[Cell], str], Dict[Cell, float]]
+
+
+class CoordinateSearch:
+    """Coordinate descent over hero, class and spec templates.
+
+    Each round fixes the leader's class and hero templates and sweeps every
+    spec template, then sweeps the class templates with the best spec, then
+    the hero templates, one profileset batch per sweep. Rounds repeat until
+    the leader stops changing. A round costs about heroes + classes + specs
+    builds instead of their product. The leader is simulated again in every
+    sweep so it is always compared within the same run, and builds already
+    simulated in an earlier sweep are not repeated.
+    """
+
+    def __init__(self, heroes: List[str], classes: List[str], specs: List[str], settings: CoordinateSettings):
+        self.heroes = heroes
+        self.classes = classes
+        self.specs = specs
+        self.settings = settings
+        self.sizes = (len(heroes), len(classes), len(specs))
+
+    @property
+    def total(self) -> int:
+        return self.sizes[0] * self.sizes[1] * self.sizes[2]
+
+    def name(self, cell: Cell) -> str:
+        h, c, s = cell
+        return build_name(self.heroes[h], self.classes[c], self.specs[s])
+
+    def cell(self, name: str) -> Optional[Cell]:
+        for h, hero in enumerate(self.heroes):
+            for c, class_name in enumerate(self.classes):
+                prefix = build_name(hero, class_name, "")
+                if name.startswith(prefix) and name[len(prefix):] in self.specs:
+                    return h, c, self.specs.index(name[len(prefix):])
+        return None
+
+    def line(self, cell: Cell, axis: int) -> List[Cell]:
+        return [cell[:axis] + (i,) + cell[axis + 1:] for i in range(self.sizes[axis])]
+
+    def cross(self, cell: Cell) -> List[Cell]:
+        """Every build one template away from cell, plus cell itself."""
+        cells = [cell]
+        for _, axis in DIMENSIONS:
+            cells.extend(other for other in self.line(cell, axis) if other != cell)
+        return cells
+
+    def start(self, previous_results: Optional[List[dict]] = None) -> Cell:
+        """The best build of a previous report for this scenario, else the first templates."""
+        for result in sorted(previous_results or [], key=lambda result: result["mean"], reverse=True):
+            cell = self.cell(result["name"])
+            if cell is not None:
+                return cell
+        return (0, 0, 0)
+
+    def run(self, start: Cell, evaluate: SweepEvaluator) -> Optional[CoordinateResult]:
+        leader = start
+        result = CoordinateResult(best=start, best_mean=float("nan"))
+        for round_number in range(1, self.settings.max_rounds + 1):
+            round_start = leader
+            result.rounds = round_number
+            for dimension, axis in DIMENSIONS:
+                line = self.line(leader, axis)
+                cells = [leader] + [cell for cell in line if cell != leader and cell not in result.means]
+                if len(cells) == 1 and leader in result.means:
+                    continue
+                means = evaluate(cells, f"coordinate_{round_number}_{dimension}")
+                if not means:
+                    return None
+                result.means.update(means)
+                leader = max((cell for cell in line if cell in result.means), key=result.means.get)
+                result.sweeps.append({
+                    "round": round_number,
+                    "dimension": dimension,
+                    "simulated": len(means),
+                    "leader": self.name(leader),
+                    "mean": result.means[leader],
+                })
+                logger.info(f"Coordinate descent: {dimension} sweep of {len(means)} build(s), leader {self.name(leader)}")
+            if leader == round_start:
+                result.converged = True
+                break
+        result.best = leader
+        result.best_mean = result.means.get(leader, float("nan"))
+        return result
+
+
+def write_coordinate_report(path: str, label: str, search: CoordinateSearch, result: CoordinateResult):
+    report = {
+        "run": label,
+        "builds": search.total,
+        "simulated": len(result.means),
+        "rounds": result.rounds,
+        "converged": result.converged,
+        "best": search.name(result.best),
+        "best_mean": result.best_mean,
+        "sweeps": result.sweeps,
+    }
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"Coordinate descent report written to {path}")
@@ -0,0 +1,168 @@
+import glob
+import os
+import re
+import threading
+import logging
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SYS_ROOT = "/sys/devices/system"
+
+
+def parse_cpulist(text: str) -> List[int]:
+    """CPU numbers of a sysfs list such as "0-3,8-11"."""
+    cpus = []
+    for part in filter(None, text.strip().split(",")):
+        first, _, last = part.partition("-")
+        cpus.extend(range(int(first), int(last or first) + 1))
+    return cpus
+
+
+def format_cpulist(cpus) -> str:
+    """The sysfs list form of a set of CPU numbers."""
+    ranges = []
+    for cpu in sorted(cpus):
+        if ranges and cpu == ranges[-1][1] + 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ",".join(f"{first}-{last}" if last > first else str(first) for first, last in ranges)
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path, "r") as f:
+            return f.read()
+    except (IOError, OSError):
+        return None
+
+
+@dataclass
+class CpuTopology:
+    """The CPUs this process may use, grouped by NUMA node (or by socket where
+    the kernel exposes no nodes) and ordered one hardware thread per physical
+    core first, then the SMT siblings."""
+
+    nodes: List[List[int]]
+    sibling_rank: Dict[int, int] = field(default_factory=dict)
+
+    @property
+    def cpus(self) -> List[int]:
+        return [cpu for node in self.nodes for cpu in node]
+
+    @classmethod
+    def read(cls, root: str = SYS_ROOT, allowed: Optional[List[int]] = None) -> "CpuTopology":
+        allowed_set = set(allowed if allowed is not None else os.sched_getaffinity(0))
+        sibling_rank = {}
+        packages: Dict[int, List[int]] = {}
+        for cpu in allowed_set:
+            topology = os.path.join(root, "cpu", f"cpu{cpu}", "topology")
+            siblings = parse_cpulist(_read(os.path.join(topology, "thread_siblings_list")) or "")
+            sibling_rank[cpu] = siblings.index(cpu) if cpu in siblings else 0
+            package = _read(os.path.join(topology, "physical_package_id"))
+            packages.setdefault(int(package) if package else 0, []).append(cpu)
+
+        nodes = []
+        for path in sorted(glob.glob(os.path.join(root, "node", "node*", "cpulist")), key=lambda p: int(re.findall(r"node(\d+)", p)[-1])):
+            cpus = [cpu for cpu in parse_cpulist(_read(path) or "") if cpu in allowed_set]
+            if cpus:
+                nodes.append(cpus)
+        if not nodes:
+            nodes = [packages[package] for package in sorted(packages)]
+        return cls([sorted(node, key=lambda cpu: (sibling_rank.get(cpu, 0), cpu)) for node in nodes], sibling_rank)
+
+
+class CpuPlacer:
+    """Assigns each simc run a set of CPUs and pins the launching thread to it,
+    so the simc process (and every thread it starts) inherits the mask.
+
+    A run goes to the single NUMA node with the fewest idle CPUs that can
+    still hold it, keeping large holes for large runs; otherwise it spans the
+    fewest nodes, most idle first. Physical cores are used before their SMT
+    siblings. When more threads are leased than CPUs are idle, the least
+    loaded CPUs are shared rather than blocking, since the core budgets
+    already decide how many threads run at once.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.topology: Optional[CpuTopology] = None
+        self.usage: Dict[int, int] = {}
+        self.lock = threading.Lock()
+
+    def configure(self, enabled: bool, root: str = SYS_ROOT):
+        self.enabled = False
+        if not enabled:
+            return
+        if not hasattr(os, "sched_setaffinity"):
+            logger.warning("CPU affinity is not supported on this platform; simc processes will not be pinned.")
+            return
+        self.topology = CpuTopology.read(root)
+        self.usage = {cpu: 0 for cpu in self.topology.cpus}
+        self.enabled = bool(self.usage)
+        logger.info(f"CPU affinity: {len(self.usage)} CPU(s) in {len(self.topology.nodes)} NUMA node(s).")
+
+    def _choose(self, threads: int) -> List[int]:
+        nodes = self.topology.nodes
+        idle = [[cpu for cpu in node if self.usage[cpu] == 0] for node in nodes]
+        fitting = [free for free in idle if len(free) >= threads]
+        if fitting:
+            return min(fitting, key=len)[:threads]
+
+        chosen: List[int] = []
+        for free in sorted(idle, key=len, reverse=True):
+            chosen += free[:threads - len(chosen)]
+            if len(chosen) == threads:
+                return chosen
+        shared = sorted(
+            (cpu for cpu in self.usage if cpu not in chosen),
+            key=lambda cpu: (self.usage[cpu], self.topology.sibling_rank.get(cpu, 0), cpu)
+        )
+        return chosen + shared[:threads - len(chosen)]
+
+    def place(self, threads: int) -> List[int]:
+        with self.lock:
+            cpus = self._choose(max(1, min(threads, len(self.usage))))
+            for cpu in cpus:
+                self.usage[cpu] += 1
+        return cpus
+
+    def release(self, cpus: List[int]):
+        with self.lock:
+            for cpu in cpus:
+                self.usage[cpu] -= 1
+
+    @contextmanager
+    def pinned(self, threads: Optional[int]) -> Iterator[Optional[List[int]]]:
+        """Pin the calling thread to a placement of threads CPUs for the block.
+
+        Yields the CPUs, whose count is the thread count the simc input should
+        use, or None when affinity is off or no thread count applies.
+        """
+        if not self.enabled or not threads:
+            yield None
+            return
+        cpus = self.place(threads)
+        previous = os.sched_getaffinity(0)
+        try:
+            os.sched_setaffinity(0, cpus)
+        except OSError as e:
+            logger.warning(f"Could not pin to CPUs {cpus}: {e}")
+            self.release(cpus)
+            cpus = None
+        try:
+            yield cpus
+        finally:
+            if cpus:
+                os.sched_setaffinity(0, previous)
+                self.release(cpus)
+
+
+placer = CpuPlacer()
+
+
+def configure_affinity(enabled: bool, root: str = SYS_ROOT):
+    placer.configure(enabled, root)
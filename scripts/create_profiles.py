@@ -1,14 +1,13 @@
-import subprocess
 import json
 import os
 import re
 import sys
 import configparser
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 
 import logging
 
-logging.basicConfig(level=logging.INFO)
+CHANGES_FILE = "profileset_changes.json"
 
 
 def load_json(file_name: str) -> List[Dict[str, Any]]:
@@ -167,7 +166,20 @@ def generate_consumable_profilesets(consumables: List[Dict[str, Any]]) -> List[s
     return profilesets
 
 
-def write_profilesets(profilesets: List[str], filename: str) -> None:
+def read_profilesets(filename: str) -> Dict[str, str]:
+    """The lines of each profileset in a profileset file, by name."""
+    blocks: Dict[str, List[str]] = {}
+    if os.path.exists(filename):
+        with open(filename, "r") as f:
+            for line in f:
+                if line.startswith("profileset."):
+                    blocks.setdefault(line.split('"')[1], []).append(line.rstrip("\n"))
+    return {name: "\n".join(lines) for name, lines in blocks.items()}
+
+
+def write_profilesets(profilesets: List[str], filename: str) -> Dict[str, List[str]]:
+    """Write a profileset file unless its content is unchanged; returns the
+    names of the profilesets added, removed or changed since the last write."""
     unique_profilesets = {}
     for profileset in profilesets:
         name = profileset.split('"')[1]  # Extract the name between quotes
@@ -175,20 +187,51 @@ def write_profilesets(profilesets: List[str], filename: str) -> None:
             unique_profilesets[name] = []
         unique_profilesets[name].append(profileset)
 
+    content = "".join(
+        "\n".join(profileset_lines) + "\n\n"
+        for profileset_lines in unique_profilesets.values()
+    )
+    previous = read_profilesets(filename)
+    current = {
+        name: "\n".join(profileset_lines).strip()
+        for name, profileset_lines in unique_profilesets.items()
+    }
+    changes = {
+        "added": sorted(set(current) - set(previous)),
+        "removed": sorted(set(previous) - set(current)),
+        "changed": sorted(
+            name for name in set(current) & set(previous) if current[name] != previous[name]
+        ),
+    }
+
+    existing = None
+    if os.path.exists(filename):
+        with open(filename, "r") as f:
+            existing = f.read()
+    if existing == content:
+        # Leave the file alone so stages reading it stay up to date
+        print(f"{len(unique_profilesets)} unique profilesets in {filename} unchanged")
+        return changes
+
     with open(filename, "w") as f:
-        for profileset_lines in unique_profilesets.values():
-            f.write("\n".join(profileset_lines) + "\n\n")
+        f.write(content)
 
-    print(f"Generated {len(unique_profilesets)} unique profilesets in {filename}")
+    print(
+        f"Generated {len(unique_profilesets)} unique profilesets in {filename} "
+        f"({len(changes['added'])} added, {len(changes['removed'])} removed, {len(changes['changed'])} changed)"
+    )
+    return changes
 
 
 def write_enchant_profilesets(
     profilesets: Dict[str, List[str]], base_path: str
-) -> None:
+) -> Dict[str, Dict[str, List[str]]]:
+    changes = {}
     for category, profiles in profilesets.items():
         if profiles:
             filename = f"{base_path}/enchant_profilesets_{category.lower()}.simc"
-            write_profilesets(profiles, filename)
+            changes[os.path.basename(filename)] = write_profilesets(profiles, filename)
+    return changes
 
 
 inventory_type_to_slot = {
@@ -358,12 +401,19 @@ def apply_embellishment(
         return gear, slot
 
 
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: python create_profiles.py <path_to_config.ini>")
-        sys.exit(1)
+def create_profiles(
+    config_path: str,
+    fetch: bool = True,
+    filtered: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+) -> Optional[Dict[str, List[Dict[str, Any]]]]:
+    """Write the supplemental profileset files of a config's APL folder.
 
-    config_path = os.path.abspath(sys.argv[1])
+    The item data comes from filtered, as returned by a previous call or by
+    filter_items_enchants.fetch_and_filter, else from a fresh fetch, else
+    from the /data folder. Returns the item data used, so a batch can pass
+    it on to the next config instead of reading it again.
+    """
+    config_path = os.path.abspath(config_path)
     config_dir = os.path.dirname(config_path)
 
     config = configparser.ConfigParser()
@@ -375,33 +425,33 @@ def main():
     print(f"Config file: {config_path}")
     print(f"APL folder: {apl_folder_full_path}")
 
-    print("Fetching and filtering items and enchants...")
-
-    # Get the directory of the current script
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-
-    # Run the filter_items_enchants.py script with the full path
-    filter_script_path = os.path.join(script_dir, "filter_items_enchants.py")
-    subprocess.run([sys.executable, filter_script_path], check=True)
+    if filtered is not None:
+        # A batch run fetches the items and enchants once for all configs
+        print("Using the items and enchants already loaded...")
+    elif fetch:
+        print("Fetching and filtering items and enchants...")
+        from filter_items_enchants import fetch_and_filter
 
-    data_dir = os.path.join(config_dir, "data")
-    required_files = [
-        os.path.join(data_dir, "filtered_items.json"),
-        os.path.join(data_dir, "filtered_enchants.json"),
-        os.path.join(data_dir, "filtered_consumables.json"),
-        os.path.join(data_dir, "filtered_embellishments.json"),
-    ]
-    if not all(os.path.exists(file) for file in required_files):
-        print(
-            "Error: Required JSON files not found in the /data folder. Make sure filter_items_enchants.py created these files."
-        )
-        return
+        filtered = fetch_and_filter()
+    else:
+        print("Using the items and enchants already in the /data folder...")
+        data_dir = os.path.join(config_dir, "data")
+        required_files = {
+            name: os.path.join(data_dir, f"filtered_{name}.json")
+            for name in ["items", "enchants", "consumables", "embellishments"]
+        }
+        if not all(os.path.exists(file) for file in required_files.values()):
+            print(
+                "Error: Required JSON files not found in the /data folder. Make sure filter_items_enchants.py created these files."
+            )
+            return None
+        filtered = {name: load_json(file) for name, file in required_files.items()}
 
-    trinkets = load_json(required_files[0])
-    enchants = load_json(required_files[1])
-    gems = load_json(required_files[1])
-    consumables = load_json(required_files[2])
-    embellishments = load_json(required_files[3])
+    trinkets = filtered["items"]
+    enchants = filtered["enchants"]
+    gems = filtered["enchants"]
+    consumables = filtered["consumables"]
+    embellishments = filtered["embellishments"]
 
     gear_file_path = os.path.join(apl_folder_full_path, "gear.simc")
     print(f"Looking for gear file at: {gear_file_path}")
@@ -411,36 +461,56 @@ def main():
         print(
             "Please make sure the apl_folder in your config.ini is correct and contains a gear.simc file."
         )
-        return
+        return filtered
 
     gear = load_gear(gear_file_path)
+    changes = {}
 
     trinket_profilesets = generate_trinket_profilesets(trinkets)
-    write_profilesets(
+    changes["trinket_profilesets.simc"] = write_profilesets(
         trinket_profilesets,
         os.path.join(apl_folder_full_path, "trinket_profilesets.simc"),
     )
 
     enchant_profilesets = generate_enchant_profilesets(enchants, gear)
-    write_enchant_profilesets(enchant_profilesets, apl_folder_full_path)
+    changes.update(write_enchant_profilesets(enchant_profilesets, apl_folder_full_path))
 
     gem_profilesets = generate_gem_profilesets(gems, gear)
-    write_profilesets(
+    changes["gem_profilesets.simc"] = write_profilesets(
         gem_profilesets, os.path.join(apl_folder_full_path, "gem_profilesets.simc")
     )
 
     consumable_profilesets = generate_consumable_profilesets(consumables)
-    write_profilesets(
+    changes["consumable_profilesets.simc"] = write_profilesets(
         consumable_profilesets,
         os.path.join(apl_folder_full_path, "consumable_profilesets.simc"),
     )
 
     embellishment_profilesets = generate_embellishment_profilesets(embellishments, gear)
-    write_profilesets(
+    changes["embellishment_profilesets.simc"] = write_profilesets(
         embellishment_profilesets,
         os.path.join(apl_folder_full_path, "embellishment_profilesets.simc"),
     )
 
+    # The change set lists, per file, the profilesets whose results are out of date
+    with open(os.path.join(apl_folder_full_path, CHANGES_FILE), "w") as f:
+        json.dump(
+            {name: change for name, change in changes.items() if any(change.values())},
+            f,
+            indent=2,
+        )
+    return filtered
+
+
+def main(argv: Optional[List[str]] = None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        print("Usage: python create_profiles.py <path_to_config.ini> [--skip-fetch]")
+        sys.exit(1)
+
+    create_profiles(argv[0], fetch="--skip-fetch" not in argv[1:])
+
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     main()
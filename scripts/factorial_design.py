@@ -0,0 +1,252 @@
+import json
+import math
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+Cell = Tuple[int, int, int]  # hero, class and spec template indices
+
+
+@dataclass(frozen=True)
+class FactorialSettings:
+    """Simulate a structured fraction of the hero x class x spec product.
+
+    Every hero is paired with every spec template `replicates` times, each
+    time with a different class template, cycling the classes. When there are
+    too few specs for the cycle to link every class to the others, extra
+    builds are added until each hero's classes and specs are connected
+    through simulated builds. That keeps the hero, class and spec main
+    effects and the hero x class and hero x spec interactions estimable;
+    class x spec interactions are not modelled.
+    """
+
+    enabled: bool = False
+    replicates: int = 2
+    confirm_top: int = 20
+
+
+@dataclass
+class CellPrediction:
+    name: str
+    mean: float
+    stddev: Optional[float]
+
+
+def pseudo_inverse(gram: np.ndarray) -> Tuple[np.ndarray, int]:
+    """Pseudo-inverse and rank of a symmetric positive semi-definite matrix.
+
+    The one-hot design is rank deficient by construction, so eigenvalues
+    below a relative cutoff are treated as exactly zero rather than inverted.
+    """
+    eigenvalues, eigenvectors = np.linalg.eigh(gram)
+    keep = eigenvalues > eigenvalues.max() * 1e-10
+    kept = eigenvectors[:, keep]
+    return (kept / eigenvalues[keep]) @ kept.T, int(keep.sum())
+
+
+def build_name(hero: str, class_name: str, spec: str) -> str:
+    return f"[{hero}] ({class_name}) - {spec}"
+
+
+class FactorialDesign:
+    def __init__(self, heroes: List[str], classes: List[str], specs: List[str], settings: FactorialSettings):
+        self.heroes = heroes
+        self.classes = classes
+        self.specs = specs
+        self.settings = settings
+        self.replicates = max(1, min(settings.replicates, len(classes)))
+
+    @property
+    def total(self) -> int:
+        return len(self.heroes) * len(self.classes) * len(self.specs)
+
+    @property
+    def complete(self) -> bool:
+        """True when the fraction would be the whole product anyway."""
+        return self.replicates >= len(self.classes)
+
+    def cells(self) -> List[Cell]:
+        heroes, classes, specs = len(self.heroes), len(self.classes), len(self.specs)
+        if self.complete:
+            return [(h, c, s) for h in range(heroes) for c in range(classes) for s in range(specs)]
+        spacing = classes // self.replicates
+        # Shift each hero's class cycle so class x spec pairs differ between heroes
+        shift = max(1, spacing // heroes)
+        cells = [
+            (h, (s + r * spacing + h * shift) % classes, s)
+            for h in range(heroes)
+            for s in range(specs)
+            for r in range(self.replicates)
+        ]
+        # With fewer specs x replicates than classes the cycle leaves classes
+        # unseen or only seen with specs no other class shares; their hero x
+        # class terms would then absorb the spec effects. Link each such class
+        # to the specs already connected to the first spec, per hero.
+        for h in range(heroes):
+            parent = list(range(classes + specs))  # classes, then specs
+
+            def find(node):
+                while parent[node] != node:
+                    parent[node] = parent[parent[node]]
+                    node = parent[node]
+                return node
+
+            for cell_hero, c, s in cells:
+                if cell_hero == h:
+                    parent[find(c)] = find(classes + s)
+            for c in range(classes):
+                if find(c) != find(classes):
+                    linked = [s for s in range(specs) if find(classes + s) == find(classes)]
+                    s = linked[(c + h) % len(linked)]
+                    cells.append((h, c, s))
+                    parent[find(c)] = find(classes)
+        return cells
+
+    def name(self, cell: Cell) -> str:
+        h, c, s = cell
+        return build_name(self.heroes[h], self.classes[c], self.specs[s])
+
+    def all_cells(self) -> List[Cell]:
+        return [(h, c, s) for h in range(len(self.heroes)) for c in range(len(self.classes)) for s in range(len(self.specs))]
+
+
+class FactorialModel:
+    """Least-squares fit of DPS = mean + hero + class + spec + hero x class + hero x spec.
+
+    The minimum-norm solution is used, so the one-hot columns need no
+    reference levels; every prediction for a cell whose hero x class and
+    hero x spec pairs were observed is estimable. With a single replicate the
+    hero x spec terms would absorb every observation, so they are dropped.
+    """
+
+    def __init__(self, design: FactorialDesign):
+        self.design = design
+        heroes, classes, specs = len(design.heroes), len(design.classes), len(design.specs)
+        self.use_hero_spec = design.replicates > 1
+        self.offsets = {"hero": 1, "class": 1 + heroes, "spec": 1 + heroes + classes}
+        self.offsets["hero_class"] = self.offsets["spec"] + specs
+        self.offsets["hero_spec"] = self.offsets["hero_class"] + heroes * classes
+        self.size = self.offsets["hero_spec"] + (heroes * specs if self.use_hero_spec else 0)
+        self.coefficients = None
+        self.covariance = None
+        self.residual_variance: Optional[float] = None
+        self.r2: Optional[float] = None
+
+    def columns(self, cell: Cell) -> List[int]:
+        h, c, s = cell
+        classes, specs = len(self.design.classes), len(self.design.specs)
+        columns = [
+            0,
+            self.offsets["hero"] + h,
+            self.offsets["class"] + c,
+            self.offsets["spec"] + s,
+            self.offsets["hero_class"] + h * classes + c,
+        ]
+        if self.use_hero_spec:
+            columns.append(self.offsets["hero_spec"] + h * specs + s)
+        return columns
+
+    def fit(self, cells: List[Cell], targets: List[float]):
+        x = np.zeros((len(cells), self.size))
+        for row, cell in enumerate(cells):
+            x[row, self.columns(cell)] = 1.0
+        y = np.asarray(targets, dtype=float)
+        gram_inverse, rank = pseudo_inverse(x.T @ x)
+        self.coefficients = gram_inverse @ (x.T @ y)
+        residuals = y - x @ self.coefficients
+        degrees_of_freedom = len(cells) - rank
+        if degrees_of_freedom > 0:
+            self.residual_variance = float(residuals @ residuals) / degrees_of_freedom
+            self.covariance = self.residual_variance * gram_inverse
+        total = float(np.sum((y - y.mean()) ** 2))
+        self.r2 = 1.0 - float(residuals @ residuals) / total if total > 0 else None
+        logger.info(
+            f"Factorial: fitted {len(cells)} builds, {degrees_of_freedom} residual degrees of freedom, "
+            f"R² {self.r2 if self.r2 is not None else float('nan'):.3f}"
+        )
+
+    def predict(self, cell: Cell) -> Tuple[float, Optional[float]]:
+        columns = self.columns(cell)
+        mean = float(sum(self.coefficients[column] for column in columns))
+        if self.covariance is None:
+            return mean, None
+        variance = float(self.covariance[np.ix_(columns, columns)].sum()) + self.residual_variance
+        return mean, math.sqrt(max(0.0, variance))
+
+    def grid(self) -> np.ndarray:
+        """Predicted DPS for every cell, indexed [hero, class, spec]."""
+        heroes, classes, specs = len(self.design.heroes), len(self.design.classes), len(self.design.specs)
+        coefficients = self.coefficients
+        hero = coefficients[self.offsets["hero"]:self.offsets["class"]]
+        class_effect = coefficients[self.offsets["class"]:self.offsets["spec"]]
+        spec = coefficients[self.offsets["spec"]:self.offsets["hero_class"]]
+        hero_class = coefficients[self.offsets["hero_class"]:self.offsets["hero_spec"]].reshape(heroes, classes)
+        grid = (
+            coefficients[0]
+            + hero[:, None, None]
+            + class_effect[None, :, None]
+            + spec[None, None, :]
+            + hero_class[:, :, None]
+        )
+        if self.use_hero_spec:
+            grid = grid + coefficients[self.offsets["hero_spec"]:].reshape(heroes, specs)[:, None, :]
+        return grid
+
+    def effects(self) -> Dict[str, Dict[str, float]]:
+        """Main effects and two-factor interactions as deviations of the marginal means."""
+        grid = self.grid()
+        overall = grid.mean()
+        hero = grid.mean(axis=(1, 2)) - overall
+        class_effect = grid.mean(axis=(0, 2)) - overall
+        spec = grid.mean(axis=(0, 1)) - overall
+        hero_class = grid.mean(axis=2) - overall - hero[:, None] - class_effect[None, :]
+        hero_spec = grid.mean(axis=1) - overall - hero[:, None] - spec[None, :]
+        design = self.design
+        return {
+            "overall": {"mean": float(overall)},
+            "hero": dict(zip(design.heroes, map(float, hero))),
+            "class": dict(zip(design.classes, map(float, class_effect))),
+            "spec": dict(zip(design.specs, map(float, spec))),
+            "hero_class": {
+                f"{hero_name} / {class_name}": float(hero_class[h, c])
+                for h, hero_name in enumerate(design.heroes)
+                for c, class_name in enumerate(design.classes)
+            },
+            "hero_spec": {
+                f"{hero_name} / {spec_name}": float(hero_spec[h, s])
+                for h, hero_name in enumerate(design.heroes)
+                for s, spec_name in enumerate(design.specs)
+            },
+        }
+
+
+def extrapolate(model: FactorialModel, simulated: set) -> List[CellPrediction]:
+    """Predictions for every cell that was not simulated, best first."""
+    predictions = [
+        CellPrediction(model.design.name(cell), *model.predict(cell))
+        for cell in model.design.all_cells()
+        if model.design.name(cell) not in simulated
+    ]
+    predictions.sort(key=lambda prediction: prediction.mean, reverse=True)
+    return predictions
+
+
+def write_factorial_report(path: str, label: str, model: FactorialModel, simulated: int, confirmed: List[str], predictions: List[CellPrediction]):
+    report = {
+        "run": label,
+        "builds": model.design.total,
+        "simulated": simulated,
+        "replicates": model.design.replicates,
+        "r2": model.r2,
+        "residual_stddev": math.sqrt(model.residual_variance) if model.residual_variance is not None else None,
+        "confirmed": confirmed,
+        "effects": model.effects(),
+        "predictions": [prediction.__dict__ for prediction in predictions],
+    }
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"Factorial effects and predictions written to {path}")
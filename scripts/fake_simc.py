@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""Deterministic stand-in for the simc CLI used to benchmark the pipeline.
+
+Supports the three ways the toolkit calls simc:
+  fake_simc.py input.simc [json2=...] [html=...]   profileset runs
+  fake_simc.py input.simc save=out.simc           APL compilation
+  fake_simc.py spell_query=talent.name=<name>     talent lookups for hashing
+
+Reported means carry simulation noise of the size real simc would report for
+the iteration count. With deterministic=1 the noise is drawn from the seed,
+and the baseline and all profilesets share most of it, like simc runs with
+common random numbers.
+
+Timing is controlled through environment variables:
+  FAKE_SIMC_PROFILESET_MS  simulated thread-milliseconds per profileset (default 0)
+  FAKE_SIMC_BASELINE_MS    simulated milliseconds for the baseline (default 0)
+
+FAKE_SIMC_FAIL_PATTERN makes the run exit non-zero when a profileset's name
+or options contain the given text, for exercising failure recovery.
+"""
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import sys
+import time
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(SCRIPT_DIR)
+TEMPLATE_FILE = os.path.join(ROOT_DIR, "reports_havoc", "sim_output.json")
+TALENTS_CACHE_FILE = os.path.join(ROOT_DIR, "data", "talents_cache.json")
+
+PROFILESET_PATTERN = re.compile(r'^profileset\."([^"]+)"\+?=(.*)$', re.MULTILINE)
+OPTION_PATTERN = re.compile(r"^(\w+)=(.*)$", re.MULTILINE)
+
+
+def stable_fraction(text):
+    """Map text to a repeatable value in [-1, 1)."""
+    digest = hashlib.sha1(text.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") / 2**63 - 1
+
+
+RELATIVE_STDDEV = 0.035
+SHARED_NOISE = 0.9  # share of the noise common to all profilesets of a seeded run
+
+
+def noise_source(options):
+    if options.get("deterministic") == "1" and "seed" in options:
+        return options["seed"]
+    return None
+
+
+def noisy_mean(mean, iterations, seed, name):
+    """Add mean-of-iterations noise; seeded runs share a common component."""
+    if seed is None:
+        shared, own = random.gauss(0, 1), random.gauss(0, 1)
+    else:
+        shared, own = random.Random(seed).gauss(0, 1), random.Random(f"{seed}|{name}").gauss(0, 1)
+    z = SHARED_NOISE * shared + math.sqrt(1 - SHARED_NOISE**2) * own
+    return mean * (1 + z * RELATIVE_STDDEV / math.sqrt(max(1, iterations)))
+
+
+def profileset_dps(base_dps, name, values):
+    """Talent builds score as a sum of per-talent effects plus a small
+    build-specific term, so their DPS is learnable from the talents; other
+    profilesets (items, gems, enchants) get a repeatable per-option value."""
+    talents = [
+        entry.partition(":")
+        for value in values
+        for option, _, talent_string in [value.strip('"').partition("=")]
+        if option.endswith("_talents")
+        for entry in talent_string.split("/")
+    ]
+    if not talents:
+        return base_dps * (1 + stable_fraction(name + "|".join(values)) * 0.1)
+    effect = sum(stable_fraction(talent) * 0.01 * (int(rank) if rank.isdigit() else 1) for talent, _, rank in talents)
+    return base_dps * (1 + effect + stable_fraction(name) * 0.005)
+
+
+def progress_bar(current, total, length=20):
+    filled = int(length * current / total) if total else length
+    return "=" * filled + ">" + "." * max(0, length - filled - 1)
+
+
+def spell_query(query):
+    name = query.split("=")[-1]
+    with open(TALENTS_CACHE_FILE, "r") as f:
+        talent_data = json.load(f)
+    for tree in talent_data:
+        for key in ["classNodes", "specNodes", "heroNodes"]:
+            for node in tree[key]:
+                for entry in node["entries"]:
+                    # Same token rules as talentvalidator.talent_token
+                    token = re.sub(
+                        r"[^a-z0-9_]",
+                        "",
+                        entry.get("name", "").lower().replace(" ", "_").replace("-", "_"),
+                    )
+                    if token == name:
+                        print(f"Name          : {entry['name']}")
+                        print(f"Entry         : {entry['id']}")
+                        print(f"Node          : {node['id']}")
+                        return 0
+    return 0
+
+
+def parse_input(input_file, overrides):
+    with open(input_file, "r") as f:
+        content = f.read()
+
+    options = {}
+    for key, value in OPTION_PATTERN.findall(content):
+        options[key] = value.strip()
+    for override in overrides:
+        key, _, value = override.partition("=")
+        options[key] = value
+
+    profilesets = {}
+    for name, value in PROFILESET_PATTERN.findall(content):
+        profilesets.setdefault(name, []).append(value)
+    return options, profilesets
+
+
+def result_entry(name, mean, iterations):
+    stddev = mean * RELATIVE_STDDEV
+    mean_stddev = stddev / math.sqrt(max(1, iterations))
+    return {
+        "name": name,
+        "mean": mean,
+        "min": mean * 0.85,
+        "max": mean * 1.15,
+        "stddev": stddev,
+        "mean_stddev": mean_stddev,
+        "mean_error": mean_stddev * 1.96,
+        "median": mean,
+        "first_quartile": mean - stddev * 0.674,
+        "third_quartile": mean + stddev * 0.674,
+        "iterations": iterations,
+    }
+
+
+def build_report(options, baseline_dps, results, elapsed):
+    iterations = int(options.get("iterations", 10000))
+    with open(TEMPLATE_FILE, "r") as f:
+        report = json.load(f)
+
+    sim = report["sim"]
+    sim["options"].update(
+        {
+            "iterations": iterations,
+            "target_error": float(options.get("target_error", 0.05)),
+            "threads": int(options.get("threads", 1)),
+            "max_time": float(options.get("max_time", 300)),
+            "desired_targets": int(options.get("desired_targets", 1)),
+            "fight_style": options.get("fight_style", "Patchwerk"),
+            "seed": int(options.get("seed", 0)),
+            "deterministic": int(options.get("deterministic", 0)),
+        }
+    )
+    baseline_stddev = baseline_dps * RELATIVE_STDDEV / math.sqrt(max(1, iterations))
+    for player in sim["players"]:
+        dps = player.setdefault("collected_data", {}).setdefault("dps", {})
+        dps["mean"] = baseline_dps
+        dps["mean_std_dev"] = baseline_stddev
+    sim["profilesets"]["results"] = results
+    sim["statistics"]["elapsed_time_seconds"] = elapsed
+    sim["statistics"]["raid_dps"]["mean"] = baseline_dps
+    return report
+
+
+def run_profilesets(input_file, overrides):
+    start = time.time()
+    options, profilesets = parse_input(input_file, overrides)
+
+    if "save" in options and not profilesets:
+        with open(input_file, "r") as f:
+            content = f.read()
+        with open(options["save"], "w") as f:
+            f.write(content)
+        return 0
+
+    iterations = int(options.get("iterations", 10000))
+    threads = max(1, int(options.get("threads", 1)))
+    work_threads = max(1, int(options.get("profileset_work_threads", 1)))
+    targets = int(options.get("desired_targets", 1))
+    profileset_ms = float(os.environ.get("FAKE_SIMC_PROFILESET_MS", 0))
+    baseline_ms = float(os.environ.get("FAKE_SIMC_BASELINE_MS", 0))
+    seed = noise_source(options)
+    base_dps = 1_000_000 * targets**0.6
+
+    time.sleep(baseline_ms / 1000)
+    print(
+        f"Generating Baseline: 1/1 [{progress_bar(1, 1)}] {iterations}/{iterations} Mean={base_dps:.0f}",
+        flush=True,
+    )
+
+    fail_pattern = os.environ.get("FAKE_SIMC_FAIL_PATTERN")
+    results = []
+    total = len(profilesets)
+    workers = max(1, threads // work_threads)
+    for i, (name, values) in enumerate(profilesets.items(), 1):
+        time.sleep(profileset_ms / 1000 / workers)
+        if fail_pattern and any(fail_pattern in text for text in [name] + values):
+            print(f"Error: profileset '{name}' has an invalid option", file=sys.stderr)
+            return 1
+        mean = noisy_mean(profileset_dps(base_dps, name, values), iterations, seed, name)
+        results.append(result_entry(name, mean, iterations))
+        avg = (time.time() - start) * 1000 / i
+        print(
+            f"Profilesets ({workers}*{work_threads}): {i}/{total} [{progress_bar(i, total)}] avg={avg:.2f}ms",
+            flush=True,
+        )
+
+    results.sort(key=lambda result: result["mean"], reverse=True)
+    baseline_mean = noisy_mean(base_dps, iterations, seed, "baseline")
+    report = build_report(options, baseline_mean, results, time.time() - start)
+
+    if options.get("json2"):
+        with open(options["json2"], "w") as f:
+            json.dump(report, f, indent=2)
+    if options.get("html"):
+        with open(options["html"], "w") as f:
+            f.write(f"<html><body>{len(results)} profilesets</body></html>")
+    return 0
+
+
+def main(argv):
+    if not argv:
+        print("Usage: fake_simc.py <input.simc> [option=value ...]", file=sys.stderr)
+        return 1
+    if argv[0].startswith("spell_query="):
+        return spell_query(argv[0])
+    return run_profilesets(argv[0], argv[1:])
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import logging
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PROFILESET_LINE_PATTERN = re.compile(r'^profileset\."([^"]+)"\+?=')
+
+# run_shard(simc_content, output_path) -> (succeeded, stderr)
+ShardRunner = Callable[[str, str], Tuple[bool, str]]
+
+
+@dataclass
+class QuarantinedProfileset:
+    name: str
+    lines: List[str]
+    stderr: str
+
+
+@dataclass
+class RecoveryResult:
+    reports: List[dict] = field(default_factory=list)
+    quarantined: List[QuarantinedProfileset] = field(default_factory=list)
+    shards_run: int = 0
+    shards_reused: int = 0
+
+
+def split_profilesets(content: str) -> Tuple[str, Dict[str, List[str]]]:
+    """Separate a simc input into the shared header and per-profileset lines."""
+    header_lines = []
+    blocks: Dict[str, List[str]] = {}
+    for line in content.splitlines():
+        match = PROFILESET_LINE_PATTERN.match(line)
+        if match:
+            blocks.setdefault(match.group(1), []).append(line)
+        else:
+            header_lines.append(line)
+    return "\n".join(header_lines).rstrip() + "\n", blocks
+
+
+class FaultIsolator:
+    """Finds the profilesets that make simc fail by bisecting the batch.
+
+    The baseline is run on its own first; if it fails the problem is not a
+    profileset and nothing is quarantined. Otherwise the failing batch is
+    halved recursively: halves that succeed are kept as shards, single
+    profilesets that still fail are quarantined. Shard reports are cached in
+    shard_dir under a digest of their simc input, so an interrupted recovery
+    (or a re-run of the same input) reuses every shard that already finished.
+    """
+
+    def __init__(self, simc_content: str, shard_dir: str, run_shard: ShardRunner):
+        self.header, self.blocks = split_profilesets(simc_content)
+        self.shard_dir = shard_dir
+        self.run_shard = run_shard
+        self.result = RecoveryResult()
+
+    def shard_content(self, names: List[str]) -> str:
+        return self.header + "\n" + "\n".join(line for name in names for line in self.blocks[name]) + "\n"
+
+    def _run(self, names: List[str]) -> Tuple[bool, Optional[dict], str]:
+        content = self.shard_content(names)
+        digest = hashlib.sha1(content.encode("utf-8")).hexdigest()[:16]
+        output_path = os.path.join(self.shard_dir, f"{digest}.html")
+        json_path = output_path.replace(".html", ".json")
+
+        if os.path.exists(json_path):
+            try:
+                with open(json_path, "r") as f:
+                    report = json.load(f)
+                self.result.shards_reused += 1
+                return True, report, ""
+            except (IOError, json.JSONDecodeError):
+                os.remove(json_path)
+
+        self.result.shards_run += 1
+        succeeded, stderr = self.run_shard(content, output_path)
+        if not succeeded or not os.path.exists(json_path):
+            return False, None, stderr
+        with open(json_path, "r") as f:
+            return True, json.load(f), ""
+
+    def recover(self) -> Optional[RecoveryResult]:
+        os.makedirs(self.shard_dir, exist_ok=True)
+        names = list(self.blocks)
+        logger.info(f"Isolating the failing profileset(s) among {len(names)} by bisection...")
+
+        baseline_ok, _, stderr = self._run([])
+        if not baseline_ok:
+            logger.error("The baseline fails on its own; not a profileset problem, nothing to quarantine.")
+            logger.error(stderr[-2000:])
+            return None
+
+        # The full batch is known to fail, so start from its halves
+        middle = len(names) // 2
+        for half in (names[:middle], names[middle:]) if len(names) > 1 else (names,):
+            self._bisect(half)
+        return self.result
+
+    def _bisect(self, names: List[str]):
+        succeeded, report, stderr = self._run(names)
+        if succeeded:
+            self.result.reports.append(report)
+            return
+        if len(names) == 1:
+            name = names[0]
+            logger.warning(f"Quarantined profileset {name}")
+            self.result.quarantined.append(QuarantinedProfileset(name, self.blocks[name], stderr[-2000:]))
+            return
+        middle = len(names) // 2
+        self._bisect(names[:middle])
+        self._bisect(names[middle:])
+
+    def cleanup(self):
+        shutil.rmtree(self.shard_dir, ignore_errors=True)
+        try:
+            os.rmdir(os.path.dirname(self.shard_dir))  # only succeeds once no other run has shards
+        except OSError:
+            pass
+
+
+def merge_shard_reports(reports: List[dict], quarantined: List[QuarantinedProfileset]) -> dict:
+    """One json2 report from the shard reports; the first shard provides the baseline."""
+    merged = reports[0]
+    results = [result for report in reports for result in report["sim"]["profilesets"]["results"]]
+    results.sort(key=lambda result: result["mean"], reverse=True)
+    merged["sim"]["profilesets"]["results"] = results
+    merged["sim"]["quarantined_profilesets"] = [entry.name for entry in quarantined]
+    return merged
+
+
+def write_quarantine_report(path: str, label: str, result: RecoveryResult):
+    report = {
+        "run": label,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "shards_run": result.shards_run,
+        "shards_reused": result.shards_reused,
+        "quarantined": [asdict(entry) for entry in result.quarantined],
+    }
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"Quarantine report written to {path}")
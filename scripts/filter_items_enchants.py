@@ -1,12 +1,10 @@
+import hashlib
 import json
 import re
 from collections import defaultdict
-import requests
 import os
 import logging
 
-logging.basicConfig(level=logging.DEBUG, format="%(message)s")
-
 
 SLOT_MAP = {
     0: "non_equipable",
@@ -57,6 +55,8 @@ DH_USABLE_SLOTS = {
     "off_hand",
 }
 
+CHANGES_FILE = "item_changes.json"
+
 
 def get_data_file_path(filename):
     script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -65,12 +65,86 @@ def get_data_file_path(filename):
     return os.path.join(data_dir, filename)
 
 
-def load_data_from_url(url):
-    response = requests.get(url)
+def load_data_from_url(url, cache_name=None):
+    """Download a dataset; with cache_name the response is kept in data/raw and
+    later downloads are conditional, so an unchanged dataset is not sent again."""
+    # Imported here so that loading this module for its filters stays cheap
+    import requests
+
+    if cache_name is None:
+        response = requests.get(url)
+        response.raise_for_status()
+        return response.json()
+
+    raw_dir = get_data_file_path("raw")
+    os.makedirs(raw_dir, exist_ok=True)
+    data_path = os.path.join(raw_dir, f"{cache_name}.json")
+    meta_path = os.path.join(raw_dir, f"{cache_name}.meta.json")
+    headers = {}
+    if os.path.exists(data_path) and os.path.exists(meta_path):
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    response = requests.get(url, headers=headers)
+    if response.status_code == 304:
+        print(f"  {cache_name}: unchanged since the last download")
+        with open(data_path, "r") as f:
+            return json.load(f)
     response.raise_for_status()
+    with open(data_path, "wb") as f:
+        f.write(response.content)
+    with open(meta_path, "w") as f:
+        json.dump({"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}, f)
     return response.json()
 
 
+def entry_key(entry):
+    return str(entry.get("id", entry.get("itemId", entry.get("name"))))
+
+
+def index_entries(entries):
+    """Content hash of the entries of a filtered list, by id."""
+    grouped = defaultdict(list)
+    for entry in entries:
+        grouped[entry_key(entry)].append(entry)
+    return {
+        key: hashlib.sha256(json.dumps(group, sort_keys=True).encode("utf-8")).hexdigest()
+        for key, group in grouped.items()
+    }
+
+
+def diff_filtered(previous, current):
+    """Ids added, removed or changed (by content hash) between two filtered lists."""
+    old, new = index_entries(previous), index_entries(current)
+    return {
+        "added": sorted(set(new) - set(old)),
+        "removed": sorted(set(old) - set(new)),
+        "changed": sorted(key for key in set(old) & set(new) if old[key] != new[key]),
+    }
+
+
+def save_filtered(name, filtered_data):
+    """Write data/filtered_<name>.json only if its content changed; returns the diff
+    against the previous file (every entry counts as added when there was none)."""
+    path = get_data_file_path(f"filtered_{name}.json")
+    previous = []
+    if os.path.exists(path):
+        try:
+            with open(path, "r") as file:
+                previous = json.load(file)
+        except ValueError:
+            previous = []
+    changes = diff_filtered(previous, filtered_data)
+    if any(changes.values()) or not os.path.exists(path):
+        with open(path, "w") as file:
+            json.dump(filtered_data, file, indent=2)
+    return changes
+
+
 def is_embellishment(item):
     if item is None:
         return False
@@ -401,7 +475,9 @@ def filter_highest_quality_embellishments(embellishments):
     return list(highest_quality.values())
 
 
-def main():
+def fetch_and_filter():
+    """Download the item, enchant and crafting data, filter it for Demon Hunters
+    and save it to the /data folder; returns the filtered lists by name."""
     urls = {
         "items": "https://www.raidbots.com/static/data/live/equippable-items.json?cb=123456789",
         "enchants": "https://www.raidbots.com/static/data/live/enchantments.json?cb=123456789",
@@ -412,7 +488,7 @@ def main():
     current_expansion = 10  # The War Within
 
     print("Fetching data...")
-    data = {key: load_data_from_url(url) for key, url in urls.items()}
+    data = {key: load_data_from_url(url, cache_name=key) for key, url in urls.items()}
 
     print("Filtering items...")
     filtered_items = filter_items(data["items"], current_expansion)
@@ -451,22 +527,41 @@ def main():
     print(f"    - Crafted Embellishments: {crafted_count}")
     print(f"    - Item Embellishments: {item_count}")
 
-    # Save filtered data
-    for name, filtered_data in [
-        ("items", filtered_items),
-        ("enchants", filtered_enchants),
-        ("embellishments", filtered_embellishments),
-        ("consumables", all_filtered_consumables),
-    ]:
-        with open(get_data_file_path(f"filtered_{name}.json"), "w") as file:
-            json.dump(filtered_data, file, indent=2)
+    # Save filtered data, leaving unchanged files untouched, and record what changed
+    changes = {
+        name: save_filtered(name, filtered_data)
+        for name, filtered_data in [
+            ("items", filtered_items),
+            ("enchants", filtered_enchants),
+            ("embellishments", filtered_embellishments),
+            ("consumables", all_filtered_consumables),
+        ]
+    }
+    with open(get_data_file_path(CHANGES_FILE), "w") as file:
+        json.dump(changes, file, indent=2)
 
     print("Filtering complete. Results saved in the /data folder.")
+    for name, change in changes.items():
+        print(
+            f"  {name}: {len(change['added'])} added, {len(change['removed'])} removed, {len(change['changed'])} changed"
+        )
     print(f"Total crafting categories: {len(data['crafting'].get('reagents', []))}")
     print(f"Filtered potions: {len(filtered_potions)}")
     print(f"Filtered flasks: {len(filtered_flasks)}")
     print(f"Filtered consumables: {len(all_filtered_consumables)}")
 
+    return {
+        "items": filtered_items,
+        "enchants": filtered_enchants,
+        "embellishments": filtered_embellishments,
+        "consumables": all_filtered_consumables,
+    }
+
+
+def main():
+    fetch_and_filter()
+
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG, format="%(message)s")
     main()
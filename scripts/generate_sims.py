@@ -1,22 +1,49 @@
 import argparse
 import configparser
+import glob
 import tempfile
 import os
 import pickle
 import re
+import signal
 import subprocess
 import sys
 import time
 import json
+import math
 import threading
 from functools import lru_cache
+from contextlib import nullcontext
 from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import multiprocessing
 from collections.abc import Iterable
 from talenthasher import generate_talent_hash, initialize_talent_data
+from talentvalidator import TalentTreeValidator, TREE_NODE_KEYS
+from sim_planner import RuntimeHistory, RunKey, print_plan, read_peak_rss_mb, DEFAULT_BASE_RSS_MB, DEFAULT_RSS_MB_PER_PROFILESET
+from tracing import tracer, enable_tracing, trace_file_path
+from stage_profiler import profiler
+from metrics import metrics, configure_metrics, SimcRunMetrics
+from progress_events import bus, configure_progress_events, publish_profileset_progress, HashingProgress
+from common_random_numbers import CrnSettings, DEFAULT_SEED, replicate_path, merge_replicate_files
+from time_budget import TimeBudget, BudgetedRun, parse_duration, DEFAULT_MIN_ITERATIONS, DEFAULT_MAX_ITERATIONS
+from fault_isolation import FaultIsolator, PROFILESET_LINE_PATTERN, split_profilesets, merge_shard_reports, write_quarantine_report
+from surrogate_model import SurrogateSettings, SurrogateSelector, merge_stage_reports, write_predictions
+from factorial_design import FactorialSettings, FactorialDesign, FactorialModel, extrapolate, write_factorial_report
+from talent_optimizer import OptimizerSettings, TalentBuild, NeighbourGenerator, TalentOptimizer, SEARCH_MODES, write_optimizer_report
+from memory_admission import memory_gate, configure_memory_limit
+from cpu_affinity import placer, configure_affinity, format_cpulist
+from batch_scheduler import FairShareScheduler, TenantBudget
+from coordinate_descent import CoordinateSettings, CoordinateSearch, write_coordinate_report
+from background_stage import BackgroundStage
+from cache_server import shared_cache, configure_shared_cache, content_key, file_digest
+from create_profiles import create_profiles
+from filter_items_enchants import fetch_and_filter
+from stage_graph import Stage, StageGraph, MANIFEST_FILE
+from compare_reports import generate_report
+from preflight import PreflightJob, SourceMap, run_preflight, print_issues, sample_profilesets, DEFAULT_TIMEOUT as PREFLIGHT_TIMEOUT
 from tqdm import tqdm
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 import logging
 from typing import List, Optional
 
@@ -26,6 +53,7 @@ logger = logging.getLogger(__name__)
 
 # Global constants
 CACHE_FILE = os.path.join(os.path.dirname(__file__), "talent_hash_cache.pkl")
+CACHE_FILE_LOCK = threading.Lock()  # shared by the hash managers of a batch
 
 @dataclass
 class SimulationParameters:
@@ -35,6 +63,15 @@ class SimulationParameters:
     time: Optional[int] = None
     fight_style: Optional[str] = None
 
+@dataclass
+class BatchMember:
+    """What one pipeline of a batch shares with the others."""
+    name: str
+    position: int  # progress bar row
+    core_budget: TenantBudget
+    runtime_history: RuntimeHistory
+    planning: threading.Lock  # held while the pipeline plans and runs its pre-flight
+
 class Config:
     def __init__(self, config_path):
         self.config = configparser.ConfigParser()
@@ -67,7 +104,8 @@ class TalentHashManager:
         self.cache_lock = threading.Lock()
 
         # Preload talent data
-        initialize_talent_data(force_new=self.clear_cache)
+        with tracer.span('initialize_talent_data'):
+            initialize_talent_data(force_new=self.clear_cache)
 
     @staticmethod
     def load_cache():
@@ -80,7 +118,9 @@ class TalentHashManager:
         return {}
 
     def save_cache(self):
-        with self.cache_lock:
+        with CACHE_FILE_LOCK, self.cache_lock:
+            # Keep entries another pipeline of a batch saved since this one loaded
+            self.persistent_cache = {**self.load_cache(), **self.persistent_cache}
             with open(CACHE_FILE, 'w') as f:
                 json.dump(self.persistent_cache, f)
 
@@ -96,20 +136,50 @@ class TalentHashManager:
                 self.persistent_cache[hash_key] = talent_hash
         return self.persistent_cache[hash_key]
 
-    def get_hashes_batch(self, talent_combinations):
+    def get_hashes_batch(self, talent_combinations, show_progress=True):
         total_combinations = len(talent_combinations)
-        with ThreadPoolExecutor() as executor:
-            results = list(tqdm(
-                executor.map(lambda x: self.get_hash(*x), talent_combinations),
-                total=total_combinations,
-                desc="Generating talent hashes",
-                unit="hash"
-            ))
-        self.save_cache()  # Save the cache after all hashes have been generated
+        hashing_progress = HashingProgress(total_combinations)
+        results = []
+        with tracer.span('get_hashes_batch', combinations=total_combinations):
+            missing = self.fetch_shared_hashes(talent_combinations)
+            with ThreadPoolExecutor() as executor:
+                for completed, talent_hash in enumerate(tqdm(
+                    executor.map(lambda x: self.get_hash(*x), talent_combinations),
+                    total=total_combinations,
+                    desc="Generating talent hashes",
+                    unit="hash",
+                    disable=not show_progress
+                ), 1):
+                    results.append(talent_hash)
+                    hashing_progress.update(completed)
+            self.save_cache()  # Save the cache after all hashes have been generated
+            shared_cache.publish('hashes', {self.shared_key(key): self.persistent_cache[key] for key in missing if key in self.persistent_cache})
         return results
 
+    def shared_key(self, hash_key):
+        return f"{self.spec_name}:{hash_key}"
+
+    def fetch_shared_hashes(self, talent_combinations):
+        """Fill the local cache from the shared cache; returns the keys neither had."""
+        with self.cache_lock:
+            missing = list(dict.fromkeys(
+                f"{hero_talent}_{class_talent}_{spec_talent}" for hero_talent, class_talent, spec_talent in talent_combinations
+            ))
+            if not self.clear_cache:
+                missing = [key for key in missing if key not in self.persistent_cache]
+        if not shared_cache.enabled or self.clear_cache or not missing:
+            return missing
+        with tracer.span('shared_hash_lookup', keys=len(missing)):
+            found = shared_cache.lookup('hashes', [self.shared_key(key) for key in missing])
+        with self.cache_lock:
+            for key in missing:
+                if self.shared_key(key) in found:
+                    self.persistent_cache[key] = found[self.shared_key(key)]
+        logger.info(f"Shared cache: {len(found)} of {len(missing)} missing talent hash(es) found.")
+        return [key for key in missing if self.shared_key(key) not in found]
+
 class ProgressTracker:
-    def __init__(self, total_simulations, estimated_profiles_per_sim=None):
+    def __init__(self, total_simulations, estimated_profiles_per_sim=None, desc=None, position=None):
         self.total_simulations = total_simulations
         self.estimated_profiles_per_sim = estimated_profiles_per_sim
         self.current_simulation = 1
@@ -118,18 +188,23 @@ class ProgressTracker:
         self.avg_profile_time = 0
         self.start_time = time.time()
         self.last_update_time = 0
-        self.pbar = tqdm(total=100, bar_format='{l_bar}{bar}| {elapsed} {postfix}]')
+        self.pbar = tqdm(total=100, desc=desc, position=position, bar_format='{l_bar}{bar}| {elapsed} {postfix}]')
 
     def update(self, line):
-        current_time = time.time()
-        if current_time - self.last_update_time < 0.25:  # Limit updates to 4 times per second
-            return
-        self.last_update_time = current_time
-
+        """Parse a simc output line and return True if it carried progress.
+        Every line is parsed; only the bar redraw is throttled."""
         if "Profilesets" in line:
-            self._process_batch_sim(line)
+            parsed = self._process_batch_sim(line)
         elif "Generating" in line:
-            self._process_single_sim(line)
+            parsed = self._process_single_sim(line)
+        else:
+            return False
+
+        current_time = time.time()
+        if parsed and current_time - self.last_update_time >= 0.25:  # Limit redraws to 4 times per second
+            self.last_update_time = current_time
+            self._update_progress()
+        return parsed
 
     def _process_batch_sim(self, line):
         match = re.search(r'Profilesets \((\d+\*\d+)\): (\d+)/(\d+) \[.*?\] avg=([\d.]+)ms', line)
@@ -138,8 +213,7 @@ class ProgressTracker:
             self.total_profiles = int(total)
             self.completed_profiles = int(current)
             self.avg_profile_time = float(avg_time) / 1000  # Convert to seconds
-
-            self._update_progress()
+        return bool(match)
 
     def _process_single_sim(self, line):
         match = re.search(r'Generating .*?: .* (\d+)/(\d+) \[.*?\] (\d+)/(\d+) ([\d.]+)', line)
@@ -148,8 +222,7 @@ class ProgressTracker:
             self.total_profiles = int(total)
             self.completed_profiles = int(current)
             self.avg_profile_time = float(sim_time)
-
-            self._update_progress()
+        return bool(match)
 
     def _update_progress(self):
         if self.estimated_profiles_per_sim:
@@ -189,6 +262,10 @@ class ProgressTracker:
             minutes, seconds = divmod(remainder, 60)
             return f"{hours:.0f}h {minutes:.0f}m {seconds:.0f}s"
 
+    def state(self):
+        """Completed profiles, total profiles and average milliseconds per profile."""
+        return self.completed_profiles, self.total_profiles, self.avg_profile_time * 1000
+
     def start_new_simulation(self):
         self.current_simulation += 1
         self.completed_profiles = 0
@@ -258,11 +335,38 @@ class FileHandler:
             except OSError as e:
                 logger.error(f"Error deleting temporary file {file_path}: {e}")
 
+class CoreBudget:
+    """Blocks callers until enough simc threads are free to stay within the total."""
+    def __init__(self, total_threads):
+        self.total_threads = total_threads
+        self.available = total_threads
+        self.condition = threading.Condition()
+
+    def acquire(self, threads):
+        threads = min(threads, self.total_threads)
+        with self.condition:
+            self.condition.wait_for(lambda: self.available >= threads)
+            self.available -= threads
+        return threads
+
+    def release(self, threads):
+        with self.condition:
+            self.available += threads
+            self.condition.notify_all()
+
 class SimulationRunner:
-    def __init__(self, config, talent_hash_manager, talent_strings):
+    def __init__(self, config, talent_hash_manager, talent_strings, runtime_history=None, factorial_design=None, coordinate_search=None, core_budget=None, post_processor=None):
         self.config = config
         self.talent_hash_manager = talent_hash_manager
         self.talent_strings = talent_strings
+        self.runtime_history = runtime_history
+        self.factorial_design = factorial_design
+        self.coordinate_search = coordinate_search
+        self.core_budget = core_budget  # shared with the other pipelines of a batch
+        self.post_processor = post_processor  # BackgroundStage that annotates reports while simc runs
+        self.crn = crn_settings(config)
+        self.surrogate = surrogate_settings(config)
+        self.simc_errors = {}  # stderr of failed simc runs by input file
         self.character_content = self.load_character_simc()
         self.profiles_content = self.load_profiles_simc()
 
@@ -285,38 +389,306 @@ class SimulationRunner:
 
     def run_simulation(self, sim_params, profiles: List[str], output_path: str, progress_tracker):
         single_sim = self.config.getboolean('Simulations', 'single_sim', fallback=False)
+        json_output = self.config.getboolean('General', 'json_output', fallback=False)
+        if not single_sim and self.factorial_design:
+            if json_output:
+                results = self.run_factorial_simulation(sim_params, output_path, progress_tracker)
+            else:
+                logger.warning("Extrapolating a factorial design needs json_output = true. Simulating the design only.")
+                results = self.run_profiles(sim_params, profiles, output_path, progress_tracker, single_sim)
+        elif not single_sim and self.coordinate_search:
+            if json_output:
+                results = self.run_coordinate_simulation(sim_params, output_path, progress_tracker)
+            else:
+                logger.warning("Coordinate descent needs json_output = true. Simulating the first sweeps only.")
+                results = self.run_profiles(sim_params, profiles, output_path, progress_tracker, single_sim)
+        elif not single_sim and self.surrogate.enabled and len(profiles) >= self.surrogate.min_builds:
+            if json_output:
+                results = self.run_surrogate_simulation(sim_params, profiles, output_path, progress_tracker)
+            else:
+                logger.warning("The surrogate model needs json_output = true. Simulating all builds.")
+                results = self.run_profiles(sim_params, profiles, output_path, progress_tracker, single_sim)
+        else:
+            results = self.run_profiles(sim_params, profiles, output_path, progress_tracker, single_sim)
+
+        if results and json_output:
+            json_path = output_path.replace('.html', '.json')
+            if os.path.exists(json_path):
+                self.annotate_report(json_path)
+        return results
+
+    def annotate_report(self, json_path: str):
+        if self.post_processor:
+            # Queued behind the talent hashing; overlaps the next scenario's simc run
+            self.post_processor.submit('update_json_with_hashes', self.update_json_with_hashes, json_path)
+        else:
+            with tracer.span('update_json_with_hashes'):
+                self.update_json_with_hashes(json_path)
+
+    def run_profiles(self, sim_params, profiles: List[str], output_path: str, progress_tracker, single_sim: bool = False):
+        if shared_cache.enabled and not single_sim and self.config.getboolean('General', 'json_output', fallback=False):
+            return self.run_profiles_cached(sim_params, profiles, output_path, progress_tracker)
+        return self.simulate_profiles(sim_params, profiles, output_path, progress_tracker, single_sim)
+
+    def run_profiles_cached(self, sim_params, profiles: List[str], output_path: str, progress_tracker):
+        header = self.update_simc_content(self.character_content, sim_params, None, threads=1)
+        return self.run_with_result_cache(
+            header, profiles, output_path,
+            lambda queued: self.simulate_profiles(sim_params, queued, output_path, progress_tracker)
+        )
+
+    def run_with_result_cache(self, header: str, profiles: List[str], output_path: str, simulate, previous: Optional[dict] = None):
+        """Simulate only the profilesets without a known result and merge the
+        known ones into the json report; the html report covers the simulated
+        profilesets only. Results come from previous, an earlier report of the
+        same input whose result keys still match, then from the shared cache,
+        which the new results are published to."""
+        label = os.path.splitext(os.path.basename(output_path))[0]
+        baseline_key, keys = self.result_keys(header, profiles)
+        cached = reusable_results(previous, baseline_key)
+        with tracer.span('shared_result_lookup', scenario=label, profilesets=len(profiles)):
+            cached.update(shared_cache.lookup('results', [key for key in dict.fromkeys([baseline_key] + keys) if key not in cached]))
+        queued = [profile for profile, key in zip(profiles, keys) if key not in cached]
+        logger.info(f"Result cache: {len(profiles) - len(queued)} of {len(profiles)} profileset result(s) known for {label}.")
+
+        if not queued and baseline_key in cached:
+            report = json.loads(json.dumps(cached[baseline_key]))
+            results = (f"All {len(profiles)} profileset results taken from the result cache", False)
+        else:
+            results = simulate(queued)
+            if not results or not results[0]:
+                return results
+            report = load_json_report(output_path)
+            if report is None:
+                return None, False
+            simulated = {result['name']: result for result in report['sim'].get('profilesets', {}).get('results', [])}
+            published = {
+                key: {field: value for field, value in simulated[name].items() if field != 'name'}
+                for name, key in zip(map(profileset_name, profiles), keys) if name in simulated and key not in cached
+            }
+            published[baseline_key] = baseline_report(report)
+            with tracer.span('shared_result_publish', scenario=label, results=len(published)):
+                shared_cache.publish('results', published)
+
+        report['sim'].setdefault('profilesets', {}).setdefault('results', []).extend(
+            {**cached[key], 'name': name} for name, key in zip(map(profileset_name, profiles), keys) if key in cached
+        )
+        report['sim']['profilesets']['results'].sort(key=lambda result: result['mean'], reverse=True)
+        # Lets the next run of this input reuse the results whose key is unchanged
+        report['sim']['result_keys'] = {'baseline': baseline_key, 'profilesets': dict(zip(map(profileset_name, profiles), keys))}
+        FileHandler.write_file(output_path.replace('.html', '.json'), json.dumps(report, indent=2))
+        return results
+
+    def result_keys(self, header: str, profiles: List[str]):
+        """Content addresses of the baseline and of each profileset's result.
+
+        A result depends on the simc binary, the simc input without its
+        profilesets and thread counts, the replicate count and the profileset's
+        own lines with the templates they use expanded. The profileset's name
+        is left out, so the same build simmed under another name is a hit.
+        """
+        header = '\n'.join(line for line in header.split('\n') if not line.startswith(('threads=', 'profileset_work_threads=')))
+        simc = file_digest(self.config.get('General', 'simc'))
+        replicates = self.crn.replicates if self.crn.enabled else 1
+        definitions = dict(re.findall(r'^\$\(([\w_]+)\)=(.*)$', self.profiles_content or '', re.MULTILINE))
+
+        def expand(line):
+            line = PROFILESET_LINE_PATTERN.sub(lambda match: match.group(0).replace(f'"{match.group(1)}"', '""', 1), line)
+            return re.sub(r'\$\(([\w_]+)\)', lambda match: definitions.get(match.group(1), match.group(0)), line)
+
+        baseline_key = content_key('baseline', simc, header, replicates)
+        return baseline_key, [
+            content_key('profileset', simc, header, replicates, [expand(line) for line in profile.split('\n')])
+            for profile in profiles
+        ]
+
+    def simulate_profiles(self, sim_params, profiles: List[str], output_path: str, progress_tracker, single_sim: bool = False):
         temp_file_path = None
+        leased = None
+        if self.core_budget:
+            with tracer.span('wait_for_cores', 'scheduling', output=os.path.basename(output_path)):
+                leased = self.core_budget.acquire(self.core_budget.total_threads)
         try:
-            temp_file_path = self.create_simc_file(sim_params, profiles, output_path, single_sim)
-            if not temp_file_path:
-                logger.error("Failed to create temporary SimC input file.")
-                return None
+            with placer.pinned(leased or (None if single_sim else multiprocessing.cpu_count())) as cpus:
+                # A pinned run uses exactly one simc thread per assigned CPU
+                threads = len(cpus) if cpus else leased
+                with tracer.span('create_simc_file', profilesets=len(profiles)):
+                    temp_file_path = self.create_simc_file(sim_params, profiles, output_path, single_sim, threads)
+                if not temp_file_path:
+                    logger.error("Failed to create temporary SimC input file.")
+                    return None
+
+                run_key = make_run_key(self.config, sim_params, threads or (None if single_sim else multiprocessing.cpu_count()))
+                return self.run_simc_isolated(temp_file_path, output_path, progress_tracker, run_key, 0 if single_sim else len(profiles))
+        finally:
+            FileHandler.safe_delete(temp_file_path)
+            if leased:
+                self.core_budget.release(leased)
+
+    def run_stage(self, sim_params, profiles: List[str], output_path: str, stage: str, progress_tracker):
+        """Simulate one stage of a staged run into its own output and load its json report."""
+        stage_output = stage_output_path(output_path, stage)
+        with tracer.span(stage, scenario=os.path.basename(output_path).replace('.html', ''), profilesets=len(profiles)):
+            results = self.run_profiles(sim_params, profiles, stage_output, progress_tracker)
+        if not results or not results[0]:
+            return results, None
+        report = load_json_report(stage_output)
+        return (results if report else (None, False)), report
+
+    def finish_stages(self, output_path: str, stages: List[str], merged: dict):
+        """Write the merged report under the usual name and drop the stage outputs."""
+        FileHandler.write_file(output_path.replace('.html', '.json'), json.dumps(merged, indent=2))
+        for i, stage in enumerate(stages):
+            stage_output = stage_output_path(output_path, stage)
+            FileHandler.safe_delete(stage_output.replace('.html', '.json'))
+            if os.path.exists(stage_output):
+                # Keep the first stage's html report under the usual name
+                if i == 0:
+                    os.replace(stage_output, output_path)
+                else:
+                    FileHandler.safe_delete(stage_output)
+
+    def run_surrogate_simulation(self, sim_params, profiles: List[str], output_path: str, progress_tracker):
+        """Simulate a sample of the builds, predict the rest from their talents and
+        only simulate those that could still reach the top; the merged report
+        keeps the usual layout with the pruned builds left out."""
+        label = os.path.splitext(os.path.basename(output_path))[0]
+        selector = SurrogateSelector(profiles, self.surrogate)
+        sample = selector.sample()
+        stages = ['surrogate_sample']
+        logger.info(f"Surrogate: simulating a sample of {len(sample)} of {len(selector.builds)} builds for {label}.")
+        results, report = self.run_stage(sim_params, [build.profile for build in sample], output_path, stages[0], progress_tracker)
+        if report is None:
+            return results
 
-            results = self.run_simc(temp_file_path, output_path, progress_tracker)
+        reports = [report]
+        with tracer.span('surrogate_fit', scenario=label, builds=len(selector.builds)):
+            selection = selector.select(report['sim']['profilesets']['results'])
+        logger.info(
+            f"Surrogate: {len(selection.queued)} build(s) could reach the top {self.surrogate.top}, "
+            f"{len(selection.pruned)} pruned by prediction."
+        )
+        if selection.queued:
+            stages.append('surrogate_queued')
+            results, report = self.run_stage(sim_params, [build.profile for build in selection.queued], output_path, stages[1], progress_tracker)
+            if report is None:
+                return results
+            reports.append(report)
+
+        merged = merge_stage_reports(reports)
+        merged['sim']['surrogate'] = {
+            'builds': len(selector.builds),
+            'simulated': len(sample) + len(selection.queued),
+            'pruned': len(selection.pruned),
+            'threshold': selection.threshold,
+            'loo_r2': selection.loo_r2,
+        }
+        self.finish_stages(output_path, stages, merged)
+        write_predictions(os.path.join(os.path.dirname(output_path), f"surrogate_{label}.json"), label, len(selector.builds), len(sample), selection)
+        return results
 
-            if results and self.config.getboolean('General', 'json_output', fallback=False):
-                json_path = output_path.replace('.html', '.json')
-                if os.path.exists(json_path):
-                    self.update_json_with_hashes(json_path)
+    def run_coordinate_simulation(self, sim_params, output_path: str, progress_tracker):
+        """Coordinate descent: sweep spec, class and hero templates in turn
+        through the current leader until it stops changing."""
+        search = self.coordinate_search
+        label = os.path.splitext(os.path.basename(output_path))[0]
+        previous = load_json_report(output_path) if os.path.exists(output_path.replace('.html', '.json')) else None
+        start = search.start(previous['sim']['profilesets']['results'] if previous else None)
+        logger.info(f"Coordinate descent: starting {label} from {search.name(start)}.")
+        stages, reports = [], []
+
+        def evaluate(cells, stage):
+            results, report = self.run_stage(sim_params, factorial_profiles(search, cells, self.talent_strings), output_path, stage, progress_tracker)
+            if report is None:
+                return {}
+            stages.append(stage)
+            reports.append(report)
+            means = {result['name']: result['mean'] for result in report['sim']['profilesets']['results']}
+            return {cell: means[search.name(cell)] for cell in cells if search.name(cell) in means}
+
+        result = search.run(start, evaluate)
+        if result is None:
+            return None, False
 
+        merged = merge_stage_reports(reports)
+        merged['sim']['coordinate_descent'] = {
+            'builds': search.total,
+            'simulated': len(result.means),
+            'rounds': result.rounds,
+            'converged': result.converged,
+            'leader': search.name(result.best),
+        }
+        self.finish_stages(output_path, stages, merged)
+        write_coordinate_report(os.path.join(os.path.dirname(output_path), f"coordinate_{label}.json"), label, search, result)
+        return f"Coordinate descent finished after {result.rounds} round(s)", False
+
+    def run_factorial_simulation(self, sim_params, output_path: str, progress_tracker):
+        """Simulate the fractional factorial design, fit hero, class and spec
+        effects, extrapolate every other build and confirm the predicted top
+        builds with real simulations."""
+        design = self.factorial_design
+        label = os.path.splitext(os.path.basename(output_path))[0]
+        cells = design.cells()
+        stages = ['factorial_design']
+        logger.info(f"Factorial: simulating {len(cells)} of {design.total} builds for {label}.")
+        results, report = self.run_stage(sim_params, factorial_profiles(design, cells, self.talent_strings), output_path, stages[0], progress_tracker)
+        if report is None:
             return results
-        finally:
-            FileHandler.safe_delete(temp_file_path)
 
-    def create_simc_file(self, sim_params, profiles: List[str], output_path: str, single_sim: bool) -> str:
+        reports = [report]
+        means = {result['name']: result['mean'] for result in report['sim']['profilesets']['results']}
+        observed = [cell for cell in cells if design.name(cell) in means]
+        model = FactorialModel(design)
+        with tracer.span('factorial_fit', scenario=label, builds=len(observed)):
+            model.fit(observed, [means[design.name(cell)] for cell in observed])
+            predictions = extrapolate(model, set(means))
+
+        top = min(design.settings.confirm_top, len(predictions))
+        confirmed, predictions = predictions[:top], predictions[top:]
+        if confirmed:
+            stages.append('factorial_confirm')
+            confirm_cells = [cell for cell in design.all_cells() if design.name(cell) in {prediction.name for prediction in confirmed}]
+            logger.info(f"Factorial: confirming the {len(confirm_cells)} best predicted build(s).")
+            results, report = self.run_stage(sim_params, factorial_profiles(design, confirm_cells, self.talent_strings), output_path, stages[1], progress_tracker)
+            if report is None:
+                return results
+            reports.append(report)
+
+        merged = merge_stage_reports(reports)
+        merged['sim']['factorial_design'] = {
+            'builds': design.total,
+            'simulated': len(cells) + len(confirmed),
+            'extrapolated': len(predictions),
+            'replicates': design.replicates,
+            'r2': model.r2,
+        }
+        self.finish_stages(output_path, stages, merged)
+        write_factorial_report(
+            os.path.join(os.path.dirname(output_path), f"factorial_{label}.json"),
+            label, model, len(cells) + len(confirmed), [prediction.name for prediction in confirmed], predictions
+        )
+        return results
+
+    def create_simc_file(self, sim_params, profiles: List[str], output_path: str, single_sim: bool, threads: Optional[int] = None) -> str:
+        content = self.build_simc_input(sim_params, profiles, single_sim, threads)
+        return FileHandler.create_temp_file(content, prefix="temp_simc_input_", dir=self.config.get('General', 'apl_folder'))
+
+    def build_simc_input(self, sim_params, profiles: List[str], single_sim: bool, threads: Optional[int] = None) -> str:
         talents = self.config.get('Simulations', 'single_sim_talents') if single_sim else None
-        updated_content = self.update_simc_content(self.character_content, sim_params, talents)
+        updated_content = self.update_simc_content(self.character_content, sim_params, talents, threads=threads)
 
         if single_sim:
-            content = updated_content
-        else:
-            used_templates = set(re.findall(r'\$\(([\w_]+)\)', '\n'.join(profiles)))
-            filtered_profiles_content = [line for line in self.profiles_content.split('\n') if any(f'$({template})' in line for template in used_templates)]
-            content = f"{updated_content}\n\n" + "\n".join(filtered_profiles_content) + "\n\n" + "\n\n".join(profiles)
+            return updated_content
+        used_templates = set(re.findall(r'\$\(([\w_]+)\)', '\n'.join(profiles)))
+        filtered_profiles_content = [line for line in self.profiles_content.split('\n') if any(f'$({template})' in line for template in used_templates)]
+        return f"{updated_content}\n\n" + "\n".join(filtered_profiles_content) + "\n\n" + "\n\n".join(profiles)
 
-        return FileHandler.create_temp_file(content, prefix="temp_simc_input_", dir=self.config.get('General', 'apl_folder'))
+    def build_supplemental_input(self, sim_params, supplemental_content: str, threads: Optional[int] = None) -> str:
+        supplemental_talents = self.config.get('PostProcessing', 'supplemental_talents', fallback='')
+        updated_content = self.update_simc_content(self.character_content, sim_params, supplemental_talents, threads=threads)
+        return f"{updated_content}\n\n{supplemental_content}"
 
-    def update_simc_content(self, content: str, sim_params: SimulationParameters, talents: str = None) -> str:
+    def update_simc_content(self, content: str, sim_params: SimulationParameters, talents: str = None, threads: Optional[int] = None) -> str:
         # Split the content into sections
         sections = re.split(r'\n\s*\n', content)
 
@@ -349,11 +721,16 @@ class SimulationRunner:
             simc_config = self._update_property(simc_config, "target_error", str(sim_params.target_error))
 
         # Add threads and profileset_work_threads for non-single simulations
-        if not self.config.getboolean('Simulations', 'single_sim', fallback=False):
-            cpu_threads = multiprocessing.cpu_count()
+        if threads is not None or not self.config.getboolean('Simulations', 'single_sim', fallback=False):
+            cpu_threads = threads or multiprocessing.cpu_count()
             simc_config = self._update_property(simc_config, "threads", str(cpu_threads))
             simc_config = self._update_property(simc_config, "profileset_work_threads", str(max(1, cpu_threads // 4)))
 
+        # Common random numbers: the baseline, every profileset and every re-run share one random stream
+        if self.crn.enabled:
+            simc_config = self._update_property(simc_config, "seed", str(self.crn.seed))
+            simc_config = self._update_property(simc_config, "deterministic", "1")
+
         sections[simc_config_index] = simc_config
 
         # Update talents if provided
@@ -456,14 +833,91 @@ class SimulationRunner:
         # Join the sections back together
         return "\n\n".join(sections)
 
-    def run_simc(self, simc_file: str, output_path: str, progress_tracker) -> tuple[Optional[str], bool]:
+    def run_simc_isolated(self, simc_file: str, output_path: str, progress_tracker, run_key: Optional[RunKey] = None, profileset_count: int = 0) -> tuple[Optional[str], bool]:
+        """Run simc and, if a profileset batch fails, bisect it to quarantine the
+        offending profilesets and keep the results of the rest."""
+        results = self.run_simc_replicates(simc_file, output_path, progress_tracker, run_key, profileset_count)
+        if results[0] or profileset_count < 1 or not self.config.getboolean('Simulations', 'isolate_failures', fallback=True):
+            return results
+        if not self.config.getboolean('General', 'json_output', fallback=False):
+            logger.error("Isolating failing profilesets needs json_output = true.")
+            return results
+        with tracer.span('isolate_failures', output=os.path.basename(output_path), profilesets=profileset_count):
+            return self.recover_failed_run(simc_file, output_path, progress_tracker, run_key)
+
+    def recover_failed_run(self, simc_file: str, output_path: str, progress_tracker, run_key: Optional[RunKey]) -> tuple[Optional[str], bool]:
+        label = os.path.splitext(os.path.basename(output_path))[0]
+        content = FileHandler.read_file(simc_file)
+        if content is None:
+            return None, False
+
+        def run_shard(shard_content, shard_output):
+            shard_file = FileHandler.create_temp_file(shard_content, prefix="temp_shard_", dir=os.path.dirname(simc_file))
+            if shard_file is None:
+                return False, "Failed to create shard input file"
+            try:
+                results = self.run_simc_replicates(shard_file, shard_output, progress_tracker, run_key, count_profilesets(shard_content))
+                return bool(results[0]), self.simc_errors.pop(os.path.abspath(shard_file), '')
+            finally:
+                FileHandler.safe_delete(shard_file)
+
+        report_folder = os.path.dirname(output_path)
+        isolator = FaultIsolator(content, os.path.join(report_folder, 'shards', label), run_shard)
+        recovery = isolator.recover()
+        if recovery is None or not recovery.reports:
+            logger.error(f"Could not recover any results for {label}.")
+            return None, False
+
+        for entry in recovery.quarantined:
+            bus.publish('error', run=label, message=f"Quarantined profileset {entry.name}")
+        write_quarantine_report(os.path.join(report_folder, f"quarantine_{label}.json"), label, recovery)
+        FileHandler.write_file(output_path.replace('.html', '.json'), json.dumps(merge_shard_reports(recovery.reports, recovery.quarantined), indent=2))
+        isolator.cleanup()
+        logger.info(
+            f"Recovered {label}: {len(recovery.quarantined)} profileset(s) quarantined, "
+            f"{recovery.shards_run} shard(s) run, {recovery.shards_reused} reused."
+        )
+        return f"SimC completed with {len(recovery.quarantined)} quarantined profileset(s)", False
+
+    def run_simc_replicates(self, simc_file: str, output_path: str, progress_tracker, run_key: Optional[RunKey] = None, profileset_count: int = 0) -> tuple[Optional[str], bool]:
+        """Run simc once per common-random-numbers seed and merge the replicate
+        json reports into the usual output file, adding paired profileset deltas."""
+        if not self.crn.enabled:
+            return self.run_simc(simc_file, output_path, progress_tracker, run_key, profileset_count)
+
+        json_output = self.config.getboolean('General', 'json_output', fallback=False)
+        seeds = self.crn.seeds()
+        if not json_output and len(seeds) > 1:
+            logger.warning("CRN replicates need json_output = true to be merged. Running a single seed.")
+            seeds = seeds[:1]
+
+        replicate_outputs = [output_path] if len(seeds) == 1 else [replicate_path(output_path, i) for i in range(len(seeds))]
+        for seed, replicate_output in zip(seeds, replicate_outputs):
+            results = self.run_simc(simc_file, replicate_output, progress_tracker, run_key, profileset_count, options=[f'seed={seed}'])
+            if not results[0]:
+                return results
+
+        if json_output:
+            json_files = [replicate_output.replace('.html', '.json') for replicate_output in replicate_outputs]
+            with tracer.span('merge_crn_replicates', replicates=len(seeds)):
+                if not merge_replicate_files(json_files, output_path.replace('.html', '.json'), self.crn):
+                    return None, False
+        if len(seeds) > 1 and output_path.endswith('.html'):
+            # Keep the first replicate's html report under the usual name
+            for i, replicate_output in enumerate(replicate_outputs):
+                if os.path.exists(replicate_output):
+                    if i == 0:
+                        os.replace(replicate_output, output_path)
+                    else:
+                        FileHandler.safe_delete(replicate_output)
+        return results
+
+    def run_simc(self, simc_file: str, output_path: str, progress_tracker, run_key: Optional[RunKey] = None, profileset_count: int = 0, options: Optional[List[str]] = None) -> tuple[Optional[str], bool]:
         simc_path = self.config.get('General', 'simc')
         simc_path, simc_file = map(os.path.abspath, [simc_path, simc_file])
         output_path = os.path.abspath(output_path)
         output_dir = os.path.dirname(output_path)
         simc_dir = os.path.dirname(simc_file)
-        original_dir = os.getcwd()
-        os.chdir(simc_dir)
 
         if not os.access(output_dir, os.W_OK):
             logger.error(f"No write permission in the output directory: {output_dir}")
@@ -480,23 +934,64 @@ class SimulationRunner:
         if self.config.getboolean('General', 'json_output', fallback=False):
             json_file = output_path.replace('.html', '.json')
             command.append(f'json2={json_file}')
-
-        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, bufsize=1)
-
-        for line in iter(process.stdout.readline, ''):
-            progress_tracker.update(line)
-
-        stdout, stderr = process.communicate()
+        command.extend(options or [])
+
+        run_label = os.path.splitext(os.path.basename(output_path))[0]
+        projected_mb = self.projected_memory_mb(run_key, profileset_count)
+        with tracer.span('wait_for_memory', 'scheduling', output=os.path.basename(output_path), projected_mb=round(projected_mb)):
+            admission = memory_gate.admit(run_label, projected_mb)
+
+        start_time = time.time()
+        last_sample_time = 0
+        peak_rss_mb = None
+        threads = run_key.threads if run_key else None
+        cpus = format_cpulist(os.sched_getaffinity(0)) if placer.enabled else None
+        try:
+            with tracer.span('simc', output=os.path.basename(output_path), profilesets=profileset_count, threads=threads, cpus=cpus):
+                process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, bufsize=1, cwd=simc_dir)
+                run_metrics = SimcRunMetrics(run_label, process.pid, threads) if metrics.enabled else None
+
+                for line in iter(process.stdout.readline, ''):
+                    if progress_tracker.update(line) and bus.active:
+                        publish_profileset_progress(run_label, *progress_tracker.state())
+                    if time.time() - last_sample_time >= 1:
+                        last_sample_time = time.time()
+                        peak_rss_mb = read_peak_rss_mb(process.pid) or peak_rss_mb
+                        if peak_rss_mb:
+                            memory_gate.observe(admission, peak_rss_mb)
+                        if run_metrics:
+                            run_metrics.sample(*progress_tracker.state())
+
+                stdout, stderr = process.communicate()
+                if run_metrics:
+                    run_metrics.finish(*progress_tracker.state())
+        finally:
+            memory_gate.release(admission)
 
         rc = process.returncode
+        if rc == -signal.SIGKILL and peak_rss_mb:
+            logger.error(f"SimC was killed at ~{peak_rss_mb:,.0f} MB RSS, most likely by the OOM killer.")
+            if self.runtime_history is not None and run_key is not None:
+                # Later projections for this scenario account for the footprint it reached
+                self.runtime_history.record_memory(run_key, profileset_count, peak_rss_mb)
         if rc != 0:
             logger.error(f"SimC process exited with return code {rc}")
             logger.error(f"SimC stderr output: {stderr}")
+            self.simc_errors[simc_file] = stderr
+            bus.publish('error', run=run_label, message=f"SimC exited with return code {rc}", stderr=stderr[-2000:])
             return None, False
 
-        os.chdir(original_dir)
+        if self.runtime_history is not None and run_key is not None:
+            self.runtime_history.record(run_key, profileset_count, time.time() - start_time, peak_rss_mb)
+
         return "SimC completed successfully", False
 
+    def projected_memory_mb(self, run_key: Optional[RunKey], profileset_count: int) -> float:
+        """Peak RSS expected of a simc run, learned per scenario in the runtime history."""
+        if self.runtime_history is not None and run_key is not None:
+            return self.runtime_history.estimate('', run_key, profileset_count).peak_rss_mb
+        return DEFAULT_BASE_RSS_MB + DEFAULT_RSS_MB_PER_PROFILESET * profileset_count
+
     def update_json_with_hashes(self, json_file: str):
         # logger.info(f"Updating JSON with hashes: {json_file}")
         with open(json_file, 'r') as f:
@@ -535,10 +1030,10 @@ class SimulationRunner:
         with open(json_file, 'w') as f:
             json.dump(data, f, indent=2)
 
-def parse_profiles_simc(profiles_path, talent_hash_manager):
+def parse_profiles_simc(profiles_path, talent_hash_manager, validator=None):
     content = FileHandler.read_file(profiles_path)
     if content is None:
-        return None
+        return None, None, 0
 
     talents = {category: {} for category in ['hero_talents', 'class_talents', 'spec_talents']}
     talent_strings = {}  # New dictionary to store full talent strings
@@ -553,19 +1048,33 @@ def parse_profiles_simc(profiles_path, talent_hash_manager):
         talents[section_name] = dict(talent_defs)
         talent_strings[section_name] = {name: string for name, string in talent_defs}
 
+    pruned_count = 0
+    if validator is not None:
+        talent_strings, pruned_count = validator.prune_templates(talent_strings)
+        talents = {category: dict(templates) for category, templates in talent_strings.items()}
+        if pruned_count:
+            logger.info(f"Pruned {pruned_count} invalid talent combinations.")
+
+    if talent_hash_manager is not None:
+        hash_talent_combinations(talent_hash_manager, talents)
+
+    return talents, talent_strings, pruned_count
+
+def hash_talent_combinations(talent_hash_manager, talents, show_progress=True):
     combinations = [
         (hero_talent, class_talent, spec_talent)
-        for hero_name, hero_talent in talents['hero_talents'].items()
-        for class_name, class_talent in talents['class_talents'].items()
-        for spec_name, spec_talent in talents['spec_talents'].items()
+        for hero_talent in talents['hero_talents'].values()
+        for class_talent in talents['class_talents'].values()
+        for spec_talent in talents['spec_talents'].values()
     ]
-
+    if not show_progress:
+        # Hashing in the background must not print over the simc progress bar
+        talent_hash_manager.get_hashes_batch(combinations, show_progress=False)
+        return
     print("Generating talent hashes...")
     talent_hash_manager.get_hashes_batch(combinations)
     print("Talent hash generation completed.")
 
-    return talents, talent_strings
-
 def filter_talents(talents_items, include_list, exclude_list, talent_type=''):
     talents = dict(talents_items)
     filtered_talents = []
@@ -595,6 +1104,9 @@ def generate_simc_profile(hero_name, class_name, spec_name, talent_strings):
     hero_talents = talent_strings['hero_talents'].get(hero_name, "")
     class_talents = talent_strings['class_talents'].get(class_name, "")
     spec_talents = talent_strings['spec_talents'].get(spec_name, "")
+    return talent_profileset(formatted_name, hero_talents, class_talents, spec_talents)
+
+def talent_profileset(formatted_name, hero_talents, class_talents, spec_talents):
     return '\n'.join([
         f'profileset."{formatted_name}"="hero_talents={hero_talents}"',
         f'profileset."{formatted_name}"+="class_talents={class_talents}"',
@@ -620,7 +1132,145 @@ def generate_output_filename(config, sim_params):
 
     return f"{filename}.html"
 
-def print_summary(talents, filtered_talents, profiles, config, simulations):
+def crn_settings(config):
+    return CrnSettings(
+        enabled=config.getboolean('Simulations', 'common_random_numbers', fallback=False),
+        seed=config.getint('Simulations', 'crn_seed', fallback=DEFAULT_SEED),
+        replicates=max(1, config.getint('Simulations', 'crn_replicates', fallback=1))
+    )
+
+def surrogate_settings(config):
+    return SurrogateSettings(
+        enabled=config.getboolean('Simulations', 'surrogate', fallback=False),
+        sample=config.getfloat('Simulations', 'surrogate_sample', fallback=0.1),
+        min_builds=config.getint('Simulations', 'surrogate_min_builds', fallback=200),
+        top=max(1, config.getint('Simulations', 'surrogate_top', fallback=20)),
+        z=config.getfloat('Simulations', 'surrogate_z', fallback=2.0),
+        min_r2=config.getfloat('Simulations', 'surrogate_min_r2', fallback=0.5)
+    )
+
+def load_json_report(output_path):
+    content = FileHandler.read_file(output_path.replace('.html', '.json'))
+    return json.loads(content) if content else None
+
+def factorial_settings(config):
+    return FactorialSettings(
+        enabled=config.getboolean('Simulations', 'factorial_design', fallback=False),
+        replicates=max(1, config.getint('Simulations', 'factorial_replicates', fallback=2)),
+        confirm_top=max(0, config.getint('Simulations', 'factorial_confirm_top', fallback=20))
+    )
+
+def make_factorial_design(config, filtered_talents):
+    settings = factorial_settings(config)
+    if not settings.enabled or config.getboolean('Simulations', 'single_sim', fallback=False):
+        return None
+    design = FactorialDesign(
+        [name for name, _ in filtered_talents['hero_talents']],
+        [name for name, _ in filtered_talents['class_talents']],
+        [name for name, _ in filtered_talents['spec_talents']],
+        settings
+    )
+    if design.complete:
+        logger.info("Factorial: the design would cover every class template; simulating the full product.")
+        return None
+    return design
+
+def make_coordinate_search(config, filtered_talents):
+    settings = CoordinateSettings(
+        enabled=config.getboolean('Simulations', 'coordinate_descent', fallback=False),
+        max_rounds=max(1, config.getint('Simulations', 'coordinate_max_rounds', fallback=5))
+    )
+    if not settings.enabled or config.getboolean('Simulations', 'single_sim', fallback=False):
+        return None
+    return CoordinateSearch(
+        [name for name, _ in filtered_talents['hero_talents']],
+        [name for name, _ in filtered_talents['class_talents']],
+        [name for name, _ in filtered_talents['spec_talents']],
+        settings
+    )
+
+def factorial_profiles(design, cells, talent_strings):
+    return [
+        generate_simc_profile(design.heroes[h], design.classes[c], design.specs[s], talent_strings)
+        for h, c, s in cells
+    ]
+
+def stage_output_path(output_path, stage):
+    stem, extension = os.path.splitext(output_path)
+    return f"{stem}_{stage}{extension}"
+
+def make_run_key(config, sim_params, threads):
+    threads = threads or 1
+    return RunKey(
+        spec=config.spec_name.lower(),
+        fight_style=sim_params.fight_style or 'Patchwerk',
+        targets=sim_params.targets,
+        time=sim_params.time,
+        iterations=sim_params.iterations,
+        threads=threads,
+        profileset_work_threads=max(1, threads // 4)
+    )
+
+def planned_runs(config, simulations, profiles):
+    """Main and supplemental simc runs in execution order, for the plan and the time budget."""
+    single_sim = config.getboolean('Simulations', 'single_sim', fallback=False)
+    main_threads = None if single_sim else multiprocessing.cpu_count()
+    # Each common-random-numbers replicate is a full simc run
+    replicates = len(crn_settings(config).seeds())
+    main_runs = [
+        BudgetedRun(
+            label=generate_output_filename(config, sim_params).replace('.html', ''),
+            key=make_run_key(config, sim_params, main_threads),
+            profilesets=0 if single_sim else len(profiles),
+            cost_factor=replicates
+        )
+        for sim_params in simulations
+    ]
+
+    supplemental_runs = []
+    total_threads = multiprocessing.cpu_count()
+    if config.getboolean('PostProcessing', 'supplemental_profilesets', fallback=False):
+        supplemental_jobs = supplemental_jobs_for(config, config.get('General', 'apl_folder'))
+        thread_counts, total_threads, max_workers = supplemental_thread_layout(config, supplemental_jobs)
+        sim_params = supplemental_sim_params(config)
+        supplemental_runs = [
+            BudgetedRun(
+                label=os.path.splitext(supplemental_file)[0],
+                key=make_run_key(config, sim_params, threads),
+                profilesets=count_profilesets(content),
+                cost_factor=replicates * (threads / total_threads if max_workers > 1 else 1)
+            )
+            for (supplemental_file, content), threads in zip(supplemental_jobs, thread_counts)
+        ]
+
+    return main_runs, supplemental_runs, total_threads
+
+def plan_run(config, simulations, profiles, runtime_history):
+    main_runs, supplemental_runs, total_threads = planned_runs(config, simulations, profiles)
+    replicates = len(crn_settings(config).seeds())
+
+    def estimate(run):
+        run_estimate = runtime_history.estimate(run.label, run.key, run.profilesets)
+        return replace(run_estimate, wall_seconds=run_estimate.wall_seconds * replicates)
+
+    return [estimate(run) for run in main_runs], [estimate(run) for run in supplemental_runs], total_threads
+
+def make_time_budget(config, simulations, profiles, runtime_history, start_time):
+    seconds = parse_duration(config.get('Simulations', 'time_budget', fallback=''))
+    if not seconds:
+        return None
+    budget = TimeBudget(
+        seconds,
+        runtime_history,
+        min_iterations=config.getint('Simulations', 'budget_min_iterations', fallback=DEFAULT_MIN_ITERATIONS),
+        max_iterations=config.getint('Simulations', 'iterations', fallback=None) or DEFAULT_MAX_ITERATIONS,
+        start_time=start_time
+    )
+    main_runs, supplemental_runs, _ = planned_runs(config, simulations, profiles)
+    budget.set_runs(main_runs + supplemental_runs)
+    return budget
+
+def print_summary(talents, filtered_talents, profiles, config, simulations, pruned_count=0, factorial_design=None, coordinate_search=None):
     print("\nSimulation Summary:")
     print("===================")
 
@@ -642,6 +1292,14 @@ def print_summary(talents, filtered_talents, profiles, config, simulations):
     if target_error:
         print(f"  Target Error: {target_error}")
 
+    crn = crn_settings(config)
+    if crn.enabled:
+        print(f"  Common Random Numbers: seed {crn.seed}, {crn.replicates} replicate(s)")
+
+    surrogate = surrogate_settings(config)
+    if surrogate.enabled and len(profiles) >= surrogate.min_builds:
+        print(f"  Surrogate Model: sample {surrogate.sample:.0%}, simulate builds that could reach the top {surrogate.top}")
+
     if config.getboolean('Simulations', 'single_sim', fallback=False):
         print("\nSingle Sim Mode:")
         print(f"  Talent String: {config.get('Simulations', 'single_sim_talents')}")
@@ -667,9 +1325,26 @@ def print_summary(talents, filtered_talents, profiles, config, simulations):
             if exclude_terms:
                 print(f"    Exclude: {exclude_terms}")
 
+        if pruned_count:
+            print(f"\nInvalid Combinations Pruned: {pruned_count}")
+
+        if factorial_design:
+            print("\nFactorial Design:")
+            print(f"  Simulated: {len(profiles)} of {factorial_design.total} builds ({factorial_design.replicates} class template(s) per hero and spec)")
+            print(f"  Confirmed: top {factorial_design.settings.confirm_top} predicted builds")
+
+        if coordinate_search:
+            print("\nCoordinate Descent:")
+            print(f"  Sweeps: spec, class, hero through the leader, up to {coordinate_search.settings.max_rounds} round(s)")
+            print(f"  Per Round: about {len(profiles)} of {coordinate_search.total} builds")
+
     print(f"\nTotal Profilesets Generated: {len(profiles)}")
 
 def run_combine_script(config):
+    with tracer.span('combine'):
+        _run_combine_script(config)
+
+def _run_combine_script(config):
     logger.info("Running combine script logic...")
     apl_folder = config.get('General', 'apl_folder')
     main_file = os.path.join(apl_folder, 'character.simc')
@@ -717,39 +1392,68 @@ def run_combine_script(config):
         raise
 
 def run_compare_reports_script(config):
-    logger.info("Running compare_reports.py script...")
-    compare_reports_script_path = os.path.join(config.script_dir, 'compare_reports.py')
+    # In-process, so a --profile run covers the report stages in its own profile
+    logger.info("Generating the website...")
     try:
-        subprocess.run([sys.executable, compare_reports_script_path, config.config_path], check=True)
-        logger.info("compare_reports.py script completed successfully.")
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Error running compare_reports.py script: {e}")
-
-def run_supplemental_profilesets(config, simulation_runner, report_folder, progress_tracker):
-    apl_folder = config.get('General', 'apl_folder')
-    supplemental_files = [
-        'trinket_profilesets.simc',
-        'gem_profilesets.simc',
-        'enchant_profilesets_chest.simc',
-        'enchant_profilesets_legs.simc',
-        'enchant_profilesets_rings.simc',
-        'enchant_profilesets_weapons.simc'
+        with tracer.span('compare_reports'):
+            generate_report(config.config_path)
+        logger.info("Website generation completed successfully.")
+    except Exception as e:
+        logger.error(f"Error generating the website: {e}")
+
+SUPPLEMENTAL_CATEGORY_SEPARATOR = '::'
+CONSOLIDATED_SUPPLEMENTAL_FILE = 'consolidated_supplemental.simc'
+SUPPLEMENTAL_FILES = [
+    'trinket_profilesets.simc',
+    'gem_profilesets.simc',
+    'enchant_profilesets_chest.simc',
+    'enchant_profilesets_legs.simc',
+    'enchant_profilesets_rings.simc',
+    'enchant_profilesets_weapons.simc'
+]
+
+def reusable_results(report, baseline_key):
+    """Results of an earlier report by result key, when it was simulated from the
+    same baseline input; otherwise nothing can be reused."""
+    keys = (report or {}).get('sim', {}).get('result_keys', {})
+    if keys.get('baseline') != baseline_key:
+        return {}
+    reusable = {}
+    for result in report['sim'].get('profilesets', {}).get('results', []):
+        if result['name'] in keys.get('profilesets', {}):
+            reusable[keys['profilesets'][result['name']]] = {field: value for field, value in result.items() if field != 'name'}
+    reusable[baseline_key] = baseline_report(report)
+    return reusable
+
+def baseline_report(report):
+    """A copy of a json report without its profileset results, as stored in the result cache."""
+    baseline = json.loads(json.dumps(report))
+    baseline['sim'].pop('quarantined_profilesets', None)
+    baseline['sim'].pop('result_keys', None)
+    baseline['sim'].setdefault('profilesets', {})['results'] = []
+    return baseline
+
+def profileset_name(profile):
+    match = PROFILESET_LINE_PATTERN.match(profile)
+    return match.group(1) if match else profile
+
+def count_profilesets(content):
+    return len(set(re.findall(r'^profileset\."([^"]+)"', content, re.MULTILINE)))
+
+def allocate_supplemental_threads(profileset_counts, total_threads):
+    """Give small files (10 profilesets or fewer) a single thread and split the
+    rest of the budget between the larger files in proportion to their size."""
+    large_total = sum(count for count in profileset_counts if count > 10)
+    small_files = sum(1 for count in profileset_counts if count <= 10)
+    large_budget = max(1, total_threads - small_files)
+    return [
+        max(1, min(total_threads, round(large_budget * count / large_total))) if count > 10 else 1
+        for count in profileset_counts
     ]
 
-    iterations = config.getint('Simulations', 'iterations', fallback=None)
-    target_error = config.getfloat('Simulations', 'target_error', fallback=None)
-    targets = config.getint('Simulations', 'targets', fallback=1)
-    sim_time = config.getint('Simulations', 'time', fallback=300)
-
-    supplemental_talents = config.get('PostProcessing', 'supplemental_talents', fallback='')
-    if not supplemental_talents:
-        logger.error("Supplemental talents not specified in config. Skipping supplemental profilesets.")
-        return
-
-    total_supplemental_sims = len(supplemental_files)
-    supplemental_progress_tracker = ProgressTracker(total_supplemental_sims)
-
-    for supplemental_file in supplemental_files:
+def load_supplemental_jobs(apl_folder):
+    supplemental_jobs = []
+    for supplemental_file in SUPPLEMENTAL_FILES:
         supplemental_path = os.path.join(apl_folder, supplemental_file)
 
         if not os.path.exists(supplemental_path):
@@ -762,82 +1466,334 @@ def run_supplemental_profilesets(config, simulation_runner, report_folder, progr
             logger.error(f"Failed to read supplemental file: {supplemental_path}")
             continue
 
-        # Create SimulationParameters
-        sim_params = SimulationParameters(
-            iterations=iterations,
-            target_error=target_error,
-            targets=targets,
-            time=sim_time
-        )
-
-        updated_content = simulation_runner.update_simc_content(
-            simulation_runner.character_content,
-            sim_params,
-            supplemental_talents
+        supplemental_jobs.append((supplemental_file, supplemental_content))
+    return supplemental_jobs
+
+def consolidate_supplemental_jobs(supplemental_jobs):
+    """Every supplemental file as one job, its profilesets named category::name,
+    so the baseline of each scenario is simulated once."""
+    if not supplemental_jobs:
+        return []
+    merged_content = "\n\n".join(
+        re.sub(r'^profileset\."([^"]+)"', lambda match, category=os.path.splitext(supplemental_file)[0]: f'profileset."{category}{SUPPLEMENTAL_CATEGORY_SEPARATOR}{match.group(1)}"', content, flags=re.MULTILINE)
+        for supplemental_file, content in supplemental_jobs
+    )
+    return [(CONSOLIDATED_SUPPLEMENTAL_FILE, merged_content)]
+
+def split_consolidated_report(output_path, categories):
+    """Write the per-file supplemental reports a consolidated run replaces."""
+    report = load_json_report(output_path)
+    if report is None:
+        return
+    results = report['sim'].get('profilesets', {}).get('results', [])
+    consolidated_name = os.path.splitext(CONSOLIDATED_SUPPLEMENTAL_FILE)[0]
+    for category in categories:
+        split = json.loads(json.dumps(report))
+        split['sim'].pop('result_keys', None)
+        split['sim'].setdefault('profilesets', {})['results'] = [
+            {**result, 'name': result['name'].partition(SUPPLEMENTAL_CATEGORY_SEPARATOR)[2]}
+            for result in results if result['name'].startswith(f"{category}{SUPPLEMENTAL_CATEGORY_SEPARATOR}")
+        ]
+        split_path = output_path.replace(f"supplemental_{consolidated_name}_", f"supplemental_{category}_")
+        FileHandler.write_file(split_path, json.dumps(split, indent=2))
+
+def supplemental_jobs_for(config, apl_folder):
+    supplemental_jobs = load_supplemental_jobs(apl_folder)
+    if config.getboolean('PostProcessing', 'consolidate_supplemental', fallback=False):
+        return consolidate_supplemental_jobs(supplemental_jobs)
+    return supplemental_jobs
+
+def supplemental_thread_layout(config, supplemental_jobs, default_threads=None):
+    total_threads = config.getint('PostProcessing', 'supplemental_threads', fallback=None) or default_threads or multiprocessing.cpu_count()
+    if config.getboolean('PostProcessing', 'supplemental_parallel', fallback=True):
+        thread_counts = allocate_supplemental_threads(
+            [count_profilesets(content) for _, content in supplemental_jobs], total_threads
         )
+        return thread_counts, total_threads, len(supplemental_jobs)
+    return [total_threads] * len(supplemental_jobs), total_threads, 1
+
+def supplemental_sim_params(config):
+    return SimulationParameters(
+        iterations=config.getint('Simulations', 'iterations', fallback=None),
+        target_error=config.getfloat('Simulations', 'target_error', fallback=None),
+        targets=config.getint('Simulations', 'targets', fallback=1),
+        time=config.getint('Simulations', 'time', fallback=300)
+    )
+
+def run_supplemental_profilesets(config, simulation_runner, report_folder, progress_tracker, budget=None):
+    apl_folder = config.get('General', 'apl_folder')
 
-        combined_content = f"{updated_content}\n\n{supplemental_content}"
-
-        if sim_params.iterations is not None:
-            combined_content += f"iterations={sim_params.iterations}\n"
-        if sim_params.target_error is not None:
-            combined_content += f"target_error={sim_params.target_error}\n"
-
-        combined_content += f"\n{supplemental_content}"
-
-        output_filename = f"supplemental_{os.path.splitext(supplemental_file)[0]}_{targets}T_{sim_time}sec.json"
-        output_path = os.path.join(report_folder, output_filename)
-
-        # Create a temporary file with the combined content in the apl_folder
-        temp_file_path = FileHandler.create_temp_file(
-            combined_content,
-            prefix="temp_supplemental_",
-            suffix='.simc',
-            dir=apl_folder
-        )
+    supplemental_talents = config.get('PostProcessing', 'supplemental_talents', fallback='')
+    if not supplemental_talents:
+        logger.error("Supplemental talents not specified in config. Skipping supplemental profilesets.")
+        return
 
-        if temp_file_path is None:
-            logger.error(f"Failed to create temporary file for {supplemental_file}")
-            continue
+    supplemental_jobs = load_supplemental_jobs(apl_folder)
+    categories = [os.path.splitext(supplemental_file)[0] for supplemental_file, _ in supplemental_jobs]
+    consolidated = config.getboolean('PostProcessing', 'consolidate_supplemental', fallback=False)
+    if consolidated:
+        supplemental_jobs = consolidate_supplemental_jobs(supplemental_jobs)
+    if not supplemental_jobs:
+        return
 
+    # In a batch the layout is planned for this pipeline's share of the cores
+    shared_budget = simulation_runner.core_budget
+    thread_counts, total_threads, max_workers = supplemental_thread_layout(
+        config, supplemental_jobs, shared_budget.total_threads if shared_budget else None
+    )
+    base_params = supplemental_sim_params(config)
+    core_budget = shared_budget or CoreBudget(total_threads)
+
+    def run_job(position, supplemental_file, supplemental_content, threads, sim_params):
+        name = os.path.splitext(supplemental_file)[0]
+        job_progress_tracker = ProgressTracker(1, count_profilesets(supplemental_content), desc=name, position=position)
+        with tracer.span('wait_for_cores', 'scheduling', shard=name, threads=threads):
+            leased = core_budget.acquire(threads)
+        temp_file_path = None
         try:
-            # Run the simulation with the temporary file
-            simulation_runner.run_simc(temp_file_path, output_path, supplemental_progress_tracker)
+            with placer.pinned(leased) as cpus:
+                # A pinned run uses exactly one simc thread per assigned CPU
+                threads = len(cpus) if cpus else leased
+                output_filename = f"supplemental_{name}_{sim_params.targets}T_{sim_params.time}sec.json"
+                output_path = os.path.join(report_folder, output_filename)
+
+                def simulate(content):
+                    nonlocal temp_file_path
+                    combined_content = simulation_runner.build_supplemental_input(sim_params, content, threads)
+
+                    # Create a temporary file with the combined content in the apl_folder
+                    temp_file_path = FileHandler.create_temp_file(
+                        combined_content,
+                        prefix="temp_supplemental_",
+                        suffix='.simc',
+                        dir=apl_folder
+                    )
+
+                    if temp_file_path is None:
+                        logger.error(f"Failed to create temporary file for {supplemental_file}")
+                        return None
+
+                    # Run the simulation with the temporary file
+                    run_key = make_run_key(config, sim_params, threads)
+                    return simulation_runner.run_simc_isolated(
+                        temp_file_path, output_path, job_progress_tracker, run_key, count_profilesets(content)
+                    )
+
+                if not config.getboolean('General', 'json_output', fallback=False):
+                    return simulate(supplemental_content)
+
+                # Only the profilesets whose content changed since the last run (or that
+                # the shared cache does not know) are simulated again
+                _, blocks = split_profilesets(supplemental_content)
+                previous = load_json_report(output_path) if reuse_previous_results(config) and os.path.exists(output_path) else None
+                return simulation_runner.run_with_result_cache(
+                    simulation_runner.build_supplemental_input(sim_params, '', threads=1),
+                    ['\n'.join(lines) for lines in blocks.values()], output_path,
+                    lambda queued: simulate('\n\n'.join(queued)), previous
+                )
         finally:
             # Clean up the temporary file
             FileHandler.safe_delete(temp_file_path)
+            core_budget.release(leased)
+            job_progress_tracker.close()
+
+    def run_traced_job(position, supplemental_file, supplemental_content, threads, sim_params):
+        with tracer.span('shard', shard=os.path.splitext(supplemental_file)[0], profilesets=count_profilesets(supplemental_content)):
+            return run_job(position, supplemental_file, supplemental_content, threads, sim_params)
+
+    def job_params(supplemental_file):
+        if budget is None:
+            return base_params
+        return budget.params_for(os.path.splitext(supplemental_file)[0], base_params)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(run_traced_job, position, supplemental_file, supplemental_content, threads, job_params(supplemental_file))
+            for position, ((supplemental_file, supplemental_content), threads)
+            in enumerate(zip(supplemental_jobs, thread_counts))
+        ]
+        results = [future.result() for future in futures]
+
+    if consolidated and results[0] and results[0][0] and config.getboolean('General', 'json_output', fallback=False):
+        sim_params = job_params(CONSOLIDATED_SUPPLEMENTAL_FILE)
+        split_consolidated_report(
+            os.path.join(report_folder, f"supplemental_{os.path.splitext(CONSOLIDATED_SUPPLEMENTAL_FILE)[0]}_{sim_params.targets}T_{sim_params.time}sec.json"),
+            categories
+        )
 
-        supplemental_progress_tracker.start_new_simulation()
-
-    supplemental_progress_tracker.close()
     logger.info("Supplemental profilesets simulations completed.")
 
-def run_create_profiles(config_path):
-    logger.info("Running create_profiles.py script...")
-    create_profiles_script_path = os.path.join(os.path.dirname(__file__), 'create_profiles.py')
+def run_preflight_checks(config, simulation_runner, simulations, profiles):
+    """Run every assembled scenario and supplemental input at one iteration, in
+    parallel, so input errors surface in seconds instead of mid-run. Each input
+    keeps the baseline and only the profilesets that bring a template or
+    supplemental line no other one has, which parses every line of the full
+    input without simulating thousands of recombinations of them."""
+    apl_folder = config.get('General', 'apl_folder')
+    single_sim = config.getboolean('Simulations', 'single_sim', fallback=False)
+    jobs = [
+        PreflightJob(generate_output_filename(config, sim_params).replace('.html', ''), sample_profilesets(simulation_runner.build_simc_input(sim_params, profiles, single_sim)))
+        for sim_params in simulations
+    ]
+    if config.getboolean('PostProcessing', 'supplemental_profilesets', fallback=False) and config.get('PostProcessing', 'supplemental_talents', fallback=''):
+        sim_params = supplemental_sim_params(config)
+        jobs.extend(
+            PreflightJob(os.path.splitext(supplemental_file)[0], sample_profilesets(simulation_runner.build_supplemental_input(sim_params, content)))
+            for supplemental_file, content in load_supplemental_jobs(apl_folder)
+        )
 
-    cmd = [sys.executable, create_profiles_script_path, config_path]
+    # Generated and temporary inputs would shadow the files the lines came from
+    source_map = SourceMap(config.project_root)
+    for path in sorted(glob.glob(os.path.join(apl_folder, '*.simc'))):
+        if not os.path.basename(path).startswith(('temp_', 'full_character')):
+            source_map.add_file(path)
 
+    def profileset_origin(name):
+        match = re.match(r'\[(.*?)\] \((.*?)\) - (.*)', name)
+        return [source_map.locate_template(template) for template in match.groups()] if match else []
+
+    with tracer.span('preflight', inputs=len(jobs)):
+        issues = run_preflight(
+            os.path.abspath(config.get('General', 'simc')), jobs, apl_folder, source_map, profileset_origin,
+            timeout=config.getfloat('Simulations', 'preflight_timeout', fallback=PREFLIGHT_TIMEOUT)
+        )
+    if issues:
+        print_issues(issues)
+        bus.publish('error', stage='preflight', message=f"{len(issues)} pre-flight error(s)")
+        return False
+    logger.info(f"Pre-flight passed for {len(jobs)} input(s) ({sum(count_profilesets(job.content) for job in jobs)} sampled profilesets).")
+    return True
+
+def run_create_profiles(config_path, fetch=True, filtered=None):
+    """Create the supplemental profilesets in-process; returns the filtered item data for reuse."""
+    logger.info("Creating supplemental profilesets...")
     try:
-        subprocess.run(cmd, check=True)
-        logger.info("create_profiles.py script completed successfully.")
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Error running create_profiles.py script: {e}")
+        filtered = create_profiles(config_path, fetch=fetch, filtered=filtered)
+        logger.info("Supplemental profilesets created successfully.")
+        return filtered
+    except Exception as e:
+        logger.error(f"Error creating supplemental profilesets: {e}")
         raise
 
-def run_post_processing(config, simulation_runner, profiles, report_folder, progress_tracker=None):
-    if progress_tracker is None:
-        progress_tracker = ProgressTracker(1)  # Create a new tracker if not provided
+# Settings that change how a run is observed or scheduled, not what it produces
+OBSERVABILITY_KEYS = (
+    'debug', 'trace', 'cpu_affinity', 'memory_limit', 'metrics_textfile', 'metrics_port',
+    'progress_events', 'progress_log', 'clear_cache', 'incremental'
+)
+# Files in the APL folder written by the pipeline itself rather than edited by hand
+GENERATED_APL_FILES = ['temp_*', 'full_character*']
+PROFILESET_FILES = '*_profilesets*.simc'
+ITEM_DATA = ['items', 'enchants', 'consumables', 'embellishments']
+
+def reuse_previous_results(config):
+    # The same switches that re-run every stage also re-simulate every profileset
+    return not config.getboolean('General', 'clear_cache', fallback=False) and config.getboolean('General', 'incremental', fallback=True)
+
+def make_stage_graph(config, report_folder):
+    return StageGraph(os.path.join(report_folder, MANIFEST_FILE), force=not reuse_previous_results(config))
+
+def config_snapshot(config, sections, exclude=()):
+    """The settings of the given sections, as a stage's parameters."""
+    return {
+        section: {key: value for key, value in config.config.items(section) if key not in exclude}
+        for section in sections if config.config.has_section(section)
+    }
 
-    if config.getboolean('PostProcessing', 'supplemental_profilesets', fallback=False):
-        logger.info("\nRunning supplemental profilesets simulations...")
-        run_supplemental_profilesets(config, simulation_runner, report_folder, progress_tracker)
+def add_item_stages(graph, config, items):
+    """Fetching the item data and creating the supplemental profilesets from it.
+    items holds the fetched data, so a batch fetches at most once."""
+    apl_folder = config.get('General', 'apl_folder')
+    data_files = [os.path.join(config.project_root, 'data', f'filtered_{name}.json') for name in ITEM_DATA]
 
-    if config.getboolean('PostProcessing', 'generate_combined_apl', fallback=False):
-        run_combine_script(config)
+    def fetch():
+        if 'filtered' in items:
+            return True
+        try:
+            items['filtered'] = fetch_and_filter()
+        except (OSError, ValueError) as e:
+            if not all(os.path.exists(path) for path in data_files):
+                logger.error(f"Fetching the item data failed: {e}")
+                return False
+            logger.warning(f"Fetching the item data failed ({e}); using the item data already in the data folder.")
+        return True
+
+    def create():
+        items['filtered'] = run_create_profiles(config.config_path, fetch=False, filtered=items.get('filtered'))
+
+    # The download is conditional and the filtered files are only rewritten when
+    # their content changes, so checking on every run only re-runs what changed
+    graph.add(Stage('fetch_items', fetch, outputs=data_files, always=True, rewrites_outputs=False))
+    graph.add(Stage(
+        'create_profiles', create,
+        inputs=data_files + [os.path.join(apl_folder, 'gear.simc')],
+        outputs=[os.path.join(apl_folder, name) for name in ['trinket_profilesets.simc', 'gem_profilesets.simc', 'consumable_profilesets.simc', 'embellishment_profilesets.simc']],
+        after=['fetch_items'],
+        rewrites_outputs=False
+    ))
+
+def simc_binary(config):
+    simc_path = config.get('General', 'simc')
+    return [os.path.abspath(simc_path)] if simc_path else []
 
+def scenario_stage_name(sim_params):
+    if sim_params.fight_style == 'DungeonSlice':
+        return 'simulate_dungeonslice'
+    return f'simulate_{sim_params.targets}T_{sim_params.time}sec'
+
+def add_simulation_stages(graph, config, simulations, run_scenario):
+    """One stage per scenario, depending on the hand-written APL files, the
+    simc binary and every setting that changes the simulated results."""
+    apl_folder = config.get('General', 'apl_folder')
+    params = config_snapshot(config, ['General', 'Simulations', 'TalentFilters'], OBSERVABILITY_KEYS)
+    names = []
+    for sim_params in simulations:
+        output_path = os.path.join(config.get('General', 'report_folder'), generate_output_filename(config, sim_params))
+        outputs = []
+        if config.getboolean('General', 'json_output', fallback=False):
+            outputs.append(output_path.replace('.html', '.json'))
+        if config.getboolean('General', 'html_output', fallback=False):
+            outputs.append(output_path)
+        stage = graph.add(Stage(
+            scenario_stage_name(sim_params),
+            lambda sim_params=sim_params, output_path=output_path: run_scenario(sim_params, output_path),
+            inputs=[os.path.join(apl_folder, '*.simc')] + simc_binary(config),
+            outputs=outputs,
+            params={**params, 'scenario': sim_params.__dict__},
+            exclude=GENERATED_APL_FILES + [PROFILESET_FILES]
+        ))
+        names.append(stage.name)
+    return names
+
+def add_post_processing_stages(graph, config, run_supplemental):
+    apl_folder = config.get('General', 'apl_folder')
+    report_folder = config.get('General', 'report_folder')
+    names = []
+    if config.getboolean('PostProcessing', 'supplemental_profilesets', fallback=False):
+        names.append(graph.add(Stage(
+            'supplemental', run_supplemental,
+            inputs=[os.path.join(apl_folder, '*.simc')] + simc_binary(config),
+            outputs=[os.path.join(report_folder, 'supplemental_*.json')],
+            params=config_snapshot(config, ['General', 'Simulations', 'PostProcessing'], OBSERVABILITY_KEYS + ('generate_combined_apl', 'generate_website')),
+            after=['create_profiles'],
+            exclude=GENERATED_APL_FILES
+        )).name)
+    if config.getboolean('PostProcessing', 'generate_combined_apl', fallback=False):
+        names.append(graph.add(Stage(
+            'combine_apl', lambda: run_combine_script(config),
+            inputs=[os.path.join(apl_folder, '*.simc')] + simc_binary(config),
+            outputs=[os.path.join(apl_folder, 'full_character.simc')],
+            exclude=GENERATED_APL_FILES + [PROFILESET_FILES]
+        )).name)
     if config.getboolean('PostProcessing', 'generate_website', fallback=False):
-        run_compare_reports_script(config)
+        names.append(graph.add(Stage(
+            'website', lambda: run_compare_reports_script(config),
+            inputs=[os.path.join(report_folder, 'simulation_results.json')] + [
+                os.path.join(config.project_root, name) for name in ['talent_dictionary.json', 'template.html', 'styles.css', 'script.js']
+            ],
+            outputs=[os.path.join(config.project_root, f'website_{config.spec_name.lower()}', f'{config.spec_name.lower()}.html')],
+            params={'spec_name': config.spec_name}
+        )).name)
+    return names
 
 def parse_targettime(config):
     targettime = config.get('Simulations', 'targettime', '').strip()
@@ -870,41 +1826,19 @@ def parse_targettime(config):
             ))
     return simulations
 
-def run_simulations(config, talent_hash_manager, talent_strings, simulations, profiles, report_folder):
-    total_simulations = len(simulations)
-    estimated_profiles_per_sim = len(profiles) if not config.getboolean('Simulations', 'single_sim', fallback=False) else 1
-    progress_tracker = ProgressTracker(total_simulations, estimated_profiles_per_sim)
-
-    # Pre-generate all talent hashes
-    talent_combinations = [
-        (hero_talent, class_talent, spec_talent)
-        for hero_talent in talent_strings['hero_talents'].values()
-        for class_talent in talent_strings['class_talents'].values()
-        for spec_talent in talent_strings['spec_talents'].values()
-    ]
-    talent_hash_manager.get_hashes_batch(talent_combinations)
-
-    simulation_runner = SimulationRunner(config, talent_hash_manager, talent_strings)
-
-    for sim_params in simulations:
-        output_filename = generate_output_filename(config, sim_params)
-        output_path = os.path.join(report_folder, output_filename)
-
-        simulation_runner.run_simulation(sim_params, profiles, output_path, progress_tracker)
-        progress_tracker.start_new_simulation()
-
-    progress_tracker.close()
-    logger.info("\nMain simulations completed.")
-
 def prepare_profiles(config, talent_hash_manager, single_sim):
     if single_sim:
-        return ["Single Sim"], {}, {}, {}
+        return ["Single Sim"], {}, {}, {}, 0
 
     profiles_file = os.path.join(config.get('General', 'apl_folder'), 'profile_templates.simc')
-    talents, talent_strings = parse_profiles_simc(profiles_file, talent_hash_manager)
+    validator = None
+    if config.getboolean('Simulations', 'validate_talents', fallback=True):
+        validator = TalentTreeValidator(config.spec_name)
+    with tracer.span('parse_profiles_simc'):
+        talents, talent_strings, _ = parse_profiles_simc(profiles_file, None)
     if talents is None:
         logger.error("Failed to parse profile templates. Exiting.")
-        return None, None, None, None
+        return None, None, None, None, 0
 
     filtered_talents = {
         category: filter_talents(
@@ -915,9 +1849,25 @@ def prepare_profiles(config, talent_hash_manager, single_sim):
         ) for category in ['hero_talents', 'class_talents', 'spec_talents']
     }
 
+    # Pruned after the filters, so the count covers only combinations this run would have simulated
+    pruned_count = 0
+    if validator is not None:
+        talent_strings, _ = validator.prune_templates(talent_strings)
+        talents = {category: dict(templates) for category, templates in talent_strings.items()}
+        selected = math.prod(len(items) for items in filtered_talents.values())
+        filtered_talents = {
+            category: [(name, content) for name, content in items if name in talents[category]]
+            for category, items in filtered_talents.items()
+        }
+        pruned_count = selected - math.prod(len(items) for items in filtered_talents.values())
+        if pruned_count:
+            logger.info(f"Pruned {pruned_count} invalid talent combinations.")
+    if talent_hash_manager is not None:
+        hash_talent_combinations(talent_hash_manager, talents)
+
     if not any(filtered_talents.values()):
         logger.error("No valid profiles generated. Please check your talent selections.")
-        return None, None, None, None
+        return None, None, None, None, 0
 
     profiles = [
         generate_simc_profile(hero_name, class_name, spec_name, talent_strings)
@@ -926,56 +1876,367 @@ def prepare_profiles(config, talent_hash_manager, single_sim):
         for spec_name, _ in filtered_talents['spec_talents']
     ]
 
-    return profiles, talents, filtered_talents, talent_strings
+    return profiles, talents, filtered_talents, talent_strings, pruned_count
+
+def optimizer_settings(config):
+    search = config.get('Optimizer', 'search', fallback='hill_climb').strip().lower()
+    if search not in SEARCH_MODES:
+        raise ValueError(f"Unknown optimizer search '{search}', expected one of {', '.join(SEARCH_MODES)}")
+    return OptimizerSettings(
+        search=search,
+        population=max(1, config.getint('Optimizer', 'population', fallback=24)),
+        generations=max(1, config.getint('Optimizer', 'generations', fallback=15)),
+        patience=max(1, config.getint('Optimizer', 'patience', fallback=2)),
+        elites=max(1, config.getint('Optimizer', 'elites', fallback=4)),
+        z=config.getfloat('Optimizer', 'z', fallback=1.0),
+        seed=config.getint('Optimizer', 'seed', fallback=1)
+    )
+
+def optimizer_start(config, validator):
+    """Starting build: the [Optimizer] start templates, or else the configured talents export string."""
+    start_templates = config.get('Optimizer', 'start', fallback='').split()
+    if start_templates:
+        profiles_file = os.path.join(config.get('General', 'apl_folder'), 'profile_templates.simc')
+        _, talent_strings, _ = parse_profiles_simc(profiles_file, None)
+        if talent_strings is None or len(start_templates) != 3:
+            logger.error("[Optimizer] start needs a hero, a class and a spec template name.")
+            return None
+        missing = [name for category, name in zip(TREE_NODE_KEYS, start_templates) if name not in talent_strings[category]]
+        if missing:
+            logger.error(f"Unknown start template(s): {', '.join(missing)}")
+            return None
+        build = TalentBuild(*(talent_strings[category][name] for category, name in zip(TREE_NODE_KEYS, start_templates)))
+    else:
+        try:
+            build = TalentBuild(**validator.decode_build(config.get('Simulations', 'talents', fallback='')))
+        except ValueError as e:
+            logger.error(f"Could not decode [Simulations] talents: {e}")
+            return None
+
+    errors = validator.validate_combination(build.hero_talents, build.class_talents, build.spec_talents)
+    if errors:
+        logger.error(f"The starting build is not valid: {'; '.join(errors)}")
+        return None
+    return build
 
-def main(config_path):
-    config = Config(config_path)
+def run_optimizer(config, dry_run):
+    report_folder = config.get('General', 'report_folder', os.path.join(config.project_root, 'reports'))
+    if not FileHandler.ensure_directory(report_folder):
+        logger.error("Unable to create or access the report folder. Exiting.")
+        return
+
+    settings = optimizer_settings(config)
+    validator = TalentTreeValidator(config.spec_name)
+    start = optimizer_start(config, validator)
+    if start is None:
+        return
+    sim_params = parse_targettime(config)[0]
+    label = generate_output_filename(config, sim_params).replace('.html', '').replace('simc_', 'optimizer_', 1)
+    print(f"\nTalent Optimizer ({settings.search}): up to {settings.generations} generation(s) of {settings.population} build(s), "
+          f"scenario {label}")
+    for category, talent_string in start.strings().items():
+        print(f"  Start {category}: {talent_string}")
+    if dry_run:
+        logger.info("\nDry run complete. SimC was not invoked.")
+        return True
+
+    runtime_history = RuntimeHistory()
+    simulation_runner = SimulationRunner(config, None, {}, runtime_history)
+    progress_tracker = ProgressTracker(settings.generations + 1, settings.population, desc='Optimizer')
+    generation_output = os.path.join(report_folder, f"{label}_generation.html")
+
+    def evaluate(builds, generation):
+        names = [f"Optimizer {generation}-{i}" for i in range(len(builds))]
+        profiles = [
+            talent_profileset(name, build.hero_talents, build.class_talents, build.spec_talents)
+            for name, build in zip(names, builds)
+        ]
+        with tracer.span('optimizer_generation', generation=generation, profilesets=len(profiles)):
+            results = simulation_runner.run_profiles(sim_params, profiles, generation_output, progress_tracker)
+        progress_tracker.start_new_simulation()
+        report = load_json_report(generation_output) if results and results[0] else None
+        FileHandler.safe_delete(generation_output.replace('.html', '.json'))
+        if report is None:
+            return [None] * len(builds)
+        means = {result['name']: (result['mean'], result.get('mean_stddev', 0.0)) for result in report['sim']['profilesets']['results']}
+        return [means.get(name) for name in names]
+
+    try:
+        result = TalentOptimizer(NeighbourGenerator(validator), start, settings, evaluate).run()
+    finally:
+        progress_tracker.close()
+        runtime_history.save()
+        tracer.write(trace_file_path(report_folder))
+    if result is None:
+        return
 
-    if config.getboolean('General', 'clear_cache', fallback=False) or config.getboolean('PostProcessing', 'supplemental_profilesets', fallback=False):
-        run_create_profiles(config_path)
+    best = result.best.build
+    try:
+        best_export = validator.encode_build(best.hero_talents, best.class_talents, best.spec_talents)
+    except (KeyError, ValueError) as e:
+        logger.warning(f"Could not encode the best build as a talent string: {e}")
+        best_export = None
+    write_optimizer_report(os.path.join(report_folder, f"{label}.json"), label, settings, result, best_export)
+
+    print("\nOptimizer Result:")
+    print("=================")
+    print(f"  Stopped: {result.stop_reason}")
+    print(f"  Builds simulated: {result.evaluated} in {len(result.generations)} generation(s)")
+    print(f"  Start DPS: {result.start.mean:,.0f}")
+    print(f"  Best DPS: {result.best.mean:,.0f} ({result.best.mean - result.start.mean:+,.0f})")
+    if best_export:
+        print(f"  Talents: {best_export}")
+    for category, talent_string in best.strings().items():
+        print(f"  {category}: {talent_string}")
+    return True
+
+def main(config_path, dry_run=False, profile=False, optimize=False):
+    config = Config(config_path)
+    if config.getboolean('General', 'trace', fallback=False):
+        enable_tracing()
+    configure_metrics(config.get('General', 'metrics_textfile', fallback=None), config.getint('General', 'metrics_port', fallback=None))
+    configure_progress_events(config.get('General', 'progress_events', fallback=None), config.getboolean('General', 'progress_log', fallback=False))
+    configure_affinity(config.getboolean('General', 'cpu_affinity', fallback=False))
+    configure_memory_limit(config.get('General', 'memory_limit', fallback=None))
+    configure_shared_cache(config.get('General', 'cache_server', fallback=None), config.get('General', 'cache_token', fallback=None))
+    bus.start_run('generate_sims', spec=config.spec_name, config=config.config_path, dry_run=dry_run)
+    if profile:
+        profiler.start(config.get('General', 'report_folder', os.path.join(config.project_root, 'reports')), 'generate_sims')
+    status = 'error'
+    try:
+        with profiler.stage('pipeline'):
+            if optimize:
+                status = 'completed' if run_optimizer(config, dry_run) else 'failed'
+            else:
+                status = 'completed' if run_pipeline(config, config_path, dry_run) else 'failed'
+    finally:
+        bus.publish('run_end', status=status)
+        bus.close()
+        profiler.stop()
 
-    talent_hash_manager = TalentHashManager(config)
+def run_cli(args):
+    if len(args.config) > 1 and not args.optimize:
+        run_batch(args.config, dry_run=args.dry_run, profile=args.profile, threads=args.threads)
+    else:
+        for config_path in args.config:
+            main(config_path, dry_run=args.dry_run, profile=args.profile, optimize=args.optimize)
 
+def run_pipeline(config, config_path, dry_run, batch=None):
+    start_time = time.time()
     report_folder = config.get('General', 'report_folder', os.path.join(config.project_root, 'reports'))
     if not FileHandler.ensure_directory(report_folder):
         logger.error("Unable to create or access the report folder. Exiting.")
         return
 
+    # Every stage below runs only when its inputs or settings changed since it last ran
+    graph = make_stage_graph(config, report_folder)
+    if dry_run:
+        logger.info("Dry run: using existing profile and supplemental files.")
+    elif batch is None and (config.getboolean('General', 'clear_cache', fallback=False) or config.getboolean('PostProcessing', 'supplemental_profilesets', fallback=False)):
+        add_item_stages(graph, config, {})
+        if not graph.run(['fetch_items', 'create_profiles']):
+            return
+
     single_sim = config.getboolean('Simulations', 'single_sim', fallback=False)
-    profiles, talents, filtered_talents, talent_strings = prepare_profiles(config, talent_hash_manager, single_sim)
-    if not profiles:
-        logger.error("No profiles generated. Check your talent filters and configuration.")
-        return
+    runtime_history = batch.runtime_history if batch else RuntimeHistory()
+    # Members of a batch plan one at a time so their summaries do not interleave;
+    # a member simulates while the next one plans
+    with batch.planning if batch else nullcontext():
+        talent_hash_manager = TalentHashManager(config)
+
+        # Talent hashes are only needed to annotate results, so they are generated
+        # in the background once the pre-flight check passes and skipped by a dry run
+        profiles, talents, filtered_talents, talent_strings, pruned_count = prepare_profiles(config, None, single_sim)
+        if not profiles:
+            logger.error("No profiles generated. Check your talent filters and configuration.")
+            return
 
-    simulations = parse_targettime(config)
+        simulations = parse_targettime(config)
+        factorial_design = make_factorial_design(config, filtered_talents)
+        coordinate_search = None if factorial_design else make_coordinate_search(config, filtered_talents)
+        if factorial_design:
+            # Plan, pre-flight and progress cover the design; confirmations are added per scenario
+            profiles = factorial_profiles(factorial_design, factorial_design.cells(), talent_strings)
+        elif coordinate_search:
+            # One round of sweeps touches every template, which is what the plan and pre-flight need
+            profiles = factorial_profiles(coordinate_search, coordinate_search.cross((0, 0, 0)), talent_strings)
+
+        print_summary(talents, filtered_talents, profiles, config, simulations, pruned_count, factorial_design, coordinate_search)
+
+        print_plan(*plan_run(config, simulations, profiles, runtime_history))
+        budget = make_time_budget(config, simulations, profiles, runtime_history, start_time)
+        if budget:
+            budget.print_plan()
+
+        post_processor = BackgroundStage('post_processing')
+        simulation_runner = SimulationRunner(
+            config, talent_hash_manager, talent_strings, runtime_history, factorial_design, coordinate_search,
+            batch.core_budget if batch else None, post_processor
+        )
 
-    print_summary(talents, filtered_talents, profiles, config, simulations)
+        def run_scenario(sim_params, output_path):
+            scenario = os.path.basename(output_path).replace('.html', '')
+            if budget:
+                sim_params = budget.params_for(scenario, sim_params)
+            with tracer.span('scenario', 'scenario', scenario=scenario, profilesets=len(profiles)):
+                results = simulation_runner.run_simulation(sim_params, profiles, output_path, progress_tracker)
+            progress_tracker.start_new_simulation()
+            # A failed run must not be recorded against a report left over from an earlier one
+            return bool(results and results[0])
+
+        def run_supplemental():
+            logger.info("\nRunning supplemental profilesets simulations...")
+            with tracer.span('supplemental'):
+                run_supplemental_profilesets(config, simulation_runner, report_folder, progress_tracker, budget)
+
+        scenario_stages = add_simulation_stages(graph, config, simulations, run_scenario)
+        post_stages = add_post_processing_stages(graph, config, run_supplemental)
+        outdated = graph.outdated(scenario_stages + post_stages)
+        if dry_run:
+            graph.print_plan(scenario_stages + post_stages)
+            logger.info("\nDry run complete. SimC was not invoked.")
+            return True
 
-    total_simulations = len(simulations)
-    estimated_profiles_per_sim = len(profiles) if not single_sim else 1
-    progress_tracker = ProgressTracker(total_simulations, estimated_profiles_per_sim)
-    simulation_runner = SimulationRunner(config, talent_hash_manager, talent_strings)
+        outdated_simulations = [sim_params for sim_params in simulations if scenario_stage_name(sim_params) in outdated]
+        if (outdated_simulations or 'supplemental' in outdated) and config.getboolean('Simulations', 'preflight', fallback=True) \
+                and not run_preflight_checks(config, simulation_runner, outdated_simulations, profiles):
+            logger.error("Pre-flight check failed. Fix the inputs above before simulating.")
+            return
+        if outdated_simulations and not single_sim:
+            post_processor.submit('hash_talents', hash_talent_combinations, talent_hash_manager, talents, False)
 
+    estimated_profiles_per_sim = len(profiles) if not single_sim else 1
+    progress_tracker = ProgressTracker(
+        max(1, len(outdated_simulations)), estimated_profiles_per_sim, desc=batch.name if batch else None, position=batch.position if batch else None
+    )
     try:
-        for sim_params in simulations:
-            output_filename = generate_output_filename(config, sim_params)
-            output_path = os.path.join(report_folder, output_filename)
-
-            simulation_runner.run_simulation(sim_params, profiles, output_path, progress_tracker)
-            progress_tracker.start_new_simulation()
+        # A scenario is only up to date once its report is annotated with the talent hashes
+        scenarios_ok = graph.run(scenario_stages, record=False)
 
+        # Supplemental runs, the combined APL and the website read the annotated reports
+        post_processor.wait()
+        graph.commit()
         logger.info("\nMain simulations completed.")
 
         # Run post-processing tasks
-        run_post_processing(config, simulation_runner, profiles, report_folder, progress_tracker)
+        with tracer.span('post_processing'):
+            post_ok = graph.run(post_stages)
 
     finally:
+        post_processor.close()
         progress_tracker.close()
-
+        runtime_history.save()
+        tracer.write(trace_file_path(report_folder))
+        if batch is None:
+            metrics.shutdown()
+
+    if not (scenarios_ok and post_ok):
+        logger.error(f"Stages failed: {', '.join(graph.failed)}")
+        return False
     logger.info("\nAll processes completed.")
+    return True
+
+def prepare_batch(configs, dry_run):
+    """Run the stages every config of a batch would otherwise repeat: the item
+    and enchant download, create_profiles once per APL folder and talents.json.
+    Returns the configs whose profileset files could not be prepared."""
+    failed = []
+    if not dry_run:
+        apl_folders = {}  # APL folder -> whether its profileset files were prepared
+        items = {}  # item data fetched for the first config, passed on to the rest
+        for config in configs:
+            if not (config.getboolean('General', 'clear_cache', fallback=False) or config.getboolean('PostProcessing', 'supplemental_profilesets', fallback=False)):
+                continue
+            apl_folder = os.path.realpath(config.get('General', 'apl_folder'))
+            if apl_folder not in apl_folders:
+                report_folder = config.get('General', 'report_folder')
+                if not FileHandler.ensure_directory(report_folder):
+                    logger.error(f"Unable to create or access the report folder of {config.config_path}.")
+                    failed.append(config)
+                    continue
+                graph = make_stage_graph(config, report_folder)
+                add_item_stages(graph, config, items)
+                with tracer.span('create_profiles', config=os.path.basename(config.config_path)):
+                    apl_folders[apl_folder] = graph.run()
+            if not apl_folders[apl_folder]:
+                logger.error(f"Profileset files for {config.config_path} could not be prepared; skipping it.")
+                failed.append(config)
+
+    # Later calls in this process reuse the data, so each pipeline skips the download
+    with tracer.span('initialize_talent_data'):
+        initialize_talent_data(force_new=any(config.getboolean('General', 'clear_cache', fallback=False) for config in configs))
+    return failed
+
+def run_batch(config_paths, dry_run=False, profile=False, threads=None):
+    """Run several configs as one batch: shared downloads happen once and the
+    simc runs of every pipeline share one pool of cores."""
+    configs = [Config(config_path) for config_path in config_paths]
+    # Run-wide options (metrics, progress events, profiling) come from the first config
+    first = configs[0]
+    if any(config.getboolean('General', 'trace', fallback=False) for config in configs):
+        enable_tracing()
+    configure_metrics(first.get('General', 'metrics_textfile', fallback=None), first.getint('General', 'metrics_port', fallback=None))
+    configure_progress_events(first.get('General', 'progress_events', fallback=None), first.getboolean('General', 'progress_log', fallback=False))
+    configure_affinity(first.getboolean('General', 'cpu_affinity', fallback=False))
+    configure_memory_limit(first.get('General', 'memory_limit', fallback=None))
+    configure_shared_cache(first.get('General', 'cache_server', fallback=None), first.get('General', 'cache_token', fallback=None))
+    bus.start_run(
+        'generate_sims', spec=', '.join(config.spec_name for config in configs),
+        config=', '.join(config.config_path for config in configs), dry_run=dry_run
+    )
+    if profile:
+        profiler.start(first.get('General', 'report_folder', os.path.join(first.project_root, 'reports')), 'generate_sims')
+    status = 'error'
+    try:
+        with profiler.stage('batch'):
+            with tracer.span('prepare_batch'):
+                unprepared = prepare_batch(configs, dry_run)
+
+            scheduler = FairShareScheduler(threads or multiprocessing.cpu_count())
+            runtime_history = RuntimeHistory()
+            planning = threading.Lock()
+            names = [os.path.splitext(os.path.basename(config.config_path))[0] for config in configs]
+            members = [
+                BatchMember(name, position, scheduler.budget(name), runtime_history, planning)
+                for position, name in enumerate(names)
+            ]
+            logger.info(f"Batch of {len(configs)} configs sharing {scheduler.total_threads} simc threads.")
+
+            def run_member(config, member):
+                if config in unprepared:
+                    member.core_budget.close()
+                    return False
+                try:
+                    with tracer.span('batch_member', config=member.name):
+                        return run_pipeline(config, config.config_path, dry_run, member)
+                except Exception:
+                    logger.exception(f"Pipeline for {member.name} failed.")
+                    return False
+                finally:
+                    # Its share goes to the members still running
+                    member.core_budget.close()
+
+            with ThreadPoolExecutor(max_workers=len(configs)) as executor:
+                outcomes = list(executor.map(run_member, configs, members))
+
+            if not dry_run:
+                scheduler.print_usage()
+            print("\nBatch Result:")
+            print("=============")
+            for member, outcome in zip(members, outcomes):
+                print(f"  {member.name}: {'completed' if outcome else 'failed'}")
+            status = 'completed' if all(outcomes) else 'failed'
+    finally:
+        bus.publish('run_end', status=status)
+        bus.close()
+        metrics.shutdown()
+        profiler.stop()
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Generate and run SimulationCraft profiles')
-    parser.add_argument('config', help='Path to configuration file')
-    args = parser.parse_args()
-    main(args.config)
\ No newline at end of file
+    parser.add_argument('config', nargs='+', help='Path to configuration file; several configs run as one batch sharing the cores')
+    parser.add_argument('--dry-run', action='store_true', help='Print the execution plan and runtime estimate without running SimC')
+    parser.add_argument('--profile', action='store_true', help='Write per-stage cProfile stats and tracemalloc allocations to the report folder')
+    parser.add_argument('--optimize', action='store_true', help='Search for a better talent build by local search from the configured talents')
+    parser.add_argument('--threads', type=int, help='Total simc threads shared by a batch of configs (default: all cores)')
+    run_cli(parser.parse_args())
\ No newline at end of file
@@ -0,0 +1,125 @@
+import re
+import threading
+import logging
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MEMINFO_FILE = "/proc/meminfo"
+LIMIT_PATTERN = re.compile(r"^\s*([\d.]+)\s*([kmgt]?)b?\s*$", re.IGNORECASE)
+UNIT_MB = {"k": 1 / 1024, "": 1.0, "m": 1.0, "g": 1024.0, "t": 1024.0 * 1024}
+
+
+def read_meminfo_mb(field: str, meminfo_file: str = MEMINFO_FILE) -> Optional[float]:
+    """One field of /proc/meminfo in MB, or None where unavailable."""
+    try:
+        with open(meminfo_file, "r") as f:
+            for line in f:
+                if line.startswith(f"{field}:"):
+                    return int(line.split()[1]) / 1024
+    except (IOError, ValueError, IndexError):
+        pass
+    return None
+
+
+def parse_memory_limit(text: Optional[str]) -> Optional[float]:
+    """A limit such as "48G", "12000M", "12000" (MB) or "80%" of MemTotal, in MB."""
+    text = (text or "").strip()
+    if not text:
+        return None
+    if text.endswith("%"):
+        total = read_meminfo_mb("MemTotal")
+        if total is None:
+            raise ValueError("A percentage memory limit needs /proc/meminfo")
+        return total * float(text[:-1]) / 100
+    match = LIMIT_PATTERN.match(text)
+    if not match:
+        raise ValueError(f"Invalid memory limit '{text}', expected e.g. 48G, 12000M or 80%")
+    return float(match.group(1)) * UNIT_MB[match.group(2).lower()]
+
+
+@dataclass(eq=False)
+class Admission:
+    label: str
+    projected_mb: float
+    observed_mb: float = 0.0
+
+    @property
+    def reserved_mb(self) -> float:
+        # A process that outgrows its projection keeps the larger figure reserved
+        return max(self.projected_mb, self.observed_mb)
+
+
+class MemoryGate:
+    """Admits simc processes only while their projected memory fits a limit.
+
+    Each process reserves its projected peak RSS, raised to the RSS actually
+    observed while it runs. A new process waits in arrival order until its
+    projection fits next to the reservations of the running ones, so large
+    runs are not overtaken indefinitely by small ones. A process that does
+    not fit even on its own is admitted once nothing else is running.
+    """
+
+    def __init__(self):
+        self.limit_mb: Optional[float] = None
+        self.running: List[Admission] = []
+        self.queue: Deque[Admission] = deque()
+        self.condition = threading.Condition()
+
+    @property
+    def enabled(self) -> bool:
+        return self.limit_mb is not None
+
+    def configure(self, limit_mb: Optional[float]):
+        self.limit_mb = limit_mb
+        if limit_mb is not None:
+            logger.info(f"Memory admission: simc processes are admitted while projected memory fits {limit_mb:,.0f} MB.")
+
+    def reserved_mb(self) -> float:
+        return sum(admission.reserved_mb for admission in self.running)
+
+    def _fits(self, admission: Admission) -> bool:
+        if self.queue[0] is not admission:
+            return False
+        return not self.running or self.reserved_mb() + admission.projected_mb <= self.limit_mb
+
+    def admit(self, label: str, projected_mb: float) -> Admission:
+        """Block until the process may start; release the returned admission when it exits."""
+        admission = Admission(label, projected_mb)
+        if not self.enabled:
+            return admission
+        with self.condition:
+            self.queue.append(admission)
+            if not self._fits(admission):
+                logger.info(
+                    f"Memory admission: {label} needs ~{projected_mb:,.0f} MB with {self.reserved_mb():,.0f} of "
+                    f"{self.limit_mb:,.0f} MB reserved; waiting."
+                )
+            self.condition.wait_for(lambda: self._fits(admission))
+            self.queue.popleft()
+            if projected_mb > self.limit_mb:
+                logger.warning(f"Memory admission: {label} is projected at {projected_mb:,.0f} MB, above the limit; running it alone.")
+            self.running.append(admission)
+            self.condition.notify_all()
+        return admission
+
+    def observe(self, admission: Admission, rss_mb: float):
+        with self.condition:
+            admission.observed_mb = max(admission.observed_mb, rss_mb)
+
+    def release(self, admission: Admission):
+        if not self.enabled:
+            return
+        with self.condition:
+            if admission in self.running:
+                self.running.remove(admission)
+            self.condition.notify_all()
+
+
+memory_gate = MemoryGate()
+
+
+def configure_memory_limit(limit: Optional[str]):
+    memory_gate.configure(parse_memory_limit(limit))
@@ -0,0 +1,169 @@
+import os
+import threading
+import time
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+METRIC_PREFIX = "simtoolkit_"
+
+# name -> (type, help)
+METRICS = {
+    "profilesets_completed": ("gauge", "Profilesets finished in the current simc run"),
+    "profilesets_total": ("gauge", "Profilesets in the current simc run"),
+    "profiles_per_second": ("gauge", "Observed profileset throughput of the simc run"),
+    "profile_ms": ("gauge", "Average milliseconds per profileset reported by simc"),
+    "eta_seconds": ("gauge", "Estimated seconds until the simc run finishes"),
+    "simc_threads": ("gauge", "Threads requested from simc"),
+    "simc_cpu_seconds": ("gauge", "CPU seconds consumed by the simc process"),
+    "simc_cpu_utilisation": ("gauge", "Share of the requested simc threads kept busy (0-1)"),
+    "simc_running": ("gauge", "1 while the simc process is running"),
+    "last_update_timestamp_seconds": ("gauge", "Unix time of the last progress sample"),
+}
+
+
+def read_cpu_seconds(pid: int) -> Optional[float]:
+    """User plus system CPU time of a process from /proc, or None where unavailable."""
+    try:
+        with open(f"/proc/{pid}/stat", "r") as f:
+            # The command name may contain spaces, so split after its closing parenthesis
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (IOError, ValueError, IndexError):
+        return None
+
+
+class MetricsRegistry:
+    """Gauges keyed by run label, rendered in the Prometheus text format and
+    published to a node-exporter textfile and/or a local HTTP endpoint."""
+
+    def __init__(self):
+        self.values: Dict[Tuple[str, str], float] = {}
+        self.lock = threading.Lock()
+        self.textfile: Optional[str] = None
+        self.server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.textfile is not None or self.server is not None
+
+    def set(self, name: str, run: str, value: float):
+        with self.lock:
+            self.values[(name, run)] = value
+
+    def render(self) -> str:
+        with self.lock:
+            values = dict(self.values)
+        lines = []
+        for name, (metric_type, help_text) in METRICS.items():
+            samples = [(run, value) for (metric, run), value in values.items() if metric == name]
+            if not samples:
+                continue
+            lines.append(f"# HELP {METRIC_PREFIX}{name} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}{name} {metric_type}")
+            for run, value in sorted(samples):
+                label = run.replace("\\", "\\\\").replace('"', '\\"')
+                lines.append(f'{METRIC_PREFIX}{name}{{run="{label}"}} {float(value)!r}')
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self):
+        if self.textfile is None:
+            return
+        # node-exporter may read at any time, so replace the file atomically
+        temp_path = f"{self.textfile}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, "w") as f:
+                f.write(self.render())
+            os.replace(temp_path, self.textfile)
+        except IOError as e:
+            logger.error(f"Error writing metrics textfile {self.textfile}: {e}")
+
+    def serve(self, port: int, host: str = "127.0.0.1"):
+        registry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            self.server = ThreadingHTTPServer((host, port), MetricsHandler)
+        except OSError as e:
+            logger.error(f"Could not start metrics endpoint on {host}:{port}: {e}")
+            return
+        threading.Thread(target=self.server.serve_forever, name="metrics-http", daemon=True).start()
+        logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+
+    def shutdown(self):
+        self.write_textfile()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+metrics = MetricsRegistry()
+
+
+def configure_metrics(textfile: Optional[str] = None, port: Optional[int] = None):
+    if textfile:
+        metrics.textfile = textfile
+    if port:
+        metrics.serve(port)
+
+
+class SimcRunMetrics:
+    """Samples progress and CPU use of one simc process into the registry."""
+
+    def __init__(self, run: str, pid: int, threads: Optional[int]):
+        self.run = run
+        self.pid = pid
+        self.threads = threads or 1
+        self.start_time = time.time()
+        self.last_sample_time = self.start_time
+        self.last_cpu_seconds = read_cpu_seconds(pid) or 0.0
+        metrics.set("simc_threads", run, self.threads)
+        metrics.set("simc_running", run, 1)
+
+    def sample(self, completed: int, total: int, avg_profile_ms: float):
+        now = time.time()
+        elapsed = now - self.start_time
+        profiles_per_second = completed / elapsed if elapsed > 0 else 0.0
+        remaining = max(0, total - completed)
+
+        metrics.set("profilesets_completed", self.run, completed)
+        metrics.set("profilesets_total", self.run, total)
+        metrics.set("profiles_per_second", self.run, profiles_per_second)
+        metrics.set("profile_ms", self.run, avg_profile_ms)
+        if profiles_per_second > 0:
+            metrics.set("eta_seconds", self.run, remaining / profiles_per_second)
+
+        cpu_seconds = read_cpu_seconds(self.pid)
+        if cpu_seconds is not None:
+            wall = now - self.last_sample_time
+            if wall > 0:
+                utilisation = (cpu_seconds - self.last_cpu_seconds) / (wall * self.threads)
+                metrics.set("simc_cpu_utilisation", self.run, max(0.0, utilisation))
+            metrics.set("simc_cpu_seconds", self.run, cpu_seconds)
+            self.last_cpu_seconds = cpu_seconds
+        self.last_sample_time = now
+        metrics.set("last_update_timestamp_seconds", self.run, now)
+        metrics.write_textfile()
+
+    def finish(self, completed: int, total: int, avg_profile_ms: float):
+        self.sample(completed, total, avg_profile_ms)
+        metrics.set("simc_running", self.run, 0)
+        metrics.set("eta_seconds", self.run, 0)
+        metrics.write_textfile()
@@ -0,0 +1,215 @@
+import os
+import re
+import subprocess
+import tempfile
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Command-line overrides applied after the input file: one iteration, one thread
+PREFLIGHT_OPTIONS = ["iterations=1", "target_error=0", "threads=1", "profileset_work_threads=1"]
+DEFAULT_TIMEOUT = 120
+
+TEMPLATE_DEFINITION_PATTERN = re.compile(r"^\$\(([\w_]+)\)=")
+TEMPLATE_REFERENCE_PATTERN = re.compile(r"\$\(([\w_]+)\)")
+PROFILESET_NAME_PATTERN = re.compile(r'^profileset\."([^"]+)"')
+PROFILESET_LINE_PATTERN = re.compile(r'^profileset\."([^"]+)"(.*)$')
+QUOTED_PATTERN = re.compile(r"'([^']{3,})'|\"([^\"]{3,})\"")
+
+
+@dataclass
+class PreflightJob:
+    label: str
+    content: str
+
+
+@dataclass
+class PreflightIssue:
+    label: str
+    message: str
+    locations: List[str] = field(default_factory=list)
+
+
+class SourceMap:
+    """Maps lines of an assembled simc input back to the files they came from."""
+
+    def __init__(self, base_dir: str):
+        self.base_dir = base_dir
+        self.lines: Dict[str, str] = {}
+        self.templates: Dict[str, str] = {}
+        self.profilesets: Dict[str, str] = {}
+
+    def add_file(self, path: str):
+        try:
+            with open(path, "r") as f:
+                content = f.read()
+        except IOError:
+            return
+        relative = os.path.relpath(path, self.base_dir)
+        for number, line in enumerate(content.splitlines(), 1):
+            location = f"{relative}:{number}"
+            stripped = line.strip()
+            if stripped:
+                self.lines.setdefault(stripped, location)
+            template = TEMPLATE_DEFINITION_PATTERN.match(stripped)
+            if template:
+                self.templates.setdefault(template.group(1), location)
+            profileset = PROFILESET_NAME_PATTERN.match(stripped)
+            if profileset:
+                self.profilesets.setdefault(profileset.group(1), location)
+
+    def locate_line(self, line: str) -> Optional[str]:
+        return self.lines.get(line.strip())
+
+    def locate_template(self, name: str) -> Optional[str]:
+        return self.templates.get(name)
+
+    def locate_profileset(self, name: str) -> Optional[str]:
+        return self.profilesets.get(name)
+
+
+def sample_profilesets(content: str) -> str:
+    """The input with only the profilesets that bring a line no earlier one had.
+
+    Lines are compared without the profileset name, so every template and
+    every distinct supplemental option is still parsed once, while the
+    thousands of profilesets that only recombine them are left out.
+    """
+    lines = content.splitlines()
+    seen = set()
+    kept = set()
+    profilesets: Dict[str, List[str]] = {}
+    for line in lines:
+        match = PROFILESET_LINE_PATTERN.match(line.strip())
+        if match:
+            profilesets.setdefault(match.group(1), []).append(match.group(2))
+    for name, options in profilesets.items():
+        if any(option not in seen for option in options):
+            kept.add(name)
+            seen.update(options)
+
+    def keep(line: str) -> bool:
+        match = PROFILESET_LINE_PATTERN.match(line.strip())
+        return match is None or match.group(1) in kept
+
+    return "\n".join(filter(keep, lines))
+
+
+def check_templates(job: PreflightJob, source_map: SourceMap) -> List[PreflightIssue]:
+    """Report $(template) references that the assembled input never defines."""
+    lines = job.content.splitlines()
+    defined = {match.group(1) for match in map(TEMPLATE_DEFINITION_PATTERN.match, lines) if match}
+    missing: Dict[str, List[str]] = {}
+    for line in lines:
+        if TEMPLATE_DEFINITION_PATTERN.match(line):
+            continue
+        for name in TEMPLATE_REFERENCE_PATTERN.findall(line):
+            if name not in defined:
+                locations = missing.setdefault(name, [])
+                location = source_map.locate_line(line)
+                if location and location not in locations:
+                    locations.append(location)
+    return [
+        PreflightIssue(job.label, f"Undefined template $({name})", locations) for name, locations in missing.items()
+    ]
+
+
+def error_lines(output: str) -> List[str]:
+    lines = [line.strip() for line in output.splitlines() if line.strip()]
+    errors = [line for line in lines if "error" in line.lower()]
+    return errors or lines[-5:]
+
+
+def locate_error(
+    message: str,
+    job: PreflightJob,
+    source_map: SourceMap,
+    profileset_origin: Optional[Callable[[str], List[str]]] = None,
+) -> List[str]:
+    """Best-effort source locations for a simc error message.
+
+    Quoted fragments are matched first as profileset names (resolved through
+    profileset_origin or the supplemental file that defines them), then as
+    text of an input line, which is mapped back to its file and line.
+    """
+    locations: List[str] = []
+    input_lines = job.content.splitlines()
+    fragments = [single or double for single, double in QUOTED_PATTERN.findall(message)]
+    for fragment in fragments:
+        found = [source_map.locate_profileset(fragment)]
+        if not found[0] and profileset_origin:
+            found = profileset_origin(fragment)
+        if not any(found):
+            line = next((line for line in input_lines if fragment in line), None)
+            found = [source_map.locate_line(line)] if line else []
+        locations.extend(location for location in found if location and location not in locations)
+    return locations
+
+
+def run_job(
+    simc_path: str,
+    job: PreflightJob,
+    cwd: str,
+    timeout: float,
+    source_map: SourceMap,
+    profileset_origin: Optional[Callable[[str], List[str]]] = None,
+) -> List[PreflightIssue]:
+    issues = check_templates(job, source_map)
+    if issues:
+        return issues
+
+    input_file = None
+    try:
+        with tempfile.NamedTemporaryFile(mode="w", prefix="temp_preflight_", suffix=".simc", dir=cwd, delete=False) as f:
+            f.write(job.content)
+            input_file = f.name
+        process = subprocess.run(
+            [simc_path, os.path.basename(input_file)] + PREFLIGHT_OPTIONS,
+            cwd=cwd,
+            capture_output=True,
+            text=True,
+            timeout=timeout,
+        )
+    except subprocess.TimeoutExpired:
+        return [PreflightIssue(job.label, f"Pre-flight did not finish within {timeout:.0f}s")]
+    except OSError as e:
+        return [PreflightIssue(job.label, f"Could not run simc: {e}")]
+    finally:
+        if input_file and os.path.exists(input_file):
+            os.remove(input_file)
+
+    if process.returncode == 0:
+        return []
+    return [
+        PreflightIssue(job.label, message, locate_error(message, job, source_map, profileset_origin))
+        for message in error_lines(process.stderr or process.stdout)
+    ] or [PreflightIssue(job.label, f"SimC exited with return code {process.returncode}")]
+
+
+def run_preflight(
+    simc_path: str,
+    jobs: List[PreflightJob],
+    cwd: str,
+    source_map: SourceMap,
+    profileset_origin: Optional[Callable[[str], List[str]]] = None,
+    timeout: float = DEFAULT_TIMEOUT,
+    max_workers: Optional[int] = None,
+) -> List[PreflightIssue]:
+    """Run every assembled input at one iteration in parallel and collect the errors."""
+    with ThreadPoolExecutor(max_workers=max_workers or min(len(jobs), os.cpu_count() or 1) or 1) as executor:
+        futures = [
+            executor.submit(run_job, simc_path, job, cwd, timeout, source_map, profileset_origin) for job in jobs
+        ]
+        return [issue for future in futures for issue in future.result()]
+
+
+def print_issues(issues: List[PreflightIssue]):
+    print("\nPre-flight Errors:")
+    print("==================")
+    for issue in issues:
+        print(f"  [{issue.label}] {issue.message}")
+        for location in issue.locations:
+            print(f"      at {location}")
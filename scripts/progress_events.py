@@ -0,0 +1,301 @@
+import argparse
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+import logging
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Event types published by the pipelines:
+#   run_start / run_end          pipeline lifecycle
+#   stage_start / stage_end      traced stages (see tracing.py)
+#   hashing_progress             completed/total talent hashes
+#   profileset_progress          per simc run: completed, total, avg_ms, eta_seconds
+#   error                        failed simc runs and stages
+Consumer = Callable[[Dict[str, Any]], None]
+
+
+class EventBus:
+    """Fans structured progress events out to any number of consumers.
+
+    Publishing is a no-op until a consumer subscribes, so instrumented code
+    pays nothing when no one is listening.
+    """
+
+    def __init__(self):
+        self.consumers: List[Consumer] = []
+        self.lock = threading.Lock()
+        self.run_id: Optional[str] = None
+
+    @property
+    def active(self) -> bool:
+        return bool(self.consumers)
+
+    def subscribe(self, consumer: Consumer):
+        with self.lock:
+            self.consumers.append(consumer)
+
+    def start_run(self, pipeline: str, **fields):
+        self.run_id = f"{pipeline}-{os.getpid()}-{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        self.publish("run_start", pipeline=pipeline, **fields)
+
+    def publish(self, event: str, **fields):
+        if not self.consumers:
+            return
+        payload = {"ts": time.time(), "run_id": self.run_id, "event": event, **fields}
+        with self.lock:
+            consumers = list(self.consumers)
+        for consumer in consumers:
+            try:
+                consumer(payload)
+            except Exception as e:
+                logger.debug(f"Progress consumer {consumer!r} failed: {e}")
+
+    def close(self):
+        with self.lock:
+            consumers, self.consumers = self.consumers, []
+        for consumer in consumers:
+            close = getattr(consumer, "close", None)
+            if close:
+                close()
+
+
+bus = EventBus()
+
+
+def encode(event: Dict[str, Any]) -> bytes:
+    return (json.dumps(event, default=str) + "\n").encode("utf-8")
+
+
+class JsonLinesFileSink:
+    """Appends events to a JSON-lines file that other processes can tail."""
+
+    def __init__(self, path: str):
+        self.file = open(path, "ab", buffering=0)
+        self.lock = threading.Lock()
+
+    def __call__(self, event: Dict[str, Any]):
+        with self.lock:
+            self.file.write(encode(event))
+
+    def close(self):
+        self.file.close()
+
+
+class SocketSink:
+    """Streams events to a listener on unix:<path> or tcp:<host>:<port>.
+
+    Events are dropped while the listener is unreachable so a missing monitor
+    never slows a run down.
+    """
+
+    RETRY_SECONDS = 5.0
+
+    def __init__(self, address: str):
+        self.address = address
+        self.sock: Optional[socket.socket] = None
+        self.next_attempt = 0.0
+        self.lock = threading.Lock()
+
+    def _connect(self) -> Optional[socket.socket]:
+        if time.time() < self.next_attempt:
+            return None
+        try:
+            kind, _, target = self.address.partition(":")
+            if kind == "unix":
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                sock.connect(target)
+            else:
+                host, _, port = target.rpartition(":")
+                sock = socket.create_connection((host, int(port)), timeout=1)
+            return sock
+        except (OSError, ValueError) as e:
+            logger.debug(f"Progress listener {self.address} unavailable: {e}")
+            self.next_attempt = time.time() + self.RETRY_SECONDS
+            return None
+
+    def __call__(self, event: Dict[str, Any]):
+        with self.lock:
+            if self.sock is None:
+                self.sock = self._connect()
+                if self.sock is None:
+                    return
+            try:
+                self.sock.sendall(encode(event))
+            except OSError:
+                self.sock.close()
+                self.sock = None
+
+    def close(self):
+        with self.lock:
+            if self.sock is not None:
+                self.sock.close()
+                self.sock = None
+
+
+class LogConsumer:
+    """Logs lifecycle, stage and error events; progress ticks are skipped."""
+
+    def __call__(self, event: Dict[str, Any]):
+        kind = event["event"]
+        if kind == "error":
+            logger.error(f"[{event['run_id']}] {event.get('stage') or event.get('run')}: {event.get('message')}")
+        elif kind == "stage_end":
+            logger.info(f"[{event['run_id']}] {event['stage']} finished in {event['seconds']:.2f}s")
+        elif kind in ("run_start", "run_end"):
+            fields = {k: v for k, v in event.items() if k not in ("ts", "run_id", "event")}
+            logger.info(f"[{event['run_id']}] {kind} {fields}")
+
+
+class TqdmConsumer:
+    """One tqdm bar per (run_id, simc run), for monitoring many runs at once."""
+
+    def __init__(self):
+        from tqdm import tqdm
+
+        self.tqdm = tqdm
+        self.bars: Dict[tuple, Any] = {}
+
+    def __call__(self, event: Dict[str, Any]):
+        if event["event"] == "profileset_progress":
+            key = (event["run_id"], event["run"])
+            bar = self.bars.get(key)
+            if bar is None:
+                bar = self.bars[key] = self.tqdm(
+                    total=event["total"], desc=f"{event['run_id']} {event['run']}", position=len(self.bars)
+                )
+            bar.total = event["total"]
+            bar.n = event["completed"]
+            bar.set_postfix({"avg": f"{event['avg_ms']:.0f}ms", "eta": f"{event['eta_seconds']:.0f}s"})
+        elif event["event"] == "run_end":
+            for key in [k for k in self.bars if k[0] == event["run_id"]]:
+                self.bars.pop(key).close()
+
+    def close(self):
+        for bar in self.bars.values():
+            bar.close()
+        self.bars = {}
+
+
+class MetricsConsumer:
+    """Feeds profileset progress into the Prometheus registry (metrics.py)."""
+
+    def __call__(self, event: Dict[str, Any]):
+        from metrics import metrics
+
+        if event["event"] != "profileset_progress":
+            return
+        run = f"{event['run_id']}/{event['run']}"
+        metrics.set("profilesets_completed", run, event["completed"])
+        metrics.set("profilesets_total", run, event["total"])
+        metrics.set("profile_ms", run, event["avg_ms"])
+        metrics.set("eta_seconds", run, event["eta_seconds"])
+        metrics.set("last_update_timestamp_seconds", run, event["ts"])
+        metrics.write_textfile()
+
+
+def configure_progress_events(target: Optional[str], log_events: bool = False):
+    """Attach the configured sink: a file path, unix:<path> or tcp:<host>:<port>."""
+    if target:
+        if target.startswith(("unix:", "tcp:")):
+            bus.subscribe(SocketSink(target))
+        else:
+            bus.subscribe(JsonLinesFileSink(target))
+    if log_events:
+        bus.subscribe(LogConsumer())
+
+
+def publish_profileset_progress(run: str, completed: int, total: int, avg_ms: float):
+    bus.publish(
+        "profileset_progress",
+        run=run,
+        completed=completed,
+        total=total,
+        avg_ms=avg_ms,
+        eta_seconds=max(0, total - completed) * avg_ms / 1000,
+    )
+
+
+class HashingProgress:
+    """Publishes hashing_progress roughly once per percent."""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.step = max(1, total // 100)
+
+    def update(self, completed: int):
+        if completed % self.step == 0 or completed == self.total:
+            bus.publish("hashing_progress", completed=completed, total=self.total)
+
+
+def follow_file(path: str, consumers: List[Consumer]):
+    with open(path, "r") as f:
+        while True:
+            line = f.readline()
+            if not line:
+                time.sleep(0.25)
+                continue
+            dispatch(line, consumers)
+
+
+def listen(address: str, consumers: List[Consumer]):
+    lock = threading.Lock()
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                with lock:
+                    dispatch(line.decode("utf-8"), consumers)
+
+    kind, _, target = address.partition(":")
+    if kind == "unix":
+        if os.path.exists(target):
+            os.remove(target)
+        server = socketserver.ThreadingUnixStreamServer(target, Handler)
+    else:
+        host, _, port = target.rpartition(":")
+        server = socketserver.ThreadingTCPServer((host, int(port)), Handler)
+    server.daemon_threads = True
+    with server:
+        server.serve_forever()
+
+
+def dispatch(line: str, consumers: List[Consumer]):
+    try:
+        event = json.loads(line)
+    except json.JSONDecodeError:
+        return
+    for consumer in consumers:
+        consumer(event)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monitor progress events from one or more pipeline runs")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--follow", help="JSON-lines event file to tail")
+    source.add_argument("--listen", help="Address to accept event streams on: unix:<path> or tcp:<host>:<port>")
+    parser.add_argument("--consumer", action="append", choices=["tqdm", "log", "metrics"], help="Consumers to attach (default: tqdm)")
+    parser.add_argument("--metrics-port", type=int, help="Serve aggregated metrics on this port (implies the metrics consumer)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stdout)
+    selected = set(args.consumer or ["tqdm"])
+    if args.metrics_port:
+        from metrics import configure_metrics
+
+        configure_metrics(port=args.metrics_port)
+        selected.add("metrics")
+    consumers = [{"tqdm": TqdmConsumer, "log": LogConsumer, "metrics": MetricsConsumer}[name]() for name in sorted(selected)]
+    try:
+        if args.follow:
+            follow_file(args.follow, consumers)
+        else:
+            listen(args.listen, consumers)
+    except KeyboardInterrupt:
+        pass
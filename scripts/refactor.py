@@ -20,6 +20,26 @@ from dataclasses import dataclass, field
 from datetime import datetime
 from typing import Dict, List, Tuple, Optional, Union, Any
 from talenthasher import generate_talent_hash, initialize_talent_data
+from talentvalidator import TalentTreeValidator
+from tracing import tracer, enable_tracing, trace_file_path
+from background_stage import BackgroundStage
+from create_profiles import create_profiles
+from compare_reports import generate_report
+from stage_profiler import profiler
+from metrics import metrics, configure_metrics, SimcRunMetrics
+from progress_events import (
+    bus,
+    configure_progress_events,
+    publish_profileset_progress,
+    HashingProgress,
+)
+from sim_planner import RuntimeHistory, RunKey, read_peak_rss_mb
+from time_budget import (
+    TimeBudget,
+    BudgetedRun,
+    parse_duration,
+    DEFAULT_MIN_ITERATIONS,
+)
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format=" %(message)s", stream=sys.stdout)
@@ -133,14 +153,19 @@ class ProgressTracker:
         self.progress_type = None
         self.total_profiles = 0
         self.current_profile = 0
+        self.avg_profile_ms = 0.0
         self.last_line = ""
+        self.display = True
         self.terminal_width = shutil.get_terminal_size().columns
 
-    def update(self, line: str):
+    def update(self, line: str) -> bool:
+        """Parse a progress line and return True if it changed the progress
+        state. Every line is parsed; only printing is throttled."""
         current_time = time.time()
-        self.terminal_width = shutil.get_terminal_size().columns
-        if current_time - self.last_update_time < self.update_interval:
-            return
+        self.display = current_time - self.last_update_time >= self.update_interval
+        if self.display:
+            self.terminal_width = shutil.get_terminal_size().columns
+        previous_state = self.state()
 
         new_progress_type = self._detect_progress_type(line)
 
@@ -157,8 +182,10 @@ class ProgressTracker:
         if self.progress_type:
             getattr(self, f"_update_{self.progress_type}")(line)
 
-        self.last_update_time = current_time
+        if self.display:
+            self.last_update_time = current_time
         self.last_line = line
+        return self.state() != previous_state
 
     def set_progress_type(self, progress_type: str):
         if progress_type != self.progress_type:
@@ -210,6 +237,9 @@ class ProgressTracker:
             current, total, progress_bar, extra_info = match.groups()
             self.total_profiles = int(total)
             self.current_profile = int(current)
+            avg_match = re.search(r"avg=([\d.]+)ms", extra_info)
+            if avg_match:
+                self.avg_profile_ms = float(avg_match.group(1))
             self._print_progress(
                 f"[Sim: {self.current_simulation}/{self.total_simulations}] [Profile: {current}/{total}]",
                 self.current_profile / self.total_profiles,
@@ -239,6 +269,8 @@ class ProgressTracker:
         progress_bar: str = None,
         extra_info: str = "",
     ):
+        if not self.display:
+            return
         if progress_bar is None:
             progress_bar = self._generate_progress_bar(progress)
 
@@ -271,11 +303,15 @@ class ProgressTracker:
         self.current_simulation += 1
         self.current_profile = 0
         self.total_profiles = 0
+        self.avg_profile_ms = 0.0
         print()  # Move to a new line for the next simulation
 
     def set_total_simulations(self, total: int):
         self.total_simulations = total
 
+    def state(self) -> Tuple[int, int, float]:
+        return self.current_profile, self.total_profiles, self.avg_profile_ms
+
 
 @dataclass
 class SimulationParameters:
@@ -308,6 +344,7 @@ class SimConfig:
     json_output: bool = True
     html_output: bool = False
     supplemental_profilesets: bool = False
+    consolidate_supplemental: bool = False
     generate_combined_apl: bool = False
     generate_website: bool = False
     debug: bool = False
@@ -315,6 +352,16 @@ class SimConfig:
     profileset_work_threads: int = 1
     talent_strings: Dict[str, Dict[str, str]] = None
     timestamp: bool = False
+    validate_talents: bool = True
+    trace: bool = False
+    metrics_textfile: str = ""
+    metrics_port: int = 0
+    progress_events: str = ""
+    progress_log: bool = False
+    time_budget: str = ""
+    budget_min_iterations: int = DEFAULT_MIN_ITERATIONS
+    supplemental_iterations: int = 10000
+    supplemental_target_error: float = 0.2
 
     @classmethod
     def from_file(cls, config_path: str):
@@ -348,6 +395,9 @@ class SimConfig:
             supplemental_profilesets=config.getboolean(
                 "PostProcessing", "supplemental_profilesets", fallback=False
             ),
+            consolidate_supplemental=config.getboolean(
+                "PostProcessing", "consolidate_supplemental", fallback=False
+            ),
             generate_combined_apl=config.getboolean(
                 "PostProcessing", "generate_combined_apl", fallback=False
             ),
@@ -355,10 +405,28 @@ class SimConfig:
                 "PostProcessing", "generate_website", fallback=False
             ),
             debug=config.getboolean("General", "debug", fallback=False),
+            trace=config.getboolean("General", "trace", fallback=False),
+            metrics_textfile=config.get("General", "metrics_textfile", fallback=""),
+            metrics_port=config.getint("General", "metrics_port", fallback=0),
+            progress_events=config.get("General", "progress_events", fallback=""),
+            progress_log=config.getboolean("General", "progress_log", fallback=False),
             threads=config.getint("Simulations", "threads", fallback=1),
             profileset_work_threads=config.getint(
                 "Simulations", "profileset_work_threads", fallback=1
             ),
+            validate_talents=config.getboolean(
+                "Simulations", "validate_talents", fallback=True
+            ),
+            time_budget=config.get("Simulations", "time_budget", fallback=""),
+            budget_min_iterations=config.getint(
+                "Simulations", "budget_min_iterations", fallback=DEFAULT_MIN_ITERATIONS
+            ),
+            supplemental_iterations=config.getint(
+                "PostProcessing", "supplemental_iterations", fallback=10000
+            ),
+            supplemental_target_error=config.getfloat(
+                "PostProcessing", "supplemental_target_error", fallback=0.2
+            ),
         )
 
         instance.check_and_set_simc_path()
@@ -521,7 +589,8 @@ class TalentManager:
     def clear_cache_if_needed(self):
         if self.config.clear_cache:
             logger.info("Clearing talent cache...")
-            initialize_talent_data(force_new=True)
+            with tracer.span("initialize_talent_data"):
+                initialize_talent_data(force_new=True)
             # Clear the cached hashes in the cache manager
             for key in list(self.cache_manager.cache.keys()):
                 if (
@@ -549,23 +618,44 @@ class TalentManager:
         logger.debug(f"Using cached hash for {key}")
         return cached_hash
 
-    def get_hashes_batch(self, combinations: List[Tuple[str, str, str]]) -> List[str]:
-        self.progress_tracker.set_progress_type("talent_hashing")
+    def get_hashes_batch(
+        self, combinations: List[Tuple[str, str, str]], track_progress: bool = True
+    ) -> List[str]:
+        # Hashing in the background leaves the progress line to the simc runs
+        if track_progress:
+            self.progress_tracker.set_progress_type("talent_hashing")
         hashes = []
-        for i, combo in enumerate(combinations):
-            hashes.append(self.get_hash(*combo))
-            self.progress_tracker.update(f"{i+1}/{len(combinations)}")
-        self.cache_manager.force_save()
+        hashing_progress = HashingProgress(len(combinations))
+        with tracer.span("get_hashes_batch", combinations=len(combinations)):
+            for i, combo in enumerate(combinations):
+                hashes.append(self.get_hash(*combo))
+                if track_progress:
+                    self.progress_tracker.update(f"{i+1}/{len(combinations)}")
+                hashing_progress.update(i + 1)
+            self.cache_manager.force_save()
         return hashes
 
-    def preload_talents(self, talents: Dict[str, Dict[str, str]]):
+    def preload_talents(
+        self, talents: Dict[str, Dict[str, str]], track_progress: bool = True
+    ):
         combinations = [
             (hero_talent, class_talent, spec_talent)
             for hero_talent in talents["hero_talents"].values()
             for class_talent in talents["class_talents"].values()
             for spec_talent in talents["spec_talents"].values()
         ]
-        return self.get_hashes_batch(combinations)
+        return self.get_hashes_batch(combinations, track_progress)
+
+
+def simc_thread_layout(config: SimConfig, use_multi_threading: bool) -> Tuple[int, int]:
+    """threads and profileset_work_threads, based on the use_multi_threading flag."""
+    if use_multi_threading:
+        return 12, 3
+    return config.threads, config.profileset_work_threads
+
+
+def count_profilesets(content: str) -> int:
+    return len(set(re.findall(r'^profileset\."([^"]+)"', content, re.MULTILINE)))
 
 
 class SimCContentGenerator:
@@ -664,18 +754,15 @@ class SimCContentGenerator:
             if param in self.simc_params:
                 config_content += f"{param}={self.simc_params[param]}\n"
 
-        # Set thread options based on use_multi_threading flag
-        if self.use_multi_threading:
-            config_content += "threads=12\n"
-            config_content += "profileset_work_threads=3\n"
-        else:
-            config_content += f"threads={self.config.threads}\n"
-            config_content += (
-                f"profileset_work_threads={self.config.profileset_work_threads}\n"
-            )
+        threads, profileset_work_threads = self.thread_layout()
+        config_content += f"threads={threads}\n"
+        config_content += f"profileset_work_threads={profileset_work_threads}\n"
 
         return config_content
 
+    def thread_layout(self) -> Tuple[int, int]:
+        return simc_thread_layout(self.config, self.use_multi_threading)
+
     def _update_base_content(self):
         sections = {
             "simc configuration": self._generate_simc_config(),
@@ -733,11 +820,16 @@ class Simulation(ABC):
         talent_manager: TalentManager,
         cache_manager: CacheManager,
         progress_tracker: ProgressTracker,
+        runtime_history: Optional[RuntimeHistory] = None,
+        budget: Optional[TimeBudget] = None,
     ):
         self.config = config
         self.talent_manager = talent_manager
         self.cache_manager = cache_manager
         self.progress_tracker = progress_tracker
+        self.runtime_history = runtime_history
+        self.budget = budget
+        self.peak_rss_mb = None
         self.content_generator = SimCContentGenerator(config)
         logger.debug(f"Simulation initialized with talents: {self.config.talents}")
 
@@ -746,22 +838,63 @@ class Simulation(ABC):
         pass
 
     def execute_simulation(
-        self, params: SimulationParameters, profiles: List[str], output_file: str
+        self,
+        params: SimulationParameters,
+        profiles: List[str],
+        output_file: str,
+        run_label: Optional[str] = None,
     ) -> Optional[str]:
-        self._update_simulation_params(params)
-        for profile in profiles:
-            self.content_generator.add_profileset(profile)
-        simc_content = self.content_generator.generate_content()
-        logger.debug(f"Generated SimC content:\n{simc_content[:500]}")
-        temp_input_file = self._create_temp_input_file(simc_content)
+        with tracer.span("create_simc_file", profilesets=len(profiles)):
+            self._update_simulation_params(params)
+            for profile in profiles:
+                self.content_generator.add_profileset(profile)
+            simc_content = self.content_generator.generate_content()
+            logger.debug(f"Generated SimC content:\n{simc_content[:500]}")
+            temp_input_file = self._create_temp_input_file(simc_content)
         if temp_input_file is None:
             return None
 
+        start_time = time.time()
         try:
-            return self._run_simc_process(temp_input_file, output_file, params.sim_id)
+            with tracer.span("simc", output=os.path.basename(output_file)):
+                actual_output_file = self._run_simc_process(
+                    temp_input_file,
+                    output_file,
+                    params.sim_id,
+                    run_label or self._scenario_label(params),
+                )
         finally:
             FileHandler.safe_delete(temp_input_file)
 
+        if actual_output_file and self.runtime_history is not None:
+            self.runtime_history.record(
+                self._run_key(params, *self.content_generator.thread_layout()),
+                count_profilesets(simc_content),
+                time.time() - start_time,
+                self.peak_rss_mb,
+            )
+        return actual_output_file
+
+    def _run_key(
+        self, params: SimulationParameters, threads: int, profileset_work_threads: int
+    ) -> RunKey:
+        return RunKey(
+            spec=self.config.spec_name.lower(),
+            fight_style=params.fight_style or "Patchwerk",
+            targets=params.targets,
+            time=params.time,
+            iterations=params.iterations,
+            threads=threads,
+            profileset_work_threads=profileset_work_threads,
+        )
+
+    def _budgeted(
+        self, label: str, params: SimulationParameters
+    ) -> SimulationParameters:
+        if self.budget is None:
+            return params
+        return self.budget.params_for(label, params)
+
     def _update_simulation_params(self, params: SimulationParameters):
         self.content_generator.update_simc_param("iterations", params.iterations)
         self.content_generator.update_simc_param("target_error", params.target_error)
@@ -782,6 +915,12 @@ class Simulation(ABC):
             "profileset_work_threads", self.config.profileset_work_threads
         )
 
+    @staticmethod
+    def _scenario_label(params: SimulationParameters) -> str:
+        if params.fight_style == "DungeonSlice":
+            return "DSlice"
+        return f"{params.targets}T_{params.time}s"
+
     def _generate_output_filename(self, sim_id: str, extension: str) -> str:
         base_name = f"sim_output_{sim_id}" if self.config.timestamp else "sim_output"
         return FileHandler.join_path(
@@ -799,7 +938,7 @@ class Simulation(ABC):
         return temp_input_file
 
     def _run_simc_process(
-        self, input_file: str, output_file: str, sim_id: str
+        self, input_file: str, output_file: str, sim_id: str, run_label: str = "simc"
     ) -> Optional[str]:
         try:
             with subprocess.Popen(
@@ -812,6 +951,16 @@ class Simulation(ABC):
             ) as process:
                 stdout_data = []
                 stderr_data = []
+                # The thread count written into the input, which multi-threaded runs raise
+                run_metrics = (
+                    SimcRunMetrics(
+                        run_label, process.pid, self.content_generator.thread_layout()[0]
+                    )
+                    if metrics.enabled
+                    else None
+                )
+                last_sample_time = 0
+                self.peak_rss_mb = None
 
                 while True:
                     reads = [process.stdout.fileno(), process.stderr.fileno()]
@@ -823,20 +972,42 @@ class Simulation(ABC):
                             if read:
                                 stdout_data.append(read)
                                 logger.debug(read.strip())
-                                self.progress_tracker.update(read.strip())
+                                if (
+                                    self.progress_tracker.update(read.strip())
+                                    and bus.active
+                                ):
+                                    publish_profileset_progress(
+                                        run_label, *self.progress_tracker.state()
+                                    )
                         if fd == process.stderr.fileno():
                             read = process.stderr.readline()
                             if read:
                                 stderr_data.append(read)
                                 logger.error(f"SimC stderr: {read.strip()}")
 
+                    if time.time() - last_sample_time >= 1:
+                        last_sample_time = time.time()
+                        self.peak_rss_mb = (
+                            read_peak_rss_mb(process.pid) or self.peak_rss_mb
+                        )
+                        if run_metrics:
+                            run_metrics.sample(*self.progress_tracker.state())
+
                     if process.poll() is not None:
                         break
 
                 rc = process.wait(timeout=5)  # Short timeout as process should be done
+                if run_metrics:
+                    run_metrics.finish(*self.progress_tracker.state())
 
                 if rc != 0:
                     logger.error(f"Simulation failed with return code {rc}")
+                    bus.publish(
+                        "error",
+                        run=run_label,
+                        message=f"SimC exited with return code {rc}",
+                        stderr="".join(stderr_data)[-2000:],
+                    )
                     logger.error("Last 10 lines of stdout:")
                     for line in stdout_data[-10:]:
                         logger.error(line.strip())
@@ -863,8 +1034,9 @@ class Simulation(ABC):
             return None
 
     def create_dataset(self, content: str, is_supplemental: bool = False) -> Dict:
-        data = json.loads(content)
-        return self._process_simulation_data(data, is_supplemental)
+        with tracer.span("create_dataset"):
+            data = json.loads(content)
+            return self._process_simulation_data(data, is_supplemental)
 
     @abstractmethod
     def _process_simulation_data(self, data: Dict, is_supplemental: bool) -> Dict:
@@ -890,6 +1062,7 @@ class SingleSimulation(Simulation):
         self.content_generator.set_multiple_simulation(False)
         self.content_generator.set_multi_threading(False)
         logger.debug(f"Single simulation talents: {self.content_generator.talents}")
+        params = self._budgeted(label, params)
         actual_output_file = self.execute_simulation(params, [], temp_output_file)
         if actual_output_file:
             content = FileHandler.read_file(actual_output_file)
@@ -911,6 +1084,17 @@ class SingleSimulation(Simulation):
 class MultipleSimulation(Simulation):
 
     def run(self, params: SimulationParameters) -> Optional[Dict]:
+        label, content = self.simulate(params)
+        if content:
+            return {label: self.create_dataset(content)}
+        return None
+
+    def simulate(self, params: SimulationParameters) -> Tuple[str, Optional[str]]:
+        """Run simc for one scenario; returns its label and the raw json2 output.
+
+        The output is read before returning since every scenario writes the
+        same sim_output.json unless timestamped.
+        """
         logger.debug("Starting multiple simulations")
         label = (
             "DSlice"
@@ -924,16 +1108,20 @@ class MultipleSimulation(Simulation):
         profiles = self.format_profiles()
         self.content_generator.set_multiple_simulation(True)
         self.content_generator.set_multi_threading(True)
-        actual_output_file = self.execute_simulation(params, profiles, temp_output_file)
+        params = self._budgeted(label, params)
+        with tracer.span(
+            "scenario", "scenario", scenario=label, profilesets=len(profiles)
+        ):
+            actual_output_file = self.execute_simulation(
+                params, profiles, temp_output_file
+            )
         if actual_output_file:
-            content = FileHandler.read_file(actual_output_file)
-            if content:
-                return {label: self.create_dataset(content)}
-        return None
+            return label, FileHandler.read_file(actual_output_file)
+        return label, None
 
     def format_profiles(self):
         profiles = []
-        self.talent_combinations = {}  # New dictionary to store talent combinations
+        talent_combinations = {}  # New dictionary to store talent combinations
         talent_strings = self.config.talent_strings
         for hero_name, hero_talent in talent_strings["hero_talents"].items():
             for class_name, class_talent in talent_strings["class_talents"].items():
@@ -946,12 +1134,22 @@ class MultipleSimulation(Simulation):
                     )
                     profiles.append(profile)
                     # Store the talent combination separately
-                    self.talent_combinations[profile_name] = (
+                    talent_combinations[profile_name] = (
                         f"{hero_name}|{class_name}|{spec_name}"
                     )
+        # Rebound only once complete, as a background dataset may hold the previous map
+        self.talent_combinations = talent_combinations
         return profiles
 
+    def scenario_dataset(self, content: str, talent_combinations: Dict[str, str]) -> Dict:
+        """create_dataset against a snapshot of the profile names, for use off the main thread."""
+        with tracer.span("create_dataset"):
+            return self._dataset_from_results(json.loads(content), talent_combinations)
+
     def _process_simulation_data(self, data: Dict, is_supplemental: bool) -> Dict:
+        return self._dataset_from_results(data, self.talent_combinations)
+
+    def _dataset_from_results(self, data: Dict, talent_combinations: Dict[str, str]) -> Dict:
         results = {}
         if (
             "sim" in data
@@ -961,7 +1159,7 @@ class MultipleSimulation(Simulation):
             for result in data["sim"]["profilesets"]["results"]:
                 name = result["name"]
                 dps = result["mean"]
-                talent_combination = self.talent_combinations.get(name)
+                talent_combination = talent_combinations.get(name)
                 if talent_combination:
                     hero_name, class_name, spec_name = talent_combination.split("|")
                     talent_hash = self.talent_manager.get_hash(
@@ -989,6 +1187,9 @@ class MultipleSimulation(Simulation):
         )
 
 
+SUPPLEMENTAL_CATEGORY_SEPARATOR = "::"
+
+
 class SupplementalSimulation(Simulation):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -1011,26 +1212,71 @@ class SupplementalSimulation(Simulation):
                 "Talents configuration is required for supplemental simulations."
             )
 
-        sim_configs = [
-            (params, f"{params.targets}T_{params.time}s"),
-            (
-                SimulationParameters(**{**params.__dict__, "targets": 5, "time": 120}),
-                "5T_120s",
-            ),
-        ]
+        sim_configs = self.scenarios(params)
+
+        if self.config.consolidate_supplemental:
+            self.progress_tracker.current_simulation += 1
+            results = self._run_consolidated_supplemental(sim_configs)
+            self.progress_tracker.start_new_simulation()
+            return results
 
         results = []
         for i, supplemental_file in enumerate(self.supplemental_files):
             self.progress_tracker.current_simulation = (
                 i + 2
             )  # +2 because we start at 1 and have already run the main sim
-            result = self._run_single_supplemental(supplemental_file, sim_configs)
+            with tracer.span("shard", shard=os.path.splitext(supplemental_file)[0]):
+                result = self._run_single_supplemental(supplemental_file, sim_configs)
             if result:
                 results.append(result)
             self.progress_tracker.start_new_simulation()
 
         return results
 
+    @staticmethod
+    def scenarios(
+        params: SimulationParameters,
+    ) -> List[Tuple[SimulationParameters, str]]:
+        return [
+            (params, f"{params.targets}T_{params.time}s"),
+            (
+                SimulationParameters(**{**params.__dict__, "targets": 5, "time": 120}),
+                "5T_120s",
+            ),
+        ]
+
+    def planned_runs(self, params: SimulationParameters) -> List[BudgetedRun]:
+        """Supplemental simc runs in execution order, for the time budget."""
+        contents = {}
+        for supplemental_file in self.supplemental_files:
+            file_path = FileHandler.join_path(self.config.apl_folder, supplemental_file)
+            if FileHandler.file_exists(file_path):
+                content = FileHandler.read_file(file_path)
+                if content is not None:
+                    contents[supplemental_file] = content
+        if self.config.consolidate_supplemental and contents:
+            contents = {
+                "consolidated_supplemental.simc": "\n\n".join(contents.values())
+            }
+
+        runs = []
+        for supplemental_file, content in contents.items():
+            thread_layout = simc_thread_layout(
+                self.config, self._count_profilesets(content) > 10
+            )
+            name = os.path.splitext(supplemental_file)[0]
+            for scenario_params, _ in self.scenarios(params):
+                supplemental_params = self._set_supplemental_params(scenario_params)
+                runs.append(
+                    BudgetedRun(
+                        label=f"{name}_{self._scenario_label(scenario_params)}",
+                        key=self._run_key(supplemental_params, *thread_layout),
+                        profilesets=count_profilesets(content),
+                        max_iterations=supplemental_params.iterations,
+                    )
+                )
+        return runs
+
     def _run_single_supplemental(
         self,
         supplemental_file: str,
@@ -1050,15 +1296,73 @@ class SupplementalSimulation(Simulation):
         results = {os.path.splitext(supplemental_file)[0]: {}}
 
         for params, label in sim_configs:
-            result = self._run_supplemental_with_params(
-                params, supplemental_file, supplemental_content
-            )
+            with tracer.span("scenario", "scenario", scenario=label):
+                result = self._run_supplemental_with_params(
+                    params, supplemental_file, supplemental_content
+                )
             if result:
                 results[os.path.splitext(supplemental_file)[0]][label] = result
             self.progress_tracker.start_new_simulation()
 
         return results
 
+    def _run_consolidated_supplemental(
+        self, sim_configs: List[Tuple[SimulationParameters, str]]
+    ) -> List[Optional[Dict]]:
+        """Run every supplemental file as one simc input per scenario so the
+        baseline is only simulated once, then split the results by category."""
+        contents = {}
+        for supplemental_file in self.supplemental_files:
+            file_path = FileHandler.get_supplemental_file_path(
+                self.config.apl_folder, supplemental_file
+            )
+            if file_path is None:
+                continue
+            content = FileHandler.read_file(file_path)
+            if content is None:
+                logger.error(f"Failed to read supplemental file: {supplemental_file}")
+                continue
+            contents[os.path.splitext(supplemental_file)[0]] = content
+
+        if not contents:
+            return []
+
+        merged_content = "\n\n".join(
+            self._prefix_profileset_names(category, content)
+            for category, content in contents.items()
+        )
+        results = {category: {} for category in contents}
+
+        for params, label in sim_configs:
+            with tracer.span("shard", shard="consolidated", scenario=label):
+                merged_results = self._run_supplemental_with_params(
+                    params, "consolidated_supplemental.simc", merged_content
+                )
+            # A failed run still counts towards the progress total
+            self.progress_tracker.start_new_simulation()
+            if not merged_results:
+                continue
+            for name, result in merged_results.items():
+                category, _, profileset_name = name.partition(
+                    SUPPLEMENTAL_CATEGORY_SEPARATOR
+                )
+                if category in results:
+                    results[category].setdefault(label, {})[profileset_name] = {
+                        **result,
+                        "name": profileset_name,
+                    }
+
+        return [{category: result} for category, result in results.items()]
+
+    @staticmethod
+    def _prefix_profileset_names(category: str, content: str) -> str:
+        return re.sub(
+            r'^profileset\."([^"]+)"',
+            lambda m: f'profileset."{category}{SUPPLEMENTAL_CATEGORY_SEPARATOR}{m.group(1)}"',
+            content,
+            flags=re.MULTILINE,
+        )
+
     def _run_supplemental_with_params(
         self,
         params: SimulationParameters,
@@ -1077,7 +1381,12 @@ class SupplementalSimulation(Simulation):
                 f"Setting multi-threading for {supplemental_file} due to high number of profilesets ({profileset_count})"
             )
 
-        supplemental_params = self._set_supplemental_params(params)
+        run_label = (
+            f"{os.path.splitext(supplemental_file)[0]}_{self._scenario_label(params)}"
+        )
+        supplemental_params = self._budgeted(
+            run_label, self._set_supplemental_params(params)
+        )
         self._update_simulation_params(supplemental_params)
         self.content_generator.update_talents(self.config.talents)
         self.content_generator.add_profileset(supplemental_content)
@@ -1090,7 +1399,7 @@ class SupplementalSimulation(Simulation):
         output_file = self._generate_output_filename(sim_id, "json")
 
         actual_output_file = self.execute_simulation(
-            supplemental_params, [], output_file
+            supplemental_params, [], output_file, run_label
         )
         if actual_output_file:
             content = FileHandler.read_file(actual_output_file)
@@ -1102,8 +1411,8 @@ class SupplementalSimulation(Simulation):
         self, params: SimulationParameters
     ) -> SimulationParameters:
         return SimulationParameters(
-            iterations=10000,
-            target_error=0.2,
+            iterations=self.config.supplemental_iterations,
+            target_error=self.config.supplemental_target_error,
             targets=params.targets,
             time=params.time,
             fight_style=params.fight_style,
@@ -1128,33 +1437,93 @@ class SimulationRunner:
         talent_manager: TalentManager,
         cache_manager: CacheManager,
         progress_tracker: ProgressTracker,
+        runtime_history: Optional[RuntimeHistory] = None,
+        start_time: Optional[float] = None,
+        background: Optional[BackgroundStage] = None,
     ):
         self.config = config
         self.talent_manager = talent_manager
         self.cache_manager = cache_manager
         self.progress_tracker = progress_tracker
-
-        self.single_simulation = SingleSimulation(
-            config, talent_manager, cache_manager, progress_tracker
-        )
+        self.runtime_history = runtime_history or RuntimeHistory()
+        self.background = background
+        self.budget = self._make_time_budget(start_time)
+
+        simulation_args = (config, talent_manager, cache_manager, progress_tracker)
+        simulation_kwargs = {
+            "runtime_history": self.runtime_history,
+            "budget": self.budget,
+        }
+        self.single_simulation = SingleSimulation(*simulation_args, **simulation_kwargs)
         self.multiple_simulation = MultipleSimulation(
-            config, talent_manager, cache_manager, progress_tracker
+            *simulation_args, **simulation_kwargs
         )
         self.supplemental_simulation = SupplementalSimulation(
-            config, talent_manager, cache_manager, progress_tracker
+            *simulation_args, **simulation_kwargs
         )
 
         self._set_total_simulations()
+        if self.budget is not None:
+            self.budget.set_runs(self.planned_runs())
+            self.budget.print_plan()
+
+    def _make_time_budget(self, start_time: Optional[float]) -> Optional[TimeBudget]:
+        seconds = parse_duration(self.config.time_budget)
+        if not seconds:
+            return None
+        return TimeBudget(
+            seconds,
+            self.runtime_history,
+            min_iterations=self.config.budget_min_iterations,
+            max_iterations=self.config.iterations,
+            start_time=start_time,
+        )
+
+    def planned_runs(self) -> List[BudgetedRun]:
+        """Every simc run of the pipeline in execution order, for the time budget."""
+        sim_params = self.config.parse_sim_parameters()
+        if self.config.single_sim:
+            main_params, profilesets, multi_threading = sim_params[:1], 0, False
+        else:
+            main_params = sim_params
+            profilesets = len(self.multiple_simulation.format_profiles())
+            multi_threading = True
+        thread_layout = simc_thread_layout(self.config, multi_threading)
+
+        runs = [
+            BudgetedRun(
+                label=Simulation._scenario_label(params),
+                key=self.multiple_simulation._run_key(params, *thread_layout),
+                profilesets=profilesets,
+            )
+            for params in main_params
+        ]
+        if self.config.supplemental_profilesets:
+            runs.extend(self.supplemental_simulation.planned_runs(sim_params[0]))
+        return runs
 
     def _set_total_simulations(self):
         total = 1 if self.config.single_sim else len(self.config.parse_sim_parameters())
         if self.config.supplemental_profilesets:
-            total += len(self.supplemental_simulation.supplemental_files)
+            total += (
+                1
+                if self.config.consolidate_supplemental
+                else len(self.supplemental_simulation.supplemental_files)
+            )
         self.progress_tracker.set_total_simulations(total)
 
     def run_simulations(self):
         logger.debug("Starting simulations")
-        self.talent_manager.preload_talents(self.config.talent_strings)
+        if self.background is not None:
+            # Only the datasets need the hashes and they are built behind them on the worker
+            self.background.submit(
+                "preload_talents",
+                self.talent_manager.preload_talents,
+                self.config.talent_strings,
+                False,
+            )
+        else:
+            self.talent_manager.preload_talents(self.config.talent_strings)
 
         if self.config.supplemental_profilesets and not self.config.talents:
             raise ValueError(
@@ -1170,9 +1539,15 @@ class SimulationRunner:
             results.extend(self._run_multiple_simulations(sim_params))
 
         if self.config.supplemental_profilesets:
-            supplemental_results = self._run_supplemental_simulations(sim_params[0])
+            with tracer.span("supplemental"):
+                supplemental_results = self._run_supplemental_simulations(
+                    sim_params[0]
+                )
             results.extend(supplemental_results)
 
+        # The scenario datasets are filled in place by the background worker
+        if self.background is not None:
+            self.background.wait()
         logger.debug("All simulations completed")
         return results
 
@@ -1185,13 +1560,44 @@ class SimulationRunner:
     ) -> List[Optional[Dict]]:
         logger.debug("Running multiple simulations")
         results = {}
-        for params in sim_params:
-            result = self.multiple_simulation.run(params)
-            if result:
-                results.update(result)
+        for index, params in enumerate(sim_params):
+            if self.background is None:
+                result = self.multiple_simulation.run(params)
+                if result:
+                    results.update(result)
+            else:
+                # The dataset and a partial website are built while the next scenario simulates
+                label, content = self.multiple_simulation.simulate(params)
+                if content:
+                    self.background.submit(
+                        "post_process_scenario",
+                        self._post_process_scenario,
+                        label,
+                        content,
+                        dict(self.multiple_simulation.talent_combinations),
+                        results,
+                        index < len(sim_params) - 1,
+                    )
             self.progress_tracker.start_new_simulation()
         return [results]
 
+    def _post_process_scenario(
+        self,
+        label: str,
+        content: str,
+        talent_combinations: Dict[str, str],
+        results: Dict,
+        partial: bool,
+    ):
+        results[label] = self.multiple_simulation.scenario_dataset(
+            content, talent_combinations
+        )
+        if partial and self.config.generate_website:
+            try:
+                run_compare_reports(self.config.config_path, dict(results))
+            except Exception as e:
+                logger.warning(f"Partial website regeneration failed: {e}")
+
     def _run_supplemental_simulations(
         self, params: SimulationParameters
     ) -> List[Optional[Dict]]:
@@ -1292,12 +1698,8 @@ def parse_profiles_simc(profiles_path, talent_manager):
 
 
 def run_create_profiles(config: SimConfig):
-    create_profiles_script = FileHandler.join_path(
-        os.path.dirname(__file__), "create_profiles.py"
-    )
-    subprocess.run(
-        [sys.executable, create_profiles_script, config.config_path], check=True
-    )
+    with tracer.span("create_profiles"):
+        create_profiles(config.config_path)
 
 
 def cleanup_raw_output(config: SimConfig):
@@ -1311,14 +1713,29 @@ def cleanup_raw_output(config: SimConfig):
     logger.info(f"Cleaned up {deleted_files} raw output file(s).")
 
 
-def run_compare_reports(config_path: str):
-    compare_reports_script = FileHandler.join_path(
-        os.path.dirname(__file__), "compare_reports.py"
+def write_simulation_results(sim_config: SimConfig, results: List[Any]) -> Dict:
+    output_file = FileHandler.join_path(
+        sim_config.report_folder, "simulation_results.json"
     )
-    subprocess.run([sys.executable, compare_reports_script, config_path], check=True)
+
+    # Merge all results into a single dictionary
+    merged_results = {}
+    for result in results:
+        if isinstance(result, dict):
+            merged_results.update(result)
+
+    FileHandler.write_file(output_file, json.dumps(merged_results, indent=2))
+    logger.info(f"Simulation results saved to {output_file}")
+    return merged_results
 
 
-def main(config_path: str):
+def run_compare_reports(config_path: str, results: Optional[Dict] = None):
+    # The merged results are handed over in memory instead of re-read from disk
+    with tracer.span("compare_reports"):
+        generate_report(config_path, results)
+
+
+def main(config_path: str, profile: bool = False):
     try:
         sim_config = SimConfig.from_file(config_path)
     except (FileNotFoundError, RuntimeError) as e:
@@ -1329,6 +1746,27 @@ def main(config_path: str):
     FileHandler.ensure_directory(sim_config.apl_folder)
     FileHandler.ensure_directory(sim_config.report_folder)
 
+    if sim_config.trace:
+        enable_tracing()
+    configure_metrics(sim_config.metrics_textfile, sim_config.metrics_port)
+    configure_progress_events(sim_config.progress_events, sim_config.progress_log)
+    bus.start_run("refactor", spec=sim_config.spec_name, config=config_path)
+    if profile:
+        profiler.start(sim_config.report_folder, "refactor")
+    status = "error"
+    try:
+        with profiler.stage("pipeline"):
+            status = "completed" if run_pipeline(sim_config, config_path) else "failed"
+    finally:
+        tracer.write(trace_file_path(sim_config.report_folder))
+        metrics.shutdown()
+        bus.publish("run_end", status=status)
+        bus.close()
+        profiler.stop()
+
+
+def run_pipeline(sim_config: SimConfig, config_path: str):
+    start_time = time.time()
     with CacheManager(sim_config) as cache_manager:
         progress_tracker = ProgressTracker(total_simulations=1)
         talent_manager = TalentManager(sim_config, cache_manager, progress_tracker)
@@ -1341,33 +1779,40 @@ def main(config_path: str):
         profiles_path = FileHandler.join_path(
             sim_config.apl_folder, "profile_templates.simc"
         )
-        talents, talent_strings = parse_profiles_simc(profiles_path, talent_manager)
+        with tracer.span("parse_profiles_simc"):
+            talents, talent_strings = parse_profiles_simc(profiles_path, talent_manager)
         if talents is None or talent_strings is None:
             logger.error("Failed to parse talent strings. Exiting.")
             return
 
+        if sim_config.validate_talents:
+            validator = TalentTreeValidator(sim_config.spec_name)
+            talent_strings, pruned_count = validator.prune_templates(talent_strings)
+            if pruned_count:
+                logger.info(f"Pruned {pruned_count} invalid talent combinations.")
+            if not all(talent_strings.values()):
+                logger.error("No valid talent combinations remain. Exiting.")
+                return
+
         sim_config.talent_strings = talent_strings
 
-        simulation_runner = SimulationRunner(
-            sim_config, talent_manager, cache_manager, progress_tracker
-        )
+        with BackgroundStage("post_processing") as background:
+            simulation_runner = SimulationRunner(
+                sim_config,
+                talent_manager,
+                cache_manager,
+                progress_tracker,
+                start_time=start_time,
+                background=background,
+            )
 
-        results = simulation_runner.run_simulations()
+            try:
+                results = simulation_runner.run_simulations()
+            finally:
+                simulation_runner.runtime_history.save()
 
         # Process and save results
-        output_file = FileHandler.join_path(
-            sim_config.report_folder, "simulation_results.json"
-        )
-
-        # Merge all results into a single dictionary
-        merged_results = {}
-        for result in results:
-            if isinstance(result, dict):
-                merged_results.update(result)
-
-        FileHandler.write_file(output_file, json.dumps(merged_results, indent=2))
-
-        logger.info(f"Simulation results saved to {output_file}")
+        merged_results = write_simulation_results(sim_config, results)
 
         # Cleanup: Delete raw JSON output files
         cleanup_raw_output(sim_config)
@@ -1375,17 +1820,24 @@ def main(config_path: str):
         # Run combine.py
         if sim_config.generate_combined_apl:
             apl_combiner = APLCombiner(sim_config)
-            apl_combiner.combine_apl()
+            with tracer.span("combine"):
+                apl_combiner.combine_apl()
 
         # Run compare_reports.py
         if sim_config.generate_website:
-            run_compare_reports(config_path)
+            run_compare_reports(config_path, merged_results)
 
     logger.info("All simulations, post-processing, and report generation completed.")
+    return True
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Run SimulationCraft profiles")
     parser.add_argument("config", help="Path to configuration file")
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Write per-stage cProfile stats and tracemalloc allocations to the report folder",
+    )
     args = parser.parse_args()
-    main(args.config)
+    main(args.config, profile=args.profile)
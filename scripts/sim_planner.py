@@ -0,0 +1,183 @@
+import json
+import os
+import threading
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+HISTORY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "runtime_history.json")
+
+# Fallbacks used until a matching run has been recorded
+DEFAULT_THREAD_SECONDS_PER_1K_ITERATIONS = 1.5  # per profileset, including the baseline
+DEFAULT_BASE_RSS_MB = 250.0
+DEFAULT_RSS_MB_PER_PROFILESET = 0.05
+
+EWMA_ALPHA = 0.3
+
+
+@dataclass(frozen=True)
+class RunKey:
+    spec: str
+    fight_style: str
+    targets: Optional[int]
+    time: Optional[int]
+    iterations: Optional[int]
+    threads: int
+    profileset_work_threads: int
+
+    def relaxed(self) -> List[str]:
+        """History keys from the most to the least specific."""
+        layout = f"{self.threads}x{self.profileset_work_threads}"
+        return [
+            "|".join(map(str, [self.spec, self.fight_style, self.targets, self.time, self.iterations, layout])),
+            "|".join(map(str, [self.spec, self.fight_style, self.targets, self.time, self.iterations])),
+            "|".join(map(str, [self.spec, self.fight_style, self.targets, self.time])),
+            "|".join(map(str, [self.spec, self.fight_style])),
+            self.spec,
+        ]
+
+
+@dataclass
+class RunEstimate:
+    label: str
+    profilesets: int
+    threads: int
+    wall_seconds: float
+    peak_rss_mb: float
+    source: str  # "history" or "default"
+
+
+def iteration_factor(iterations: Optional[int]) -> float:
+    return (iterations or 10000) / 1000
+
+
+class RuntimeHistory:
+    """Per-profileset cost of past simc runs, normalised to thread-seconds per
+    1000 iterations so it can be rescaled to other thread layouts."""
+
+    def __init__(self, history_file: str = HISTORY_FILE):
+        self.history_file = history_file
+        self.entries: Dict[str, Dict[str, float]] = self.load()
+        self.lock = threading.Lock()
+
+    def load(self) -> Dict[str, Dict[str, float]]:
+        if os.path.exists(self.history_file):
+            try:
+                with open(self.history_file, "r") as f:
+                    return json.load(f)
+            except (IOError, json.JSONDecodeError) as e:
+                logger.warning(f"Error loading runtime history: {e}. Starting fresh.")
+        return {}
+
+    def save(self):
+        with self.lock:
+            try:
+                with open(self.history_file, "w") as f:
+                    json.dump(self.entries, f, indent=2)
+            except IOError as e:
+                logger.error(f"Error saving runtime history: {e}")
+
+    def record(self, key: RunKey, profilesets: int, wall_seconds: float, peak_rss_mb: Optional[float] = None):
+        cost = wall_seconds * key.threads / ((profilesets + 1) * iteration_factor(key.iterations))
+        with self.lock:
+            for history_key in key.relaxed():
+                entry = self.entries.setdefault(history_key, {"samples": 0})
+                entry["cost"] = self._blend(entry.get("cost"), cost)
+                self._record_memory(entry, profilesets, peak_rss_mb)
+                entry["samples"] += 1
+
+    def record_memory(self, key: RunKey, profilesets: int, peak_rss_mb: float):
+        """Learn the footprint of a run that did not finish, e.g. one the OOM killer took."""
+        with self.lock:
+            for history_key in key.relaxed():
+                self._record_memory(self.entries.setdefault(history_key, {"samples": 0}), profilesets, peak_rss_mb)
+
+    def _record_memory(self, entry: Dict[str, float], profilesets: int, peak_rss_mb: Optional[float]):
+        if peak_rss_mb is None:
+            return
+        entry["peak_rss_mb"] = max(entry.get("peak_rss_mb", 0.0), peak_rss_mb)
+        if profilesets:
+            rss_per_profileset = max(0.0, peak_rss_mb - DEFAULT_BASE_RSS_MB) / profilesets
+            entry["rss_mb_per_profileset"] = self._blend(entry.get("rss_mb_per_profileset"), rss_per_profileset)
+
+    @staticmethod
+    def _blend(previous: Optional[float], value: float) -> float:
+        if previous is None:
+            return value
+        return previous + EWMA_ALPHA * (value - previous)
+
+    def lookup(self, key: RunKey) -> Optional[Dict[str, float]]:
+        for history_key in key.relaxed():
+            if history_key in self.entries:
+                return self.entries[history_key]
+        return None
+
+    def estimate(self, label: str, key: RunKey, profilesets: int) -> RunEstimate:
+        entry = self.lookup(key)
+        cost = entry["cost"] if entry else DEFAULT_THREAD_SECONDS_PER_1K_ITERATIONS
+        rss_per_profileset = (entry or {}).get("rss_mb_per_profileset", DEFAULT_RSS_MB_PER_PROFILESET)
+        wall_seconds = cost * (profilesets + 1) * iteration_factor(key.iterations) / max(1, key.threads)
+        return RunEstimate(
+            label=label,
+            profilesets=profilesets,
+            threads=key.threads,
+            wall_seconds=wall_seconds,
+            peak_rss_mb=DEFAULT_BASE_RSS_MB + rss_per_profileset * profilesets,
+            source="history" if entry else "default",
+        )
+
+
+def read_peak_rss_mb(pid: int) -> Optional[float]:
+    """High-water RSS of a running process from /proc, or None where unavailable."""
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except (IOError, ValueError, IndexError):
+        pass
+    return None
+
+
+def concurrent_wall_seconds(estimates: List[RunEstimate], total_threads: int) -> float:
+    """Lower bound for runs sharing a core budget: the total thread-time spread
+    over the budget, but never less than the longest single run."""
+    if not estimates:
+        return 0.0
+    thread_seconds = sum(e.wall_seconds * e.threads for e in estimates)
+    return max(thread_seconds / max(1, total_threads), max(e.wall_seconds for e in estimates))
+
+
+def format_duration(seconds: float) -> str:
+    if seconds < 60:
+        return f"{seconds:.0f}s"
+    if seconds < 3600:
+        minutes, seconds = divmod(seconds, 60)
+        return f"{minutes:.0f}m {seconds:.0f}s"
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return f"{hours:.0f}h {minutes:.0f}m {seconds:.0f}s"
+
+
+def print_plan(main_runs: List[RunEstimate], supplemental_runs: List[RunEstimate], total_threads: int):
+    print("\nExecution Plan:")
+    print("===============")
+    for estimate in main_runs + supplemental_runs:
+        print(
+            f"  {estimate.label}: {estimate.profilesets} profilesets, {estimate.threads} threads, "
+            f"~{format_duration(estimate.wall_seconds)}, ~{estimate.peak_rss_mb:.0f} MB ({estimate.source})"
+        )
+
+    main_seconds = sum(e.wall_seconds for e in main_runs)
+    supplemental_seconds = concurrent_wall_seconds(supplemental_runs, total_threads)
+    peak_memory = max(
+        max((e.peak_rss_mb for e in main_runs), default=0.0),
+        sum(e.peak_rss_mb for e in supplemental_runs),
+    )
+    print(f"\nEstimated Wall Time: {format_duration(main_seconds + supplemental_seconds)}")
+    print(f"Estimated Peak Memory: {peak_memory:.0f} MB")
+    if any(e.source == "default" for e in main_runs + supplemental_runs):
+        print("  (some runs have no recorded history and use default costs)")
+
@@ -0,0 +1,112 @@
+"""Single entry point for the toolkit's stages.
+
+Every subcommand runs its stage as a function in this process, so chained
+stages (fetching items, creating profilesets, simulating, building the
+website) share parsed data instead of re-reading it from disk in a fresh
+interpreter. Stage modules are imported only by the subcommand that needs
+them, which keeps --help and the small commands quick to start.
+"""
+
+import argparse
+import logging
+import sys
+from typing import List, Optional
+
+
+def run_sims(args: argparse.Namespace):
+    import generate_sims
+
+    generate_sims.run_cli(args)
+
+
+def run_refactor(args: argparse.Namespace):
+    import refactor
+
+    refactor.main(args.config, profile=args.profile)
+
+
+def run_fetch(args: argparse.Namespace):
+    from filter_items_enchants import fetch_and_filter
+
+    fetch_and_filter()
+
+
+def run_profiles(args: argparse.Namespace):
+    from create_profiles import create_profiles
+
+    # The items are fetched (or read) once and handed to every config
+    filtered = None
+    for config_path in args.config:
+        filtered = create_profiles(config_path, fetch=not args.skip_fetch and filtered is None, filtered=filtered)
+
+
+def run_report(args: argparse.Namespace):
+    import compare_reports
+
+    compare_reports.main([args.config] + (["--profile"] if args.profile else []))
+
+
+def run_combine(args: argparse.Namespace):
+    import combine
+
+    combine.combine_and_compile_files(combine.load_config(args.config))
+
+
+def run_cache_server(args: argparse.Namespace):
+    import cache_server
+
+    cache_server.main(["--host", args.host, "--port", str(args.port), "--db", args.db] + (["--token", args.token] if args.token else []))
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="simtoolkit", description="Generate, run and report SimulationCraft profilesets")
+    subparsers = parser.add_subparsers(dest="command", metavar="<command>", required=True)
+
+    sims = subparsers.add_parser("sims", help="Generate and run the simulations of one config, or of several as a batch")
+    sims.add_argument("config", nargs="+", help="Path to configuration file; several configs run as one batch sharing the cores")
+    sims.add_argument("--dry-run", action="store_true", help="Print the execution plan and runtime estimate without running SimC")
+    sims.add_argument("--profile", action="store_true", help="Write per-stage cProfile stats and tracemalloc allocations to the report folder")
+    sims.add_argument("--optimize", action="store_true", help="Search for a better talent build by local search from the configured talents")
+    sims.add_argument("--threads", type=int, help="Total simc threads shared by a batch of configs (default: all cores)")
+    sims.set_defaults(handler=run_sims)
+
+    pipeline = subparsers.add_parser("refactor", help="Run the refactored simulation pipeline")
+    pipeline.add_argument("config", help="Path to configuration file")
+    pipeline.add_argument("--profile", action="store_true", help="Write per-stage cProfile stats and tracemalloc allocations to the report folder")
+    pipeline.set_defaults(handler=run_refactor)
+
+    fetch = subparsers.add_parser("fetch", help="Download and filter items, enchants and consumables into the data folder")
+    fetch.set_defaults(handler=run_fetch)
+
+    profiles = subparsers.add_parser("profiles", help="Create the supplemental profileset files of one or more configs")
+    profiles.add_argument("config", nargs="+", help="Path to configuration file")
+    profiles.add_argument("--skip-fetch", action="store_true", help="Use the items and enchants already in the data folder")
+    profiles.set_defaults(handler=run_profiles)
+
+    report = subparsers.add_parser("report", help="Build the website from the simulation results")
+    report.add_argument("config", help="Path to configuration file")
+    report.add_argument("--profile", action="store_true", help="Write per-stage cProfile stats and tracemalloc allocations to the report folder")
+    report.set_defaults(handler=run_report)
+
+    combine = subparsers.add_parser("combine", help="Combine the APL files and compile them with simc")
+    combine.add_argument("config", help="Path to configuration file")
+    combine.set_defaults(handler=run_combine)
+
+    cache = subparsers.add_parser("cache-server", help="Serve a shared cache of talent hashes and profileset results")
+    cache.add_argument("--host", default="127.0.0.1", help="Address to listen on (0.0.0.0 for the LAN)")
+    cache.add_argument("--port", type=int, default=8765, help="Port to listen on")
+    cache.add_argument("--db", default="sim_cache.sqlite", help="sqlite file holding the entries")
+    cache.add_argument("--token", help="Require this bearer token from clients")
+    cache.set_defaults(handler=run_cache_server)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None):
+    args = build_parser().parse_args(argv)
+    if not logging.getLogger().handlers:
+        logging.basicConfig(level=logging.INFO, format="%(message)s")
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
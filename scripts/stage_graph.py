@@ -0,0 +1,238 @@
+import fnmatch
+import glob
+import hashlib
+import json
+import os
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+MANIFEST_FILE = "stage_manifest.json"
+READ_CHUNK = 1 << 20
+
+
+@dataclass
+class Stage:
+    """One pipeline step with the files and settings its result depends on.
+
+    inputs and outputs are paths or glob patterns (a directory stands for
+    every file below it); exclude drops matching basenames from the inputs.
+    after names the stages whose outputs this one reads. run() returning
+    False, or leaving a declared output missing, marks the stage failed; so
+    does leaving every output as it was, unless rewrites_outputs is False
+    for a stage that only writes outputs whose content changed. A stage
+    marked always runs on every run, e.g. to check a remote source, and
+    stages after it still run only if it changed their inputs.
+    """
+
+    name: str
+    run: Callable[[], Any]
+    inputs: List[str] = field(default_factory=list)
+    outputs: List[str] = field(default_factory=list)
+    params: Dict[str, Any] = field(default_factory=dict)
+    after: List[str] = field(default_factory=list)
+    exclude: List[str] = field(default_factory=list)
+    rewrites_outputs: bool = True
+    always: bool = False
+
+
+def _digest(value: Any) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class StageGraph:
+    """Make-style runner for the stages of a pipeline.
+
+    A stage runs again only when its parameters or the content of one of its
+    inputs differ from what the manifest recorded at its last successful run,
+    when one of its outputs is missing, or when the graph is forced (e.g. by
+    clear_cache). Stages run in dependency order and are fingerprinted just
+    before they run, so one that reads an upstream output sees the output
+    that stage has just rewritten. File hashes are kept in the manifest by
+    size and modification time, so unchanged files are not read again.
+    Stages downstream of a failed stage are not run.
+    """
+
+    def __init__(self, manifest_path: str, force: bool = False):
+        self.manifest_path = manifest_path
+        self.force = force
+        self.stages: Dict[str, Stage] = {}
+        self.manifest = self._load()
+        self.failed: List[str] = []
+        self.pending: Dict[str, Dict[str, Any]] = {}  # records held back by run(record=False)
+
+    def _load(self) -> Dict[str, Any]:
+        try:
+            with open(self.manifest_path, "r") as f:
+                manifest = json.load(f)
+            if manifest.get("version") == MANIFEST_VERSION:
+                return manifest
+        except (IOError, ValueError):
+            pass
+        return {"version": MANIFEST_VERSION, "stages": {}, "files": {}}
+
+    def save(self):
+        temp_path = f"{self.manifest_path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(temp_path, self.manifest_path)
+
+    def add(self, stage: Stage) -> Stage:
+        self.stages[stage.name] = stage
+        return stage
+
+    @staticmethod
+    def expand(patterns: List[str], exclude: List[str] = ()) -> List[str]:
+        paths = set()
+        for pattern in patterns:
+            for path in glob.glob(pattern) if glob.has_magic(pattern) else [pattern]:
+                if os.path.isdir(path):
+                    paths.update(os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+                elif os.path.exists(path):
+                    paths.add(path)
+        return sorted(
+            os.path.abspath(path) for path in paths
+            if not any(fnmatch.fnmatch(os.path.basename(path), pattern) for pattern in exclude)
+        )
+
+    def file_hash(self, path: str) -> Optional[str]:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        cached = self.manifest["files"].get(path)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(READ_CHUNK), b""):
+                digest.update(chunk)
+        self.manifest["files"][path] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+        return digest.hexdigest()
+
+    def input_fingerprint(self, stage: Stage) -> str:
+        # Declared inputs that do not exist yet still count, so creating them triggers a run
+        files = {os.path.abspath(pattern): None for pattern in stage.inputs if not glob.has_magic(pattern)}
+        files.update({path: self.file_hash(path) for path in self.expand(stage.inputs, stage.exclude)})
+        return _digest(files)
+
+    def outputs_present(self, stage: Stage) -> bool:
+        return all(self.expand([pattern]) for pattern in stage.outputs)
+
+    def output_mtimes(self, stage: Stage) -> Dict[str, int]:
+        mtimes = {}
+        for path in self.expand(stage.outputs):
+            try:
+                mtimes[path] = os.stat(path).st_mtime_ns
+            except OSError:
+                pass
+        return mtimes
+
+    def outputs_written(self, stage: Stage, before: Dict[str, int]) -> bool:
+        """Whether every output pattern has a file the run created or modified,
+        so a run that failed quietly is not recorded against an old output."""
+        after = self.output_mtimes(stage)
+        return all(
+            any(after[path] != before.get(path) for path in self.expand([pattern]) if path in after)
+            for pattern in stage.outputs
+        )
+
+    def reason(self, stage: Stage) -> Optional[str]:
+        """Why the stage has to run, or None when it is up to date."""
+        if self.force:
+            return "forced"
+        if stage.always:
+            return "always runs"
+        record = self.manifest["stages"].get(stage.name)
+        if record is None:
+            # As with make, a target without prerequisites is up to date once it exists
+            if not stage.inputs and not stage.params and stage.outputs and self.outputs_present(stage):
+                return None
+            return "never run"
+        if record["params"] != _digest(stage.params):
+            return "settings changed"
+        if record["inputs"] != self.input_fingerprint(stage):
+            return "inputs changed"
+        if not self.outputs_present(stage):
+            return "output missing"
+        return None
+
+    def order(self, names: Optional[List[str]] = None) -> List[Stage]:
+        ordered: List[Stage] = []
+        done, visiting = set(), set()
+
+        def visit(name: str):
+            stage = self.stages[name]
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Stage dependency cycle through {name}")
+            visiting.add(name)
+            for dependency in stage.after:
+                if dependency in self.stages:
+                    visit(dependency)
+            visiting.discard(name)
+            done.add(name)
+            ordered.append(stage)
+
+        for name in self.stages:
+            visit(name)
+        return [stage for stage in ordered if names is None or stage.name in names]
+
+    def outdated(self, names: Optional[List[str]] = None) -> List[str]:
+        return [stage.name for stage in self.order(names) if self.reason(stage)]
+
+    def run(self, names: Optional[List[str]] = None, record: bool = True) -> bool:
+        """Run the stages (all, or those named) that are out of date; False if any failed.
+
+        With record False, stages that succeed are only written to the
+        manifest by commit(), for stages whose outputs are finished by
+        work that continues after run() returns.
+        """
+        for stage in self.order(names):
+            blocked = [dependency for dependency in stage.after if dependency in self.failed]
+            if blocked:
+                logger.warning(f"Stage {stage.name}: not run, {', '.join(blocked)} failed.")
+                self.failed.append(stage.name)
+                continue
+            reason = self.reason(stage)
+            if reason is None:
+                logger.info(f"Stage {stage.name}: up to date.")
+                continue
+            logger.info(f"Stage {stage.name}: running ({reason}).")
+            params, inputs = _digest(stage.params), self.input_fingerprint(stage)
+            before = self.output_mtimes(stage)
+            succeeded = stage.run() is not False and self.outputs_present(stage)
+            if succeeded and stage.rewrites_outputs and not self.outputs_written(stage, before):
+                logger.error(f"Stage {stage.name} left its outputs unchanged.")
+                succeeded = False
+            if not succeeded:
+                logger.error(f"Stage {stage.name} failed; it will run again next time.")
+                self.manifest["stages"].pop(stage.name, None)
+                self.failed.append(stage.name)
+            else:
+                entry = {"params": params, "inputs": inputs, "outputs": self.expand(stage.outputs)}
+                if record:
+                    self.manifest["stages"][stage.name] = entry
+                else:
+                    # Until commit() the stage counts as not run, also for a later process
+                    self.manifest["stages"].pop(stage.name, None)
+                    self.pending[stage.name] = entry
+            self.save()
+        return not self.failed
+
+    def commit(self):
+        """Record the stages run with record=False as up to date."""
+        self.manifest["stages"].update(self.pending)
+        self.pending = {}
+        self.save()
+
+    def print_plan(self, names: Optional[List[str]] = None):
+        print("\nStage Plan:")
+        print("===========")
+        for stage in self.order(names):
+            reason = self.reason(stage)
+            print(f"  {stage.name}: {'run (' + reason + ')' if reason else 'up to date'}")
@@ -0,0 +1,159 @@
+import cProfile
+import io
+import os
+import pstats
+import re
+import threading
+import time
+import tracemalloc
+import logging
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+TOP_FUNCTIONS = 10
+TOP_ALLOCATIONS = 10
+
+
+@dataclass
+class StageProfile:
+    name: str
+    profile: cProfile.Profile
+    snapshot: Optional[tracemalloc.Snapshot]
+    start_time: float
+    order: int
+    depth: int
+    peak_bytes: int = 0
+    overhead_seconds: float = 0.0  # snapshots and dumps of nested stages
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    top_functions: List[str] = field(default_factory=list)
+    top_allocations: List[str] = field(default_factory=list)
+
+
+class StageProfiler:
+    """Per-stage cProfile and tracemalloc capture for --profile runs.
+
+    Stages nest: entering an inner stage pauses the outer profiler, so each
+    stage's stats are exclusive of its children. Only the main thread is
+    profiled; stages entered from worker threads are ignored.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.output_dir: Optional[str] = None
+        self.stack: List[StageProfile] = []
+        self.completed: List[StageProfile] = []
+        self.started = 0
+
+    def start(self, report_folder: str, program: str):
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.output_dir = os.path.join(report_folder, f"profile_{program}_{timestamp}")
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.enabled = True
+        self.stack = []
+        self.completed = []
+        self.started = 0
+        tracemalloc.start()
+        logger.info(f"Profiling stages into {self.output_dir}")
+
+    @contextmanager
+    def stage(self, name: str):
+        if not self.enabled or threading.current_thread() is not threading.main_thread():
+            yield
+            return
+
+        bookkeeping_start = time.perf_counter()
+        if self.stack:
+            outer = self.stack[-1]
+            outer.profile.disable()
+            outer.peak_bytes = max(outer.peak_bytes, tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        current = StageProfile(
+            name=name,
+            profile=cProfile.Profile(),
+            snapshot=tracemalloc.take_snapshot(),
+            start_time=time.perf_counter(),
+            order=self.started,
+            depth=len(self.stack),
+        )
+        self._charge_overhead(time.perf_counter() - bookkeeping_start)
+        self.started += 1
+        self.stack.append(current)
+        current.profile.enable()
+        try:
+            yield
+        finally:
+            current.profile.disable()
+            bookkeeping_start = time.perf_counter()
+            current.wall_seconds = bookkeeping_start - current.start_time - current.overhead_seconds
+            current.peak_bytes = max(current.peak_bytes, tracemalloc.get_traced_memory()[1])
+            self.stack.pop()
+            self._finish(current)
+            self._charge_overhead(time.perf_counter() - bookkeeping_start)
+            if self.stack:
+                tracemalloc.reset_peak()
+                self.stack[-1].profile.enable()
+
+    def _charge_overhead(self, seconds: float):
+        for stage in self.stack:
+            stage.overhead_seconds += seconds
+
+    def _finish(self, stage: StageProfile):
+        file_stem = f"{stage.order + 1:02d}_{re.sub(r'[^A-Za-z0-9_.-]', '_', stage.name)}"
+        stage.profile.dump_stats(os.path.join(self.output_dir, f"{file_stem}.prof"))
+
+        stats = pstats.Stats(stage.profile)
+        stage.cpu_seconds = stats.total_tt
+        stream = io.StringIO()
+        pstats.Stats(stage.profile, stream=stream).sort_stats("tottime").print_stats(TOP_FUNCTIONS)
+        stage.top_functions = [
+            line.rstrip()
+            for line in stream.getvalue().splitlines()
+            if re.match(r"\s*[\d/]+\s+\d+\.\d+", line)
+        ]
+
+        differences = tracemalloc.take_snapshot().compare_to(stage.snapshot, "lineno")
+        stage.top_allocations = [str(stat) for stat in differences[:TOP_ALLOCATIONS] if stat.size_diff > 0]
+        stage.snapshot = None
+        self.completed.append(stage)
+
+    def stop(self) -> Optional[str]:
+        if not self.enabled:
+            return None
+        self.enabled = False
+        tracemalloc.stop()
+
+        # Wall time includes nested stages; self time and peak memory do not
+        stages = sorted(self.completed, key=lambda stage: stage.order)
+        lines = [f"{'Stage':<44} {'Wall (s)':>10} {'Self (s)':>10} {'Peak MB':>9}"]
+        for stage in stages:
+            name = "  " * stage.depth + stage.name
+            lines.append(
+                f"{name:<44} {stage.wall_seconds:>10.3f} {stage.cpu_seconds:>10.3f} {stage.peak_bytes / 1024**2:>9.1f}"
+            )
+        summary = "\n".join(lines)
+
+        details = []
+        for stage in stages:
+            details.append(f"\n== {stage.name} ==")
+            details.append("Heaviest functions (ncalls tottime percall cumtime percall location):")
+            details.extend(f"  {line.strip()}" for line in stage.top_functions)
+            details.append("Largest allocations still held at stage end:")
+            details.extend(f"  {line}" for line in stage.top_allocations or ["(none)"])
+
+        summary_path = os.path.join(self.output_dir, "summary.txt")
+        with open(summary_path, "w") as f:
+            f.write(summary + "\n" + "\n".join(details) + "\n")
+
+        print("\nStage Profile:")
+        print("==============")
+        print(summary)
+        print(f"\nDetails and .prof files (open with snakeviz or pstats): {self.output_dir}")
+        return summary_path
+
+
+profiler = StageProfiler()
@@ -0,0 +1,270 @@
+import hashlib
+import json
+import math
+import random
+import re
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PROFILESET_NAME_PATTERN = re.compile(r'profileset\."([^"]+)"')
+TALENTS_PATTERN = re.compile(r'\w+_talents=([^"\n]+)')
+BUILD_NAME_PATTERN = re.compile(r"\[(.*?)\] \((.*?)\) - (.*)")
+
+# Ridge penalties tried by leave-one-out; interactions are shrunk harder than
+# main effects since most of a build's DPS is additive in its talents
+RIDGE_GRID = [0.01, 0.1, 1.0, 10.0, 100.0]
+INTERACTION_PENALTY = 4.0
+PREDICT_CHUNK = 4096
+
+
+@dataclass(frozen=True)
+class SurrogateSettings:
+    """Simulate a sample of the builds, fit a regression on their talents and
+    simulate the rest only if their predicted upper bound could reach the top."""
+
+    enabled: bool = False
+    sample: float = 0.1
+    min_builds: int = 200
+    top: int = 20
+    z: float = 2.0
+    min_r2: float = 0.5
+    seed: int = 1
+
+
+@dataclass
+class Build:
+    name: str
+    profile: str
+    talents: Dict[str, float]
+
+
+@dataclass
+class Prediction:
+    name: str
+    mean: float
+    stddev: float
+    upper: float
+
+
+@dataclass
+class Selection:
+    queued: List[Build]
+    pruned: List[Prediction] = field(default_factory=list)
+    threshold: Optional[float] = None
+    loo_r2: Optional[float] = None
+
+
+def parse_build(profile: str) -> Optional[Build]:
+    """Name and talent ranks of one generated profileset."""
+    name = PROFILESET_NAME_PATTERN.search(profile)
+    if not name:
+        return None
+    talents: Dict[str, float] = {}
+    for talent_string in TALENTS_PATTERN.findall(profile):
+        for entry in talent_string.split("/"):
+            talent, _, rank = entry.partition(":")
+            if talent:
+                talents[talent.strip()] = float(rank) if rank.strip().isdigit() else 1.0
+    return Build(name.group(1), profile, talents)
+
+
+class FeatureSpace:
+    """Talent indicator columns plus their pairwise products.
+
+    Columns that never vary across the builds are dropped and talents that
+    always appear together (e.g. a whole hero tree) are merged into a single
+    column, so the interactions are only formed between distinguishable
+    choices. Interaction columns are built per block of rows on demand.
+    """
+
+    def __init__(self, builds: List[Build]):
+        talent_names = sorted({talent for build in builds for talent in build.talents})
+        raw = np.array([[build.talents.get(talent, 0.0) for talent in talent_names] for build in builds])
+        self.columns: List[Tuple[str, ...]] = []
+        main_effects = []
+        seen: Dict[bytes, int] = {}
+        for index, talent in enumerate(talent_names):
+            column = raw[:, index]
+            if np.all(column == column[0]):
+                continue
+            key = hashlib.sha1(column.tobytes()).digest()
+            if key in seen:
+                self.columns[seen[key]] += (talent,)
+                continue
+            seen[key] = len(self.columns)
+            self.columns.append((talent,))
+            main_effects.append(column)
+        self.main = np.column_stack(main_effects) if main_effects else np.zeros((len(builds), 0))
+
+        self.pairs: List[Tuple[int, int]] = []
+        for i in range(len(self.columns)):
+            for j in range(i + 1, len(self.columns)):
+                column = self.main[:, i] * self.main[:, j]
+                key = hashlib.sha1(column.tobytes()).digest()
+                if np.all(column == column[0]) or key in seen:
+                    continue
+                seen[key] = -1
+                self.pairs.append((i, j))
+        self.penalties = np.array([1.0] * len(self.columns) + [INTERACTION_PENALTY] * len(self.pairs))
+
+    def rows(self, indices: List[int]) -> np.ndarray:
+        main = self.main[indices]
+        if not self.pairs:
+            return main
+        left, right = map(list, zip(*self.pairs))
+        return np.hstack([main, main[:, left] * main[:, right]])
+
+
+class SurrogateModel:
+    """Bayesian ridge regression of DPS on talent features.
+
+    The penalty is chosen by closed-form leave-one-out error. The predictive
+    standard deviation combines the coefficient uncertainty with the
+    leave-one-out residual variance, so builds the sample says little about
+    get wide bounds.
+    """
+
+    def __init__(self, space: FeatureSpace):
+        self.space = space
+        self.x_mean = None
+        self.y_mean = 0.0
+        self.coefficients = None
+        self.covariance = None
+        self.residual_variance = 0.0
+        self.loo_r2: Optional[float] = None
+
+    def fit(self, rows: List[int], targets: List[float]):
+        x = self.space.rows(rows)
+        y = np.asarray(targets, dtype=float)
+        self.x_mean = x.mean(axis=0)
+        self.y_mean = float(y.mean())
+        x = x - self.x_mean
+        y = y - self.y_mean
+        # Scale the penalty to the data so the grid means the same for any build count
+        scale = max(1e-12, float(np.mean(np.sum(x * x, axis=0))))
+        gram = x.T @ x
+        best = None
+        for ridge in RIDGE_GRID:
+            inverse = np.linalg.pinv(gram + np.diag(ridge * scale * self.space.penalties))
+            coefficients = inverse @ (x.T @ y)
+            leverage = ((x @ inverse) * x).sum(axis=1)
+            residuals = (y - x @ coefficients) / np.clip(1.0 - leverage, 1e-6, None)
+            loo_error = float(np.mean(residuals**2))
+            if best is None or loo_error < best[0]:
+                best = (loo_error, coefficients, inverse)
+        loo_error, self.coefficients, inverse = best
+        self.residual_variance = loo_error
+        self.covariance = loo_error * inverse
+        total = float(np.mean(y**2))
+        self.loo_r2 = 1.0 - loo_error / total if total > 0 else None
+
+    def predict(self, rows: List[int]) -> Tuple[np.ndarray, np.ndarray]:
+        means, stddevs = [np.zeros(0)], [np.zeros(0)]
+        for start in range(0, len(rows), PREDICT_CHUNK):
+            x = self.space.rows(rows[start:start + PREDICT_CHUNK]) - self.x_mean
+            means.append(self.y_mean + x @ self.coefficients)
+            variance = ((x @ self.covariance) * x).sum(axis=1) + self.residual_variance
+            stddevs.append(np.sqrt(np.clip(variance, 0.0, None)))
+        return np.concatenate(means), np.concatenate(stddevs)
+
+
+class SurrogateSelector:
+    """Two-stage selection of the builds worth simulating.
+
+    sample() picks a seed set that covers every hero, class and spec template
+    at least once; select() fits the model on its results and queues the
+    remaining builds whose upper bound (mean + z * stddev) reaches the top-N
+    cutoff, i.e. the N-th best of the simulated means and the other builds'
+    lower bounds.
+    """
+
+    def __init__(self, profiles: List[str], settings: SurrogateSettings):
+        self.settings = settings
+        self.builds = [build for build in map(parse_build, profiles) if build]
+        self.index = {build.name: i for i, build in enumerate(self.builds)}
+        self.sampled: List[int] = []
+
+    def sample(self) -> List[Build]:
+        size = min(len(self.builds), max(self.settings.top * 2, math.ceil(self.settings.sample * len(self.builds))))
+        order = list(range(len(self.builds)))
+        random.Random(self.settings.seed).shuffle(order)
+
+        chosen, covered = [], set()
+        for i in order:
+            match = BUILD_NAME_PATTERN.match(self.builds[i].name)
+            parts = set(zip("hcs", match.groups())) if match else set()
+            if parts - covered:
+                chosen.append(i)
+                covered |= parts
+        chosen_set = set(chosen)
+        chosen += [i for i in order if i not in chosen_set][: max(0, size - len(chosen))]
+        self.sampled = sorted(chosen)
+        return [self.builds[i] for i in self.sampled]
+
+    def select(self, results: List[dict]) -> Selection:
+        simulated = {result["name"]: result["mean"] for result in results if result.get("name") in self.index}
+        remaining = [i for i in range(len(self.builds)) if self.builds[i].name not in simulated]
+        if not remaining:
+            return Selection([])
+        if len(simulated) < 3:
+            logger.warning("Surrogate: too few sampled results to fit a model; simulating all builds.")
+            return Selection([self.builds[i] for i in remaining])
+
+        space = FeatureSpace(self.builds)
+        model = SurrogateModel(space)
+        model.fit([self.index[name] for name in simulated], list(simulated.values()))
+        logger.info(
+            f"Surrogate: fitted {len(space.columns)} talent and {len(space.pairs)} interaction features "
+            f"on {len(simulated)} builds, leave-one-out R² {model.loo_r2 if model.loo_r2 is not None else float('nan'):.3f}"
+        )
+        if model.loo_r2 is None or model.loo_r2 < self.settings.min_r2:
+            logger.warning(f"Surrogate: fit below R² {self.settings.min_r2}; simulating all builds.")
+            return Selection([self.builds[i] for i in remaining], loo_r2=model.loo_r2)
+
+        means, stddevs = model.predict(remaining)
+        uppers = means + self.settings.z * stddevs
+        lowers = means - self.settings.z * stddevs
+        candidates = sorted(list(simulated.values()) + list(lowers), reverse=True)
+        threshold = float(candidates[min(self.settings.top, len(candidates)) - 1])
+
+        queued, pruned = [], []
+        for i, mean, stddev, upper in zip(remaining, means, stddevs, uppers):
+            if upper >= threshold:
+                queued.append(self.builds[i])
+            else:
+                pruned.append(Prediction(self.builds[i].name, float(mean), float(stddev), float(upper)))
+        pruned.sort(key=lambda prediction: prediction.mean, reverse=True)
+        return Selection(queued, pruned, threshold, model.loo_r2)
+
+
+def merge_stage_reports(reports: List[dict]) -> dict:
+    """One json2 report from staged runs; the first provides the baseline and a
+    profileset simulated in several stages keeps its latest result."""
+    merged = reports[0]
+    results = list({result["name"]: result for report in reports for result in report["sim"]["profilesets"]["results"]}.values())
+    results.sort(key=lambda result: result["mean"], reverse=True)
+    merged["sim"]["profilesets"]["results"] = results
+    quarantined = [name for report in reports for name in report["sim"].get("quarantined_profilesets", [])]
+    if quarantined:
+        merged["sim"]["quarantined_profilesets"] = quarantined
+    return merged
+
+
+def write_predictions(path: str, label: str, builds: int, sampled: int, selection: Selection):
+    report = {
+        "run": label,
+        "builds": builds,
+        "sampled": sampled,
+        "queued": len(selection.queued),
+        "pruned": len(selection.pruned),
+        "threshold": selection.threshold,
+        "loo_r2": selection.loo_r2,
+        "predictions": [prediction.__dict__ for prediction in selection.pruned],
+    }
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
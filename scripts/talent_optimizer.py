@@ -0,0 +1,269 @@
+import json
+import math
+import random
+import logging
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from talentvalidator import TalentTreeValidator, TREE_NODE_KEYS
+
+logger = logging.getLogger(__name__)
+
+SEARCH_MODES = ["hill_climb", "evolutionary"]
+
+
+@dataclass(frozen=True)
+class OptimizerSettings:
+    search: str = "hill_climb"
+    population: int = 24  # builds simulated per generation
+    generations: int = 15
+    patience: int = 2  # generations without a significant gain before stopping
+    elites: int = 4  # builds carried over between evolutionary generations
+    z: float = 1.0  # a gain counts once it exceeds z combined standard errors
+    seed: int = 1
+
+
+@dataclass(frozen=True)
+class TalentBuild:
+    hero_talents: str
+    class_talents: str
+    spec_talents: str
+
+    def strings(self) -> Dict[str, str]:
+        return {"hero_talents": self.hero_talents, "class_talents": self.class_talents, "spec_talents": self.spec_talents}
+
+
+@dataclass
+class Evaluation:
+    build: TalentBuild
+    mean: float
+    stddev: float
+    move: str
+    generation: int
+
+
+@dataclass
+class OptimizerResult:
+    start: Evaluation
+    best: Evaluation
+    generations: List[dict] = field(default_factory=list)
+    evaluated: int = 0
+    stop_reason: str = ""
+
+
+# evaluate(builds, generation) -> (mean, mean_stddev) per build, None for builds without a result
+Evaluator = Callable[[List[TalentBuild], int], List[Optional[Tuple[float, float]]]]
+
+
+class NeighbourGenerator:
+    """Valid single-step changes of a build, checked against the talent tree.
+
+    A step is one of: swapping the entry of a choice node, adding a point to
+    an optional node while points are left, or moving one point from a
+    purchased node to another. Free nodes are never touched, and hero steps
+    stay within the build's hero tree.
+    """
+
+    def __init__(self, validator: TalentTreeValidator):
+        self.validator = validator
+        self._cache: Dict[TalentBuild, List[Tuple[TalentBuild, str]]] = {}
+
+    def parse(self, category: str, talent_string: str) -> Dict[str, int]:
+        ranks = {}
+        for part in filter(None, talent_string.split("/")):
+            token, _, rank = part.partition(":")
+            ranks[token] = int(rank or 1)
+        return ranks
+
+    def format(self, category: str, ranks: Dict[str, int]) -> str:
+        tokens = self.validator.tokens[category]
+        order = list(self.validator.nodes[category])
+        return "/".join(
+            f"{token}:{rank}" for token, rank in sorted(ranks.items(), key=lambda item: order.index(tokens[item[0]])) if rank > 0
+        )
+
+    def _steps(self, category: str, ranks: Dict[str, int]) -> List[Tuple[Dict[str, int], str]]:
+        nodes = self.validator.nodes[category]
+        tokens = self.validator.tokens[category]
+        selected_nodes = {tokens[token]: token for token in ranks}
+
+        swaps, removals, additions = [], [], []
+        for node_id, node in nodes.items():
+            if node.free_node:
+                continue
+            token = selected_nodes.get(node_id)
+            if token is None:
+                additions.extend((other, 1) for other in node.entries)
+                continue
+            removals.append((token, ranks[token] - 1))
+            if ranks[token] < node.entries[token]:
+                additions.append((token, ranks[token] + 1))
+            swaps.extend((token, other) for other in node.entries if other != token)
+
+        steps = []
+        for token, other in swaps:
+            changed = {key: value for key, value in ranks.items() if key != token}
+            changed[other] = min(ranks[token], nodes[tokens[token]].entries[other])
+            steps.append((changed, f"{category}: {token} -> {other}"))
+        for token, rank in additions:
+            steps.append(({**ranks, token: rank}, f"{category}: +{token}"))
+        for removed, removed_rank in removals:
+            for added, added_rank in additions:
+                if tokens[added] == tokens[removed]:
+                    continue
+                changed = {**ranks, removed: removed_rank, added: added_rank}
+                steps.append((changed, f"{category}: -{removed} +{added}"))
+        return steps
+
+    def neighbours(self, build: TalentBuild) -> List[Tuple[TalentBuild, str]]:
+        if build in self._cache:
+            return self._cache[build]
+        neighbours = []
+        seen = set()
+        strings = build.strings()
+        for category in TREE_NODE_KEYS:
+            for ranks, move in self._steps(category, self.parse(category, strings[category])):
+                talent_string = self.format(category, ranks)
+                if talent_string in seen or self.validator.validate_template(category, talent_string):
+                    continue
+                seen.add(talent_string)
+                neighbours.append((TalentBuild(**{**strings, category: talent_string}), move))
+        self._cache[build] = neighbours
+        return neighbours
+
+
+class TalentOptimizer:
+    """Hill-climbing or evolutionary search over valid talent builds.
+
+    Every generation is one batched simc run of at most population builds,
+    so the cost grows with the number of generations rather than with the
+    size of the talent space. The incumbent (or the elites) is simulated
+    again in each generation, and a build only replaces it when the gain
+    exceeds z combined standard errors of the two means.
+    """
+
+    def __init__(self, generator: NeighbourGenerator, start: TalentBuild, settings: OptimizerSettings, evaluate: Evaluator):
+        self.generator = generator
+        self.start = start
+        self.settings = settings
+        self.evaluate = evaluate
+        self.rng = random.Random(settings.seed)
+        self.evaluated = {start}
+
+    def significant(self, candidate: Evaluation, incumbent: Evaluation) -> bool:
+        margin = self.settings.z * math.sqrt(candidate.stddev**2 + incumbent.stddev**2)
+        return candidate.mean - incumbent.mean > margin
+
+    def _measure(self, builds: List[Tuple[TalentBuild, str]], generation: int) -> List[Optional[Evaluation]]:
+        """One evaluation per build, in order; None where the build failed to simulate."""
+        results = self.evaluate([build for build, _ in builds], generation)
+        return [
+            Evaluation(build, result[0], result[1], move, generation) if result is not None else None
+            for (build, move), result in zip(builds, results)
+        ]
+
+    def _offspring(self, parents: List[Evaluation]) -> List[Tuple[TalentBuild, str]]:
+        offspring = []
+        attempts = 0
+        while len(offspring) < self.settings.population and attempts < self.settings.population * 20:
+            attempts += 1
+            parent = self.rng.choice(parents)
+            if self.settings.search == "evolutionary" and len(parents) > 1 and self.rng.random() < 0.5:
+                # Trees are independent, so any per-tree mix of two valid parents is valid
+                other = self.rng.choice([p for p in parents if p is not parent])
+                strings = {
+                    category: self.rng.choice([parent.build, other.build]).strings()[category] for category in TREE_NODE_KEYS
+                }
+                child, move = TalentBuild(**strings), "crossover"
+            else:
+                neighbours = [n for n in self.generator.neighbours(parent.build) if n[0] not in self.evaluated]
+                if not neighbours:
+                    continue
+                if self.settings.search == "hill_climb":
+                    self.rng.shuffle(neighbours)
+                    offspring.extend(neighbours[: self.settings.population])
+                    self.evaluated.update(build for build, _ in offspring)
+                    return offspring
+                child, move = self.rng.choice(neighbours)
+            if child not in self.evaluated:
+                self.evaluated.add(child)
+                offspring.append((child, move))
+        return offspring
+
+    def run(self) -> Optional[OptimizerResult]:
+        start = self._measure([(self.start, "start")], 0)[0]
+        if start is None:
+            logger.error("Could not simulate the starting build.")
+            return None
+        result = OptimizerResult(start=start, best=start, evaluated=1)
+        parents = [start]
+        stale = 0
+
+        for generation in range(1, self.settings.generations + 1):
+            offspring = self._offspring(parents)
+            if not offspring:
+                result.stop_reason = "no unexplored neighbours (local optimum)"
+                break
+            # The parents are measured again so they compete under the same run
+            measured = self._measure([(p.build, "parent") for p in parents] + offspring, generation)
+            result.evaluated += len(offspring)
+            # Split by position before dropping failures, so a failed parent does not shift an offspring in
+            remeasured = {evaluation.build: evaluation for evaluation in measured[: len(parents)] if evaluation is not None}
+            measured = [evaluation for evaluation in measured if evaluation is not None]
+            incumbent = remeasured.get(result.best.build, result.best)
+            ranked = sorted(measured, key=lambda evaluation: evaluation.mean, reverse=True)
+            challenger = next((e for e in ranked if e.build != incumbent.build), None)
+
+            improved = challenger is not None and self.significant(challenger, incumbent)
+            if improved:
+                result.best = challenger
+                stale = 0
+            else:
+                result.best = incumbent
+                stale += 1
+
+            if self.settings.search == "evolutionary":
+                parents = ranked[: self.settings.elites]
+                if result.best not in parents:
+                    parents = parents[:-1] + [result.best]
+            else:
+                parents = [result.best]
+            result.generations.append({
+                "generation": generation,
+                "simulated": len(measured),
+                "best": result.best.mean,
+                "best_stddev": result.best.stddev,
+                "improved": improved,
+                "move": result.best.move if improved else None,
+            })
+            logger.info(
+                f"Optimizer generation {generation}: {len(offspring)} builds, best {result.best.mean:,.0f} "
+                f"({'improved by ' + result.best.move if improved else 'no significant gain'})"
+            )
+            if stale >= self.settings.patience:
+                result.stop_reason = f"no significant gain for {stale} generation(s)"
+                break
+        else:
+            result.stop_reason = "generation limit reached"
+        return result
+
+
+def write_optimizer_report(path: str, label: str, settings: OptimizerSettings, result: OptimizerResult, best_export: Optional[str]):
+    report = {
+        "run": label,
+        "settings": settings.__dict__,
+        "stop_reason": result.stop_reason,
+        "evaluated": result.evaluated,
+        "start": {"dps": result.start.mean, "stddev": result.start.stddev, **result.start.build.strings()},
+        "best": {
+            "dps": result.best.mean,
+            "stddev": result.best.stddev,
+            "gain": result.best.mean - result.start.mean,
+            "talents": best_export,
+            **result.best.build.strings(),
+        },
+        "generations": result.generations,
+    }
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"Optimizer report written to {path}")
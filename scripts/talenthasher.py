@@ -247,6 +247,51 @@ def generate_traits_hash(tree, nodes, hero_spec, spec_name):
     return export_str
 
 
+def decode_traits_hash(tree, export_string):
+    # Inverse of generate_traits_hash: node id -> (entry index, rank) for every
+    # selected node, free nodes included at their max rank
+    values = [base64_char.index(char) for char in export_string.strip()]
+    position = 0
+
+    def get_bits(bits):
+        nonlocal position
+        value = 0
+        for i in range(bits):
+            char, bit = divmod(position, byte_size)
+            if char >= len(values):
+                raise ValueError("Talent export string is truncated")
+            value |= ((values[char] >> bit) & 0b1) << i
+            position += 1
+        return value
+
+    version = get_bits(version_bits)
+    if version != LOADOUT_SERIALIZATION_VERSION:
+        raise ValueError(f"Unsupported talent export version {version}")
+    spec_id = get_bits(spec_bits)
+    if spec_id != tree["specId"]:
+        raise ValueError(f"Talent export is for spec {spec_id}, not {tree['specId']}")
+    get_bits(tree_bits)
+
+    nodes = {
+        node["id"]: node
+        for key in ["classNodes", "specNodes", "heroNodes", "subTreeNodes"]
+        for node in tree[key]
+    }
+    selected = {}
+    for node_id in tree["fullNodeOrder"]:
+        if not get_bits(1):
+            continue
+        node = nodes.get(node_id, {})
+        max_ranks = node.get("maxRanks", 1)
+        if not get_bits(1):
+            selected[node_id] = (0, max_ranks)  # granted for free
+            continue
+        rank = get_bits(rank_bits) if get_bits(1) else max_ranks
+        index = get_bits(choice_bits) if get_bits(1) else 0
+        selected[node_id] = (index, rank)
+    return selected
+
+
 def print_debug(*args):
     if debug:
         print(*args)
@@ -0,0 +1,300 @@
+import argparse
+import re
+import sys
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from talenthasher import (
+    HERO_SPEC_INDEX,
+    HERO_TREE_SELECTOR_NODES,
+    decode_traits_hash,
+    determine_hero_spec,
+    generate_traits_hash,
+    initialize_talent_data,
+)
+
+logger = logging.getLogger(__name__)
+
+# Spendable points per tree at max level. Free nodes are granted and do not count.
+POINT_CAPS = {"hero_talents": 10, "class_talents": 31, "spec_talents": 30}
+
+TREE_NODE_KEYS = {
+    "hero_talents": "heroNodes",
+    "class_talents": "classNodes",
+    "spec_talents": "specNodes",
+}
+
+
+def talent_token(name: str) -> str:
+    """Convert a talents.json entry name to the simc token used in templates."""
+    return re.sub(r"[^a-z0-9_]", "", name.lower().replace(" ", "_").replace("-", "_"))
+
+
+@dataclass
+class TalentNode:
+    id: int
+    max_ranks: int
+    prev: List[int]
+    req_points: int = 0
+    entry_node: bool = False
+    free_node: bool = False
+    sub_tree_id: Optional[int] = None
+    entries: Dict[str, int] = field(default_factory=dict)  # token -> entry max ranks
+    entry_ids: Dict[str, int] = field(default_factory=dict)  # token -> entry id
+
+
+class TalentTreeValidator:
+    """Checks profile template talent strings against the talents.json tree graph."""
+
+    def __init__(self, spec_name: str, talent_data=None, point_caps=None):
+        self.spec_name = spec_name.lower()
+        self.point_caps = {**POINT_CAPS, **(point_caps or {})}
+        talent_data = talent_data or initialize_talent_data()
+        tree = next(
+            (t for t in talent_data if t["specName"].lower() == self.spec_name), None
+        )
+        if tree is None:
+            raise ValueError(f"Spec {spec_name} not found in talent data")
+
+        self.nodes: Dict[str, Dict[int, TalentNode]] = {}
+        self.tokens: Dict[str, Dict[str, int]] = {}
+        for category, key in TREE_NODE_KEYS.items():
+            self.nodes[category] = {}
+            self.tokens[category] = {}
+            for raw in tree[key]:
+                node = TalentNode(
+                    id=raw["id"],
+                    max_ranks=raw.get("maxRanks", 1),
+                    prev=raw.get("prev", []),
+                    req_points=raw.get("reqPoints", 0),
+                    entry_node=raw.get("entryNode", False),
+                    free_node=raw.get("freeNode", False),
+                    sub_tree_id=raw.get("subTreeId"),
+                )
+                for entry in raw["entries"]:
+                    if entry.get("name"):
+                        token = talent_token(entry["name"])
+                        node.entries[token] = entry.get("maxRanks", node.max_ranks)
+                        node.entry_ids[token] = entry["id"]
+                        self.tokens[category][token] = node.id
+                self.nodes[category][node.id] = node
+
+        selector_id = HERO_TREE_SELECTOR_NODES[self.spec_name]
+        selector = next((n for n in tree["subTreeNodes"] if n["id"] == selector_id), None)
+        if selector is None:
+            raise ValueError(
+                f"Hero tree selector node {selector_id} not found for {spec_name}"
+            )
+        self.hero_sub_trees = [entry["traitSubTreeId"] for entry in selector["entries"]]
+        self.tree = tree
+        self._template_cache: Dict[Tuple[str, str], List[str]] = {}
+
+    def _parse(self, category: str, talent_string: str) -> Tuple[Dict[int, int], List[str]]:
+        selected: Dict[int, int] = {}
+        chosen_entry: Dict[int, str] = {}
+        errors = []
+        for part in filter(None, talent_string.split("/")):
+            token, _, rank = part.partition(":")
+            try:
+                rank = int(rank or 1)
+            except ValueError:
+                errors.append(f"invalid rank in '{part}'")
+                continue
+            node_id = self.tokens[category].get(token)
+            if node_id is None:
+                errors.append(f"unknown talent '{token}'")
+                continue
+            node = self.nodes[category][node_id]
+            if rank > node.entries[token]:
+                errors.append(f"{token} rank {rank} exceeds max {node.entries[token]}")
+            if node_id in chosen_entry and chosen_entry[node_id] != token:
+                errors.append(
+                    f"choice node conflict: {chosen_entry[node_id]} and {token}"
+                )
+            chosen_entry[node_id] = token
+            selected[node_id] = max(selected.get(node_id, 0), rank)
+        return selected, errors
+
+    def validate_template(self, category: str, talent_string: str) -> List[str]:
+        """Return a list of problems with a single hero, class or spec template."""
+        key = (category, talent_string)
+        if key in self._template_cache:
+            return self._template_cache[key]
+
+        nodes = self.nodes[category]
+        selected, errors = self._parse(category, talent_string)
+        for node in nodes.values():
+            if node.free_node:
+                selected.setdefault(node.id, node.max_ranks)
+
+        spent = {
+            node_id: rank
+            for node_id, rank in selected.items()
+            if not nodes[node_id].free_node
+        }
+        total = sum(spent.values())
+        cap = self.point_caps[category]
+        if total > cap:
+            errors.append(f"{total} points spent, cap is {cap}")
+
+        for node_id in spent:
+            node = nodes[node_id]
+            if not node.entry_node and node.prev and not any(
+                selected.get(p, 0) >= nodes[p].max_ranks for p in node.prev if p in nodes
+            ):
+                errors.append(f"node {node_id} is missing a prerequisite")
+            if node.req_points:
+                gated = sum(
+                    rank
+                    for other_id, rank in spent.items()
+                    if nodes[other_id].req_points < node.req_points
+                )
+                if gated < node.req_points:
+                    errors.append(
+                        f"node {node_id} needs {node.req_points} points above its gate, has {gated}"
+                    )
+
+        if category == "hero_talents":
+            errors.extend(self._validate_hero_tree(talent_string, spent))
+
+        self._template_cache[key] = errors
+        return errors
+
+    def _validate_hero_tree(self, talent_string: str, spent: Dict[int, int]) -> List[str]:
+        nodes = self.nodes["hero_talents"]
+        sub_trees = {nodes[node_id].sub_tree_id for node_id in spent}
+        if len(sub_trees) > 1:
+            return [f"talents from multiple hero trees: {sorted(sub_trees)}"]
+        try:
+            hero_spec = determine_hero_spec(talent_string, self.spec_name)
+        except ValueError as e:
+            return [str(e)]
+        expected = self.hero_sub_trees[HERO_SPEC_INDEX[hero_spec]]
+        if sub_trees and sub_trees != {expected}:
+            return [f"talents do not belong to the {hero_spec} hero tree"]
+        return []
+
+    def decode_build(self, export_string: str) -> Dict[str, str]:
+        """Hero, class and spec template strings of a talent export string.
+
+        Free nodes are left out of the class and spec strings, and the hero
+        string only keeps the nodes of the selected hero tree.
+        """
+        selected = decode_traits_hash(self.tree, export_string)
+        selector_id = HERO_TREE_SELECTOR_NODES[self.spec_name]
+        hero_index = selected.get(selector_id, (0, 0))[0]
+        hero_sub_tree = self.hero_sub_trees[min(hero_index, len(self.hero_sub_trees) - 1)]
+
+        build = {}
+        for category, nodes in self.nodes.items():
+            parts = []
+            for node_id, node in nodes.items():
+                if node_id not in selected:
+                    continue
+                if category == "hero_talents":
+                    if node.sub_tree_id != hero_sub_tree:
+                        continue
+                elif node.free_node:
+                    continue
+                index, rank = selected[node_id]
+                tokens = list(node.entries)
+                if tokens:
+                    parts.append(f"{tokens[min(index, len(tokens) - 1)]}:{rank}")
+            build[category] = "/".join(parts)
+        return build
+
+    def encode_build(self, hero_talent: str, class_talent: str, spec_talent: str) -> str:
+        """Talent export string of a build given as template strings."""
+        nodes = {}
+        for category, talent_string in zip(TREE_NODE_KEYS, [hero_talent, class_talent, spec_talent]):
+            for part in filter(None, talent_string.split("/")):
+                token, _, rank = part.partition(":")
+                node_id = self.tokens[category][token]
+                nodes[node_id] = {
+                    "entry_id": self.nodes[category][node_id].entry_ids[token],
+                    "rank": int(rank or 1),
+                    "name": token,
+                }
+        hero_spec = determine_hero_spec(hero_talent, self.spec_name)
+        return generate_traits_hash(self.tree, nodes, hero_spec, self.spec_name)
+
+    def validate_combination(
+        self, hero_talent: str, class_talent: str, spec_talent: str
+    ) -> List[str]:
+        return (
+            self.validate_template("hero_talents", hero_talent)
+            + self.validate_template("class_talents", class_talent)
+            + self.validate_template("spec_talents", spec_talent)
+        )
+
+    def is_valid(self, hero_talent: str, class_talent: str, spec_talent: str) -> bool:
+        return not self.validate_combination(hero_talent, class_talent, spec_talent)
+
+    def invalid_templates(
+        self, talent_strings: Dict[str, Dict[str, str]]
+    ) -> Dict[str, Dict[str, List[str]]]:
+        """Map category -> template name -> problems for every invalid template."""
+        invalid = {}
+        for category, templates in talent_strings.items():
+            for name, talent_string in templates.items():
+                errors = self.validate_template(category, talent_string)
+                if errors:
+                    invalid.setdefault(category, {})[name] = errors
+        return invalid
+
+    def prune_templates(
+        self, talent_strings: Dict[str, Dict[str, str]]
+    ) -> Tuple[Dict[str, Dict[str, str]], int]:
+        """Drop invalid templates and return the pruned template map and the
+        number of hero/class/spec combinations that were removed with them."""
+        invalid = self.invalid_templates(talent_strings)
+        for category, templates in invalid.items():
+            for name, errors in templates.items():
+                logger.warning(f"Invalid {category} template '{name}': {'; '.join(errors)}")
+
+        pruned = {
+            category: {
+                name: talent_string
+                for name, talent_string in templates.items()
+                if name not in invalid.get(category, {})
+            }
+            for category, templates in talent_strings.items()
+        }
+        return pruned, _combination_count(talent_strings) - _combination_count(pruned)
+
+
+def _combination_count(talent_strings: Dict[str, Dict[str, str]]) -> int:
+    count = 1
+    for category in TREE_NODE_KEYS:
+        count *= len(talent_strings.get(category, {}))
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Validate profile templates against the talent tree")
+    parser.add_argument("--spec", required=True, help="Demon Hunter specialization")
+    parser.add_argument("templates", help="Path to profile_templates.simc")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    with open(args.templates, "r") as f:
+        sections = re.split(
+            r"#\s*(Hero tree variants|Class tree variants|Spec tree variants)", f.read()
+        )
+    if len(sections) != 7:
+        sys.exit(
+            f"{args.templates}: expected the Hero, Class and Spec tree variants sections, "
+            f"found {(len(sections) - 1) // 2} of them"
+        )
+    talent_strings = {
+        category: dict(re.findall(r'\$\(([\w_]+)\)="([^"]+)"', sections[i * 2 + 2]))
+        for i, category in enumerate(TREE_NODE_KEYS)
+    }
+    validator = TalentTreeValidator(args.spec)
+    invalid = validator.invalid_templates(talent_strings)
+    for category, templates in invalid.items():
+        for name, errors in templates.items():
+            print(f"{category} {name}: {'; '.join(errors)}")
+    _, pruned = validator.prune_templates(talent_strings)
+    print(f"{pruned} of {_combination_count(talent_strings)} combinations are invalid")
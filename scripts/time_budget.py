@@ -0,0 +1,166 @@
+import math
+import re
+import time
+import logging
+from dataclasses import dataclass, replace
+from typing import Dict, List, Optional
+
+from sim_planner import RunKey, RuntimeHistory, format_duration
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MIN_ITERATIONS = 500
+DEFAULT_MAX_ITERATIONS = 10000
+ITERATION_STEP = 100
+# Coefficient of variation of per-iteration DPS in a typical profileset run,
+# used to translate an iteration count into simc's target_error (percent, 95%)
+TYPICAL_DPS_CV = 0.035
+Z_95 = 1.96
+
+DURATION_PATTERN = re.compile(r"^\s*(?:(\d+(?:\.\d+)?)h)?\s*(?:(\d+(?:\.\d+)?)m)?\s*(?:(\d+(?:\.\d+)?)s?)?\s*$")
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Seconds from '5400', '90m', '1h30m' or '1h 30m 15s'; None for empty."""
+    if value is None or not str(value).strip():
+        return None
+    match = DURATION_PATTERN.match(str(value).lower())
+    if not match or not any(match.groups()):
+        raise ValueError(f"Invalid duration: {value!r}")
+    hours, minutes, seconds = (float(part) if part else 0.0 for part in match.groups())
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def expected_target_error(iterations: int) -> float:
+    """simc target_error (percent) reached after the given number of iterations."""
+    return round(100 * Z_95 * TYPICAL_DPS_CV / math.sqrt(max(1, iterations)), 3)
+
+
+@dataclass
+class BudgetedRun:
+    label: str
+    key: RunKey
+    profilesets: int
+    # Wall-clock multiplier: concurrent runs that share the cores only cost
+    # their share of the machine, CRN replicates cost one run per seed.
+    cost_factor: float = 1.0
+    # Upper bound for this run; defaults to the budget's max_iterations
+    max_iterations: Optional[int] = None
+
+
+class TimeBudget:
+    """Chooses iterations per simc run so the whole pipeline meets a deadline.
+
+    Costs come from the runtime history (measured per-profileset thread time,
+    or the planner defaults). The iteration counts minimise the summed
+    variance of all profileset means within the remaining time: a run with
+    n profilesets and cost c seconds per iteration gets iterations
+    proportional to sqrt(n / c). Each call to next_iterations re-plans the
+    runs that are still pending against the time actually left, so a stage
+    that overran shrinks the precision of everything after it.
+    """
+
+    def __init__(
+        self,
+        seconds: float,
+        history: RuntimeHistory,
+        min_iterations: int = DEFAULT_MIN_ITERATIONS,
+        max_iterations: int = DEFAULT_MAX_ITERATIONS,
+        start_time: Optional[float] = None,
+    ):
+        self.seconds = seconds
+        self.history = history
+        self.min_iterations = min_iterations
+        self.max_iterations = max(min_iterations, max_iterations)
+        self.deadline = (start_time or time.time()) + seconds
+        self.pending: List[BudgetedRun] = []
+
+    def remaining_seconds(self) -> float:
+        return max(0.0, self.deadline - time.time())
+
+    def set_runs(self, runs: List[BudgetedRun]):
+        self.pending = list(runs)
+
+    def seconds_per_iteration(self, run: BudgetedRun) -> float:
+        key = replace(run.key, iterations=1000)
+        return self.history.estimate(run.label, key, run.profilesets).wall_seconds * run.cost_factor / 1000
+
+    def plan(self, runs: Optional[List[BudgetedRun]] = None, seconds: Optional[float] = None) -> Dict[str, int]:
+        runs = self.pending if runs is None else runs
+        seconds = self.remaining_seconds() if seconds is None else seconds
+        costs = {run.label: max(1e-9, self.seconds_per_iteration(run)) for run in runs}
+        weights = {run.label: max(1, run.profilesets) for run in runs}
+        limits = {run.label: max(self.min_iterations, run.max_iterations or self.max_iterations) for run in runs}
+
+        # Solve with bounds: pin runs that hit a limit and re-solve the rest
+        allocation: Dict[str, float] = {}
+        free = [run.label for run in runs]
+        budget = seconds
+        while free:
+            scale = sum(math.sqrt(weights[label] * costs[label]) for label in free)
+            proposal = {label: budget * math.sqrt(weights[label] / costs[label]) / scale for label in free}
+            clamped = {
+                label: min(limits[label], max(self.min_iterations, iterations))
+                for label, iterations in proposal.items()
+                if not self.min_iterations <= iterations <= limits[label]
+            }
+            if not clamped:
+                allocation.update(proposal)
+                break
+            allocation.update(clamped)
+            budget = max(0.0, budget - sum(costs[label] * iterations for label, iterations in clamped.items()))
+            free = [label for label in free if label not in clamped]
+
+        return {
+            label: int(min(limits[label], max(self.min_iterations, round(iterations / ITERATION_STEP) * ITERATION_STEP)))
+            for label, iterations in allocation.items()
+        }
+
+    def planned_seconds(self, allocation: Dict[str, int], runs: Optional[List[BudgetedRun]] = None) -> float:
+        runs = self.pending if runs is None else runs
+        return sum(self.seconds_per_iteration(run) * allocation[run.label] for run in runs)
+
+    def next_iterations(self, label: str) -> int:
+        """Re-plan the pending runs and take the iteration count for one of them."""
+        if not any(run.label == label for run in self.pending):
+            return self.max_iterations
+        allocation = self.plan()
+        planned = self.planned_seconds(allocation)
+        remaining = self.remaining_seconds()
+        if planned > remaining * 1.05:
+            logger.warning(
+                f"Time budget: pending runs need ~{format_duration(planned)} even at "
+                f"{self.min_iterations} iterations but only {format_duration(remaining)} remain."
+            )
+        self.pending = [run for run in self.pending if run.label != label]
+        iterations = allocation[label]
+        logger.info(
+            f"Time budget: {label} -> {iterations} iterations "
+            f"(target_error {expected_target_error(iterations)}), {format_duration(round(remaining))} left"
+        )
+        return iterations
+
+    def params_for(self, label: str, params):
+        """Copy of the simulation parameters with budgeted iterations and target_error.
+
+        target_error is never tightened below the configured value, and is set
+        to roughly what the budgeted iterations reach so simc stops near that
+        count whichever of the two limits it honours first.
+        """
+        if not any(run.label == label for run in self.pending):
+            logger.debug(f"Time budget: {label} was not planned; keeping its configured precision.")
+            return params
+        iterations = self.next_iterations(label)
+        target_error = max(params.target_error or 0.0, expected_target_error(iterations))
+        return replace(params, iterations=iterations, target_error=target_error)
+
+    def print_plan(self):
+        allocation = self.plan()
+        print(f"\nTime Budget: {format_duration(self.seconds)} ({format_duration(round(self.remaining_seconds()))} left)")
+        for run in self.pending:
+            iterations = allocation[run.label]
+            print(
+                f"  {run.label}: {iterations} iterations, target_error {expected_target_error(iterations)}, "
+                f"~{format_duration(self.seconds_per_iteration(run) * iterations)}"
+            )
+        print(f"Planned Simulation Time: {format_duration(self.planned_seconds(allocation))}")
@@ -0,0 +1,109 @@
+import json
+import os
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from progress_events import bus
+from stage_profiler import profiler
+
+logger = logging.getLogger(__name__)
+
+
+class Tracer:
+    """Collects nested wall-clock spans and writes them as Chrome trace events.
+
+    Spans are recorded as complete ("X") events on the thread that ran them, so
+    nesting and concurrent supplemental runs show up as separate tracks when
+    the file is opened in chrome://tracing or ui.perfetto.dev. A disabled
+    tracer records nothing. Span boundaries are also published to the progress
+    event bus as stage_start/stage_end events and, in --profile runs, delimit
+    the per-stage cProfile/tracemalloc captures.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+        self.reset()
+
+    def reset(self):
+        self.events: List[Dict[str, Any]] = []
+        self.origin_ns = time.perf_counter_ns()
+        self.named_threads = set()
+
+    def _timestamp_us(self) -> float:
+        return (time.perf_counter_ns() - self.origin_ns) / 1000
+
+    def _thread_id(self) -> int:
+        thread = threading.current_thread()
+        tid = thread.ident or 0
+        if tid not in self.named_threads:
+            self.named_threads.add(tid)
+            self.events.append(
+                {"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": thread.name}}
+            )
+        return tid
+
+    @contextmanager
+    def span(self, name: str, category: str = "stage", **args):
+        if not self.enabled and not bus.active and not profiler.enabled:
+            yield
+            return
+        start = self._timestamp_us()
+        bus.publish("stage_start", stage=name, category=category, **args)
+        qualifier = args.get("scenario") or args.get("shard")
+        try:
+            with profiler.stage(f"{name}[{qualifier}]" if qualifier else name):
+                yield
+        except Exception as e:
+            bus.publish("error", stage=name, message=str(e), **args)
+            raise
+        finally:
+            duration = self._timestamp_us() - start
+            bus.publish("stage_end", stage=name, category=category, seconds=duration / 1e6, **args)
+            if self.enabled:
+                with self.lock:
+                    self.events.append(
+                        {
+                            "name": name,
+                            "cat": category,
+                            "ph": "X",
+                            "ts": start,
+                            "dur": duration,
+                            "pid": self.pid,
+                            "tid": self._thread_id(),
+                            "args": {key: str(value) for key, value in args.items()},
+                        }
+                    )
+
+    def write(self, path: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        with self.lock:
+            trace = {"traceEvents": list(self.events), "displayTimeUnit": "ms"}
+        try:
+            with open(path, "w") as f:
+                json.dump(trace, f)
+        except IOError as e:
+            logger.error(f"Error writing trace file {path}: {e}")
+            return None
+        logger.info(f"Trace written to {path}")
+        return path
+
+
+tracer = Tracer()
+
+
+def enable_tracing():
+    """Start a fresh trace for this run."""
+    tracer.reset()
+    tracer.enabled = True
+
+
+def trace_file_path(report_folder: str, prefix: str = "trace") -> str:
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return os.path.join(report_folder, f"{prefix}_{timestamp}.json")